@@ -2,7 +2,8 @@ import os
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from khan_cipher.core import KhanKeystream, derive_key
+from khan_cipher.core import new_keystream, derive_key
+from keystream_analysis import autocorrelation
 
 plt.style.use('seaborn-v0_8-whitegrid')
 plt.rcParams.update({'font.family': 'serif', 'font.size': 12})
@@ -17,33 +18,26 @@ def main():
     salt = os.urandom(16)
     iv = os.urandom(16)
     derived_key = derive_key(master_key, salt)
-    ksg = KhanKeystream(derived_key, 100003, iv)
-    keystream = bytes([ksg.get_next_byte() for _ in range(size)])
+    ksg = new_keystream(derived_key, 100003, iv)
+    keystream = ksg.generate(size)
 
-    signal = np.array(list(keystream), dtype=float)
-    signal -= np.mean(signal)
+    signal = np.frombuffer(keystream, dtype=np.uint8)
 
-    # 1. Autocorrelation Plot (1D)
-    # limit lag to 500 for visualization
+    # 1. Autocorrelation Plot (1D), FFT-based over the whole keystream
     max_lag = 500
-    if len(signal) > max_lag:
-        # Use a subset to calculate correlation to avoid O(N^2) explosion
-        lag_signal = signal[:2000]
-        autocorr = np.correlate(lag_signal, lag_signal, mode='full')
-        # Extract the positive lags
-        autocorr = autocorr[len(autocorr) // 2: len(autocorr) // 2 + max_lag]
-
-        plt.figure(figsize=(10, 5))
-        plt.plot(range(max_lag), autocorr, color='green')
-        plt.xlabel('Lag')
-        plt.ylabel('Correlation')
-        plt.title('KHAN PRNG 1D Autocorrelation')
-        plt.tight_layout()
-        plt.savefig('benchmarks/plots/autocorrelation_1d.png', dpi=300)
-        plt.close()
+    autocorr = autocorrelation(signal, max_lag)
+
+    plt.figure(figsize=(10, 5))
+    plt.plot(range(1, max_lag + 1), autocorr[1:], color='green')
+    plt.xlabel('Lag')
+    plt.ylabel('Correlation')
+    plt.title('KHAN PRNG 1D Autocorrelation')
+    plt.tight_layout()
+    plt.savefig('benchmarks/plots/autocorrelation_1d.png', dpi=300)
+    plt.close()
 
     # 2. 2D Heatmap (Spatial layout of bytes 256x256)
-    matrix = np.array(list(keystream)).reshape((256, 256))
+    matrix = signal.reshape((256, 256))
     plt.figure(figsize=(8, 6))
     sns.heatmap(matrix, cmap='viridis', cbar=True,
                 xticklabels=False, yticklabels=False)
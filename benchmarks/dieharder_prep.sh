@@ -1,4 +1,10 @@
 #!/bin/bash
-echo "Running Dieharder PRNG tests against KHAN Cipher payload..."
-# -a runs all tests, -g 201 reads from file
-dieharder -a -g 201 -f benchmarks/data/khan_1GB.bin
+# Pipes KHAN keystream straight into dieharder: no intermediate file.
+# -a runs all tests, -g 200 reads raw binary from stdin.
+# Set KHAN_KEYSTREAM_FILE to test a pre-generated file instead (-g 201).
+echo "Running Dieharder PRNG tests against KHAN Cipher keystream..."
+if [ -n "$KHAN_KEYSTREAM_FILE" ]; then
+    dieharder -a -g 201 -f "$KHAN_KEYSTREAM_FILE"
+else
+    khan-keystream | dieharder -a -g 200
+fi
@@ -1,8 +1,8 @@
 import os
-import math
+import numpy as np
 import matplotlib.pyplot as plt
-from collections import Counter
 from khan_cipher.core import encrypt
+from keystream_analysis import byte_histogram, rolling_entropy, shannon_entropy
 
 plt.style.use('seaborn-v0_8-whitegrid')
 plt.rcParams.update({'font.family': 'serif', 'font.size': 12})
@@ -11,13 +11,7 @@ plt.rcParams.update({'font.family': 'serif', 'font.size': 12})
 def calculate_shannon(data: bytes) -> float:
     if not data:
         return 0.0
-    entropy = 0
-    length = len(data)
-    counts = Counter(data)
-    for count in counts.values():
-        p = count / length
-        entropy -= p * math.log2(p)
-    return entropy
+    return shannon_entropy(byte_histogram(np.frombuffer(data, dtype=np.uint8)))
 
 
 def main():
@@ -38,14 +32,10 @@ def main():
     # (0 ^ K = K)
     ciphertext = payload[32:-32]
 
-    # 1. Rolling Entropy Plot
-    chunk_size = 1000
-    entropies = []
+    stream = np.frombuffer(ciphertext, dtype=np.uint8)
 
-    for i in range(0, len(ciphertext), chunk_size):
-        chunk = ciphertext[i:i + chunk_size]
-        if len(chunk) == chunk_size:
-            entropies.append(calculate_shannon(chunk))
+    # 1. Rolling Entropy Plot
+    entropies = rolling_entropy(stream, window=1000)
 
     plt.figure(figsize=(10, 6))
     plt.plot(range(len(entropies)), entropies, color='b',
@@ -61,8 +51,7 @@ def main():
     plt.close()
 
     # 2. Histogram of Byte Frequencies
-    byte_counts = Counter(ciphertext)
-    sorted_counts = [byte_counts.get(i, 0) for i in range(256)]
+    sorted_counts = byte_histogram(stream)
 
     plt.figure(figsize=(12, 6))
     plt.bar(range(256), sorted_counts, color='teal',
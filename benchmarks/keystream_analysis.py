@@ -0,0 +1,258 @@
+"""
+Streaming statistical analysis of large keystream files.
+
+Every statistic is computed block by block over an ``np.memmap`` of the
+file, so memory stays bounded (a few tens of MB) whatever the corpus
+size, and every inner loop is a numpy kernel:
+
+* byte histogram and chi-square -- ``np.bincount`` per block;
+* rolling Shannon entropy -- one offset ``bincount`` per block of windows;
+* autocorrelation -- Wiener-Khinchin (inverse FFT of the cross-spectrum)
+  per overlapping segment, summed exactly across segments;
+* power spectrum -- Welch's method (Hann window, 50 % overlap).
+
+Usage:
+    python benchmarks/keystream_analysis.py benchmarks/data/khan_1GB.bin
+        [--window 1024] [--max-lag 1000] [--nperseg 4096] [--json out.json] [--plots]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+BLOCK_SIZE = 16 << 20
+
+
+def open_corpus(path: str) -> np.memmap:
+    """Map a keystream file read-only as a flat uint8 array."""
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+def _blocks(data: np.ndarray, block_size: int):
+    for start in range(0, len(data), block_size):
+        yield data[start:start + block_size]
+
+
+def byte_histogram(data: np.ndarray, block_size: int = BLOCK_SIZE) -> np.ndarray:
+    """Counts of each byte value 0-255."""
+    counts = np.zeros(256, dtype=np.int64)
+    for block in _blocks(data, block_size):
+        counts += np.bincount(block, minlength=256)
+    return counts
+
+
+def shannon_entropy(counts: np.ndarray) -> float:
+    """Entropy in bits/byte of a byte histogram."""
+    p = counts[counts > 0] / counts.sum()
+    return float(-(p * np.log2(p)).sum())
+
+
+def chi_square(counts: np.ndarray) -> float:
+    """Chi-square statistic of a byte histogram against uniform (255 d.o.f.)."""
+    expected = counts.sum() / 256
+    return float(((counts - expected) ** 2 / expected).sum())
+
+
+def rolling_entropy(data: np.ndarray, window: int = 1024, windows_per_block: int = 4096) -> np.ndarray:
+    """
+    Shannon entropy of each consecutive, non-overlapping window.
+
+    All windows of a block are histogrammed by a single ``bincount`` over
+    ``row * 256 + byte``, giving a (windows, 256) count matrix.
+    """
+    n_windows = len(data) // window
+    out = np.empty(n_windows, dtype=np.float64)
+    step = windows_per_block * window
+    done = 0
+    for start in range(0, n_windows * window, step):
+        rows = np.asarray(data[start:min(start + step, n_windows * window)]).reshape(-1, window)
+        keys = rows + (np.arange(len(rows), dtype=np.int64) * 256)[:, None]
+        counts = np.bincount(keys.ravel(), minlength=len(rows) * 256).reshape(len(rows), 256)
+        p = counts / window
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = np.where(p > 0, p * np.log2(p), 0.0)
+        out[done:done + len(rows)] = -terms.sum(axis=1)
+        done += len(rows)
+    return out
+
+
+def autocorrelation(
+    data: np.ndarray, max_lag: int = 1000, fft_size: int = 1 << 20, mean: float | None = None
+) -> np.ndarray:
+    """
+    Normalized autocorrelation r[0..max_lag] via Wiener-Khinchin.
+
+    The corpus is cut into segments of ``fft_size - max_lag`` bytes; each
+    segment is correlated against itself plus the next ``max_lag`` bytes
+    (one forward FFT of each, one inverse FFT of their cross-spectrum), so
+    pairs straddling segment boundaries are counted and the result is
+    exact.  Each lag is divided by its number of pairs.
+    """
+    if mean is None:
+        mean = _mean(data)
+    segment = fft_size - max_lag
+    if segment <= 0:
+        raise ValueError("fft_size must exceed max_lag.")
+    lags = np.arange(max_lag + 1)
+    sums = np.zeros(max_lag + 1)
+    for start in range(0, len(data), segment):
+        x = np.asarray(data[start:start + segment + max_lag], dtype=np.float64) - mean
+        head = np.fft.rfft(x[:segment], fft_size)
+        full = np.fft.rfft(x, fft_size)
+        sums += np.fft.irfft(np.conj(head) * full, fft_size)[:max_lag + 1]
+    acf = sums / np.maximum(len(data) - lags, 1)
+    return acf / acf[0]
+
+
+def _mean(data: np.ndarray) -> float:
+    counts = byte_histogram(data)
+    return float(np.dot(np.arange(256), counts) / counts.sum())
+
+
+def welch_spectrum(
+    data: np.ndarray, nperseg: int = 4096, segments_per_batch: int = 256,
+    mean: float | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Welch-averaged power spectral density.
+
+    Returns:
+        (frequencies in cycles/byte, PSD) for the one-sided spectrum.
+    """
+    step = nperseg // 2
+    n_segments = (len(data) - nperseg) // step + 1
+    if n_segments < 1:
+        raise ValueError("Corpus is shorter than one segment.")
+    window = np.hanning(nperseg)
+    scale = 1.0 / (window ** 2).sum()
+    if mean is None:
+        mean = _mean(data)
+
+    psd = np.zeros(nperseg // 2 + 1)
+    for first in range(0, n_segments, segments_per_batch):
+        last = min(first + segments_per_batch, n_segments)
+        span = np.asarray(data[first * step:(last - 1) * step + nperseg], dtype=np.float64)
+        frames = sliding_window_view(span, nperseg)[::step]
+        spectra = np.fft.rfft((frames - mean) * window, axis=1)
+        psd += (np.abs(spectra) ** 2).sum(axis=0)
+    psd *= scale / n_segments
+    psd[1:-1] *= 2  # one-sided
+    return np.fft.rfftfreq(nperseg), psd
+
+
+def analyze(path: str, window: int = 1024, max_lag: int = 1000, nperseg: int = 4096) -> dict:
+    """Run every statistic over a keystream file and summarise the results."""
+    data = open_corpus(path)
+    timings = {}
+
+    t0 = time.perf_counter()
+    counts = byte_histogram(data)
+    timings['histogram'] = time.perf_counter() - t0
+    mean = float(np.dot(np.arange(256), counts) / counts.sum())
+
+    t0 = time.perf_counter()
+    entropies = rolling_entropy(data, window)
+    timings['rolling_entropy'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    acf = autocorrelation(data, max_lag, mean=mean)
+    timings['autocorrelation'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    freqs, psd = welch_spectrum(data, nperseg, mean=mean)
+    timings['welch'] = time.perf_counter() - t0
+
+    return {
+        'path': path,
+        'bytes': int(len(data)),
+        'mean': mean,
+        'shannon_entropy': shannon_entropy(counts),
+        'chi_square': chi_square(counts),
+        'histogram': counts.tolist(),
+        'rolling_entropy': {
+            'window': window,
+            'min': float(entropies.min()) if len(entropies) else None,
+            'mean': float(entropies.mean()) if len(entropies) else None,
+        },
+        'autocorrelation': {
+            'max_lag': max_lag,
+            'max_abs_nonzero_lag': float(np.abs(acf[1:]).max()) if max_lag else None,
+            # Two-sided 99% bound for white noise.
+            'white_noise_bound': float(2.576 / np.sqrt(len(data))),
+            'values': acf.tolist(),
+        },
+        'welch': {
+            'nperseg': nperseg,
+            # Flatness: geometric / arithmetic mean of the PSD (1.0 is white).
+            'spectral_flatness': float(np.exp(np.mean(np.log(psd[1:]))) / np.mean(psd[1:])),
+        },
+        'timings_s': timings,
+        '_series': (entropies, acf, freqs, psd),
+    }
+
+
+def _plot(result: dict) -> None:
+    import matplotlib.pyplot as plt
+
+    plt.style.use('seaborn-v0_8-whitegrid')
+    plt.rcParams.update({'font.family': 'serif', 'font.size': 12})
+    os.makedirs('benchmarks/plots', exist_ok=True)
+    entropies, acf, freqs, psd = result['_series']
+    mb = result['bytes'] / 1e6
+
+    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+    axes[0, 0].bar(range(256), result['histogram'], color='teal', alpha=0.8)
+    axes[0, 0].axhline(result['bytes'] / 256, color='r', linestyle='--')
+    axes[0, 0].set_title(f'Byte Histogram ({mb:.0f} MB)')
+    axes[0, 1].plot(entropies, color='b', alpha=0.7, linewidth=0.5)
+    axes[0, 1].set_title(f"Rolling Entropy ({result['rolling_entropy']['window']} B windows)")
+    axes[1, 0].plot(acf[1:], color='green')
+    bound = result['autocorrelation']['white_noise_bound']
+    axes[1, 0].axhline(bound, color='r', linestyle='--')
+    axes[1, 0].axhline(-bound, color='r', linestyle='--')
+    axes[1, 0].set_title('Autocorrelation (Wiener-Khinchin)')
+    axes[1, 1].semilogy(freqs[1:], psd[1:], color='purple', linewidth=0.5)
+    axes[1, 1].set_title('Welch Power Spectral Density')
+    fig.suptitle('KHAN Keystream Corpus Analysis')
+    fig.tight_layout()
+    fig.savefig('benchmarks/plots/keystream_analysis.png', dpi=200)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('path', help="raw keystream file (e.g. from nist_prep.py)")
+    parser.add_argument('--window', type=int, default=1024)
+    parser.add_argument('--max-lag', type=int, default=1000)
+    parser.add_argument('--nperseg', type=int, default=4096)
+    parser.add_argument('--json', help="write the summary to this file")
+    parser.add_argument('--plots', action='store_true',
+                        help="write benchmarks/plots/keystream_analysis.png")
+    args = parser.parse_args()
+
+    result = analyze(args.path, args.window, args.max_lag, args.nperseg)
+    acf = result['autocorrelation']
+    print(f"{result['bytes']:,} bytes analysed")
+    print(f"  Shannon entropy      {result['shannon_entropy']:.6f} bits/byte")
+    print(f"  Chi-square (255 df)  {result['chi_square']:.2f}")
+    print(f"  Rolling entropy min  {result['rolling_entropy']['min']:.4f}")
+    print(f"  Max |r(k)|, k>0      {acf['max_abs_nonzero_lag']:.2e} "
+          f"(99% white-noise bound {acf['white_noise_bound']:.2e})")
+    print(f"  Spectral flatness    {result['welch']['spectral_flatness']:.4f}")
+    for stage, seconds in result['timings_s'].items():
+        print(f"  [{stage}] {seconds:.2f}s")
+
+    if args.plots:
+        _plot(result)
+    if args.json:
+        summary = {k: v for k, v in result.items() if not k.startswith('_')}
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
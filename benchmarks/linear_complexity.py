@@ -0,0 +1,101 @@
+"""
+NIST SP 800-22 linear complexity test with a vectorized Berlekamp-Massey.
+
+The reference implementation runs Berlekamp-Massey block by block on
+Python lists of bits, which takes 20+ minutes at 1 Mbit.  Here every
+block advances in lock-step: the connection polynomials C(x), the shifted
+previous polynomials x^m B(x) and the sliding windows of recent bits are
+bit-packed into (blocks, words) uint64 arrays, so one Berlekamp-Massey
+iteration is a handful of NumPy operations across all blocks at once.
+
+The x^m B(x) term is kept pre-shifted: in every branch of the algorithm
+it is multiplied by x once per iteration, so the shift is uniform across
+blocks and needs no per-block bookkeeping.
+"""
+
+import math
+
+import numpy as np
+
+# Probabilities of the seven T_i classes (SP 800-22 §3.10).
+PI = np.array([0.010417, 0.03125, 0.125, 0.5, 0.25, 0.0625, 0.020833])
+DEFAULT_BLOCK_SIZE = 500
+
+
+def _shift_left_one(words: np.ndarray) -> np.ndarray:
+    """Multiply bit-packed polynomials (bit i of word i//64 = x^i) by x."""
+    carry = np.zeros_like(words)
+    carry[:, 1:] = words[:, :-1] >> np.uint64(63)
+    return (words << np.uint64(1)) | carry
+
+
+def _parity(words: np.ndarray) -> np.ndarray:
+    """Parity of each row of a (blocks, words) uint64 array, as bool."""
+    x = np.bitwise_xor.reduce(words, axis=1)
+    for shift in (32, 16, 8, 4, 2, 1):
+        x ^= x >> np.uint64(shift)
+    return (x & np.uint64(1)).astype(bool)
+
+
+def linear_complexities(blocks: np.ndarray) -> np.ndarray:
+    """
+    Linear complexity of each row of a (N, M) array of 0/1 bits.
+
+    Returns:
+        np.ndarray: N integers, the length of the shortest LFSR that
+        generates each block.
+    """
+    blocks = np.asarray(blocks, dtype=np.uint8)
+    n_blocks, m = blocks.shape
+    n_words = (m + 2 + 63) // 64
+
+    c = np.zeros((n_blocks, n_words), dtype=np.uint64)
+    c[:, 0] = 1                      # C(x) = 1
+    b_shifted = np.zeros_like(c)
+    b_shifted[:, 0] = 2              # x^1 * B(x), B(x) = 1
+    window = np.zeros_like(c)        # bit i = s_{n-i}
+    lengths = np.zeros(n_blocks, dtype=np.int64)
+
+    for n in range(m):
+        window = _shift_left_one(window)
+        window[:, 0] |= blocks[:, n].astype(np.uint64)
+
+        discrepancy = _parity(c & window)
+        swap = discrepancy & (2 * lengths <= n)
+
+        c_old = c
+        c = np.where(discrepancy[:, None], c ^ b_shifted, c)
+        b_shifted = _shift_left_one(np.where(swap[:, None], c_old, b_shifted))
+        lengths = np.where(swap, n + 1 - lengths, lengths)
+    return lengths
+
+
+def linear_complexity_test(bits: np.ndarray, block_size: int = DEFAULT_BLOCK_SIZE) -> tuple[float, bool]:
+    """
+    SP 800-22 §2.10 linear complexity test.
+
+    Args:
+        bits: Sequence of 0/1 values (at least 10^6 recommended).
+        block_size: M, between 500 and 5000.
+
+    Returns:
+        (p-value, passed at alpha = 0.01).
+    """
+    bits = np.asarray(bits, dtype=np.uint8)
+    n_blocks = len(bits) // block_size
+    if n_blocks == 0:
+        raise ValueError("Sequence is shorter than one block.")
+    m = block_size
+    lengths = linear_complexities(bits[:n_blocks * m].reshape(n_blocks, m))
+
+    mu = m / 2 + (9 + (-1) ** (m + 1)) / 36 - (m / 3 + 2 / 9) * 2.0 ** -m
+    t = (-1) ** m * (lengths - mu) + 2 / 9
+    # Classes: T <= -2.5, (-2.5, -1.5], ..., (1.5, 2.5], T > 2.5.
+    edges = np.array([-2.5, -1.5, -0.5, 0.5, 1.5, 2.5])
+    nu = np.bincount(np.searchsorted(edges, t, side='left'), minlength=7)
+    expected = n_blocks * PI
+    chi2 = float(((nu - expected) ** 2 / expected).sum())
+    # igamc(K/2, chi2/2) with K = 6 degrees of freedom has a closed form.
+    x = chi2 / 2
+    p_value = math.exp(-x) * (1 + x + x * x / 2)
+    return p_value, p_value >= 0.01
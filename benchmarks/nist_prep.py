@@ -1,6 +1,6 @@
 import os
 import sys
-from khan_cipher.core import KhanKeystream, derive_key
+from khan_cipher.core import new_keystream, derive_key
 
 
 def main():
@@ -12,16 +12,17 @@ def main():
     salt = os.urandom(16)
     iv = os.urandom(16)
     derived_key = derive_key(master_key, salt)
-    ksg = KhanKeystream(derived_key, 100003, iv)
+    ksg = new_keystream(derived_key, 100003, iv)
 
     print("Generating 1GB of KHAN keystream data...")
+    chunk = memoryview(bytearray(chunk_size))
     with open('benchmarks/data/khan_1GB.bin', 'wb') as f:
         bytes_written = 0
         while bytes_written < target_size:
             sz = min(chunk_size, target_size - bytes_written)
-            chunk = bytes([ksg.get_next_byte() for _ in range(sz)])
-            f.write(chunk)
-            bytes_written += len(chunk)
+            ksg.readinto(chunk[:sz])
+            f.write(chunk[:sz])
+            bytes_written += sz
             print(f"Written {bytes_written / 1024 / 1024:.2f} MB", end='\r')
             sys.stdout.flush()
 
@@ -0,0 +1,73 @@
+"""
+Parallel encryption scaling benchmark.
+
+Encrypts one large buffer with ``encrypt(..., workers=N)`` for increasing N
+and reports throughput and speed-up relative to a single worker.  The
+scaling curve is plotted to benchmarks/plots/parallel_scaling.png.
+
+Usage:
+    python benchmarks/parallel_scaling.py [--size-mb 64] [--max-workers 32]
+"""
+
+import argparse
+import os
+import time
+import matplotlib.pyplot as plt
+from khan_cipher import parallel
+from khan_cipher.core import decrypt
+
+plt.style.use('seaborn-v0_8-whitegrid')
+plt.rcParams.update({'font.family': 'serif', 'font.size': 12})
+
+
+def _worker_counts(max_workers: int) -> list[int]:
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=64)
+    parser.add_argument('--max-workers', type=int, default=parallel.default_workers())
+    args = parser.parse_args()
+
+    os.makedirs('benchmarks/plots', exist_ok=True)
+    master_key = os.urandom(32)
+    plaintext = os.urandom(args.size_mb * 1024 * 1024)
+
+    print(f"Parallel encryption scaling ({args.size_mb} MB payload)")
+    print(f"{'workers':>8} {'MB/s':>10} {'speed-up':>9}")
+
+    results = []
+    for workers in _worker_counts(args.max_workers):
+        t0 = time.perf_counter()
+        # Threshold 0 forces the pool for every worker count, including 1.
+        payload = parallel.encrypt_parallel(plaintext, master_key, workers=workers,
+                                            parallel_threshold=0)
+        elapsed = time.perf_counter() - t0
+        rate = args.size_mb / elapsed
+        results.append((workers, rate))
+        print(f"{workers:>8} {rate:>10.2f} {rate / results[0][1]:>8.2f}x")
+
+    assert decrypt(payload, master_key, workers=args.max_workers) == plaintext
+
+    counts = [w for w, _ in results]
+    plt.figure(figsize=(10, 6))
+    plt.plot(counts, [r / results[0][1] for _, r in results], 'o-',
+             color='b', label='Measured')
+    plt.plot(counts, counts, '--', color='r', label='Linear')
+    plt.xlabel('Workers')
+    plt.ylabel('Speed-up')
+    plt.title('KHAN Parallel Encryption Scaling')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig('benchmarks/plots/parallel_scaling.png', dpi=300)
+    plt.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,151 +1,274 @@
 """
 NIST SP 800-22 Rev. 1a Statistical Test Suite — Full Battery.
 
-Runs all eligible tests from the NIST SP 800-22 battery on a 1,000,000-bit
-keystream sample using the ``nistrng`` reference implementation.  Results are
-saved to benchmarks/data/finalAnalysisReport.txt.
+Runs every eligible test from the NIST SP 800-22 battery (``nistrng``
+reference implementation) on many independent keystream sequences in
+parallel, then applies the two second-level checks of SP 800-22 §4.2 to
+each test:
 
-The ``linear_complexity`` test is skipped by default because it is O(n^2) and
-takes 20+ minutes for 1M bits.  All other 13+ eligible tests run in ~60s.
+* proportion of passing sequences (alpha = 0.01) inside
+  0.99 ± 3 * sqrt(0.99 * 0.01 / m);
+* uniformity of the p-values over ten bins, chi-square with 9 degrees of
+  freedom, P-value_T >= 0.0001 (requires at least 55 sequences).
+
+Sequence i is keyed deterministically from ``--seed`` (key = SHA-256 of the
+seed, IV = SHA-256 of seed and i), so every (sequence, test) result is
+cached in benchmarks/data/nist_cache under a digest of the keystream
+parameters and reruns only compute what is missing.  The report is saved
+to benchmarks/data/finalAnalysisReport.txt.
+
+``linear_complexity`` runs on the vectorized Berlekamp-Massey in
+linear_complexity.py (~0.2s per Mbit) instead of nistrng's O(n^2)
+implementation, so the full 15-test battery fits in CI time.  The random
+excursion, random excursion variant and non-overlapping template tests
+run on sp800_22.py, because nistrng's versions return invalid p-values.
+
+Tests that produce several p-values per sequence (serial, cumulative sums,
+the random excursion tests) are reported one row per p-value, as in the
+NIST STS report, rather than by nistrng's mean of them.  Sequences a test
+does not apply to (random excursions with fewer than 500 cycles) are left
+out of that test's statistics.
+
+Usage:
+    python benchmarks/parse_nist.py [--sequences 100] [--bits 1000000]
+        [--workers N] [--seed khan-nist] [--no-cache]
 """
 
+import argparse
+import hashlib
+import json
+import math
 import os
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 
 sys.path.insert(0, os.path.join(
     os.path.dirname(__file__), '..', 'src'))
 
-from khan_cipher.core import KhanKeystream, derive_key  # noqa: E402
+from khan_cipher.core import new_keystream  # noqa: E402
 from khan_cipher.primes import DEFAULT_PRIME  # noqa: E402
+from linear_complexity import linear_complexity_test  # noqa: E402
+from sp800_22 import (  # noqa: E402
+    igamc, non_overlapping_template_test, random_excursion_test, random_excursion_variant_test,
+)
 import nistrng  # noqa: E402
 
 
 STREAM_LENGTH_BITS = 1_000_000
 REPORT_PATH = 'benchmarks/data/finalAnalysisReport.txt'
+CACHE_DIR = 'benchmarks/data/nist_cache'
+ALPHA = 0.01
+
+# Tests run by a local implementation instead of nistrng's.
+LOCAL_TESTS = {
+    "linear_complexity": linear_complexity_test,
+    "non_overlapping_template_matching": non_overlapping_template_test,
+    "random_excursion": random_excursion_test,
+    "random_excursion_variant": random_excursion_variant_test,
+}
+
+# Bumped whenever cached results of earlier runs can no longer be trusted.
+CACHE_FORMAT = 2
+
 
-# linear_complexity is O(n^2) — impractical for CI at 1M bits
-SKIP_TESTS = {"linear_complexity"}
+def _sequence_params(seed: str, index: int) -> tuple[bytes, bytes]:
+    """Deterministic (key, iv) of sequence ``index``."""
+    key = hashlib.sha256(seed.encode()).digest()
+    iv = hashlib.sha256(f"{seed}/{index}".encode()).digest()[:16]
+    return key, iv
 
 
-def _generate_keystream_bits(n_bits: int) -> np.ndarray:
-    """Generate n_bits of KHAN keystream as a numpy int8 0/1 array."""
-    n_bytes = (n_bits + 7) // 8
-    key = os.urandom(32)
-    salt = os.urandom(16)
-    iv = os.urandom(16)
-    derived_key = derive_key(key, salt)
-    ksg = KhanKeystream(derived_key, DEFAULT_PRIME, iv)
-    raw = bytes([ksg.get_next_byte() for _ in range(n_bytes)])
+def _sequence_digest(prime: int, key: bytes, iv: bytes, n_bits: int) -> str:
+    """Cache key of one sequence's results."""
+    ident = (f"{prime}|{key.hex()}|{iv.hex()}|{n_bits}|"
+             f"nistrng-{getattr(nistrng, '__version__', '?')}|{CACHE_FORMAT}")
+    return hashlib.sha256(ident.encode()).hexdigest()
+
+
+@lru_cache(maxsize=4)
+def _keystream_bits(prime: int, key: bytes, iv: bytes, n_bits: int) -> np.ndarray:
+    """n_bits of KHAN keystream as a numpy int8 0/1 array."""
+    raw = new_keystream(key, prime, iv).generate((n_bits + 7) // 8)
     bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8))
     return bits[:n_bits].astype(np.int8)
 
 
-def _run_nist_battery(bits: np.ndarray) -> pd.DataFrame:
-    """Run NIST SP 800-22 tests one-by-one and collect results."""
-    eligible = nistrng.check_eligibility_all_battery(
-        bits, nistrng.SP800_22R1A_BATTERY
-    )
-    # Filter
-    run_tests = [t for t in eligible if t not in SKIP_TESTS]
-    skip_count = len(eligible) - len(run_tests)
+def _score(result: tuple) -> list[float]:
+    """The p-values of the ``(Result, elapsed)`` pair nistrng returns.
+
+    ``Result.score`` is the mean of a test's p-values, which is not itself
+    a p-value, and there is no public accessor for the individual ones.
+    """
+    outcome, _elapsed = result
+    return [float(p) for p in np.atleast_1d(outcome._score_list)]
+
+
+def _run_test(prime: int, key: bytes, iv: bytes, n_bits: int, name: str) -> list[float] | None:
+    """Worker: the p-values of one test on one sequence; None if it does not apply."""
+    bits = _keystream_bits(prime, key, iv, n_bits)
+    if name in LOCAL_TESTS:
+        outcome = LOCAL_TESTS[name](bits)
+        return None if outcome is None else [float(p) for p in np.atleast_1d(outcome[0])]
+    # Eligibility was checked once on a probe sequence of the same length.
+    # Each test gets its own int64 copy: binary_matrix_rank rewrites its
+    # input in place, which would corrupt the cached sequence for the tests
+    # after it, and cumulative sums accumulates in the input dtype, which
+    # overflows int8.
+    return _score(nistrng.run_by_name_battery(
+        name, bits.astype(np.int64), nistrng.SP800_22R1A_BATTERY, False))
+
+
+def _load_cache(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _store_cache(path: str, entry: dict) -> None:
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp, path)
+
+
+def _second_level(p_values: list[float]) -> dict:
+    """SP 800-22 §4.2 proportion and uniformity checks for one test."""
+    m = len(p_values)
+    passed = sum(p >= ALPHA for p in p_values)
+    p_hat = 1 - ALPHA
+    margin = 3 * math.sqrt(p_hat * ALPHA / m) if m else 0.0
+    proportion = passed / m if m else 0.0
+    proportion_ok = m > 0 and proportion >= p_hat - margin
+
+    uniformity = None
+    if m >= 55:
+        bins = np.histogram(p_values, bins=10, range=(0.0, 1.0))[0]
+        expected = m / 10
+        chi2 = float(((bins - expected) ** 2 / expected).sum())
+        uniformity = igamc(9 / 2, chi2 / 2)
+    uniform_ok = uniformity is None or uniformity >= 0.0001
+    if m == 0:
+        verdict = "N/A"
+    else:
+        verdict = "PASS" if proportion_ok and uniform_ok else "FAIL"
+
+    return {
+        "Sequences": m,
+        "Passed": passed,
+        "Proportion": round(proportion, 4),
+        "Min Proportion": round(p_hat - margin, 4),
+        "Uniformity P": None if uniformity is None else round(uniformity, 6),
+        "Result": verdict,
+    }
+
+
+def _run_battery(args: argparse.Namespace) -> pd.DataFrame:
+    """Run (or load from cache) every (sequence, test) pair."""
+    sequences = [_sequence_params(args.seed, i) for i in range(args.sequences)]
+    probe = _keystream_bits(args.prime, *sequences[0], args.bits)
+    eligible = nistrng.check_eligibility_all_battery(probe, nistrng.SP800_22R1A_BATTERY)
+    tests = list(eligible)
 
     print(f"  Eligible : {len(eligible)} / 15")
-    print(f"  Running  : {len(run_tests)} "
-          f"(skipping {skip_count}: {SKIP_TESTS & set(eligible)})")
-    print(f"  Bits     : {len(bits):,}\n")
+    print(f"  Running  : {len(tests)} (local: {', '.join(sorted(LOCAL_TESTS))})")
+    print(f"  Sequences: {args.sequences} x {args.bits:,} bits\n")
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    cache_paths = [os.path.join(args.cache_dir, _sequence_digest(args.prime, key, iv, args.bits) + '.json')
+                   for key, iv in sequences]
+    results = [{} if args.no_cache else _load_cache(path) for path in cache_paths]
+    pending = [(i, name) for i in range(args.sequences) for name in tests
+               if name not in results[i]]
+    print(f"  Cached   : {args.sequences * len(tests) - len(pending)} / "
+          f"{args.sequences * len(tests)} results")
 
-    rows = []
     t0 = time.time()
-    for name in run_tests:
-        t_test = time.time()
-        result = nistrng.run_by_name_battery(
-            name, bits, nistrng.SP800_22R1A_BATTERY, False
-        )
-        dt = time.time() - t_test
-
-        if result is None:
-            continue
-
-        # Result may be a nistrng.Result object or a tuple
-        if isinstance(result, nistrng.Result):
-            score = result.score
-            passed = result.passed
-        elif isinstance(result, tuple):
-            # (Result, elapsed) tuple wrapping
-            inner = result[0] if len(result) >= 1 else result
-            if isinstance(inner, nistrng.Result):
-                score = inner.score
-                passed = inner.passed
-            else:
-                score = float(result[-1]) if result else 0.0
-                passed = score >= 0.01
-        else:
-            continue
-
-        status = "PASS" if passed else "FAIL"
-        print(f"  [{status}] {name:40s}  "
-              f"p={score:.6f}  ({dt:.1f}s)")
-        rows.append({
-            "Test": name,
-            "P-Value": round(float(score), 6),
-            "Result": status
-        })
-
-    elapsed = time.time() - t0
-    print(f"\n  Total elapsed: {elapsed:.1f}s")
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(_run_test, args.prime, *sequences[i], args.bits, name): (i, name)
+                       for i, name in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                i, name = futures[future]
+                results[i][name] = future.result()
+                print(f"  [{done}/{len(pending)}] seq {i:<4} {name}", end='\r')
+        print()
+        for path, entry in zip(cache_paths, results):
+            _store_cache(path, entry)
+    print(f"  Total elapsed: {time.time() - t0:.1f}s\n")
+
+    rows = []
+    for name in tests:
+        applicable = [r[name] for r in results if r.get(name) is not None]
+        width = max(map(len, applicable), default=1)
+        for j in range(width):
+            label = name if width == 1 else f"{name} #{j + 1}"
+            row = {"Test": label, **_second_level([p[j] for p in applicable])}
+            rows.append(row)
+            print(f"  [{row['Result']}] {label:40s}  {row['Passed']}/{row['Sequences']}  "
+                  f"uniformity={row['Uniformity P']}")
     return pd.DataFrame(rows)
 
 
-def _save_report(df: pd.DataFrame, path: str):
+def _save_report(df: pd.DataFrame, path: str, args: argparse.Namespace):
     """Save results to a plain-text report file."""
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, 'w') as f:
         f.write("KHAN Cipher - NIST SP 800-22 Rev. 1a "
                 "Statistical Test Results\n")
         f.write("=" * 62 + "\n")
-        f.write(f"Stream length: {STREAM_LENGTH_BITS:,} bits\n")
-        skipped = ', '.join(SKIP_TESTS) if SKIP_TESTS else 'none'
-        f.write(f"Skipped tests: {skipped}\n\n")
+        f.write(f"Sequences: {args.sequences} x {args.bits:,} bits "
+                f"(seed {args.seed!r}, prime {args.prime})\n")
+        f.write(f"Local implementations: {', '.join(sorted(LOCAL_TESTS))}\n\n")
         f.write(df.to_string(index=False))
         f.write("\n\n")
         n_pass = len(df[df["Result"] == "PASS"])
-        n_total = len(df)
+        n_total = len(df[df["Result"] != "N/A"])
         f.write(f"Summary: {n_pass}/{n_total} tests passed.\n")
     print(f"\n[+] Report saved to {path}")
 
 
-def _parse_existing_report(path: str):
-    """Print an existing report file."""
-    with open(path, 'r') as f:
-        print(f.read())
+def _positive_int(text: str) -> int:
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
 
 
 def main():
+    parser = argparse.ArgumentParser(description="NIST SP 800-22 battery over KHAN keystream.")
+    parser.add_argument('--sequences', type=_positive_int, default=100)
+    parser.add_argument('--bits', type=_positive_int, default=STREAM_LENGTH_BITS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', default='khan-nist')
+    parser.add_argument('--prime', type=int, default=DEFAULT_PRIME)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true', help="ignore cached results")
+    parser.add_argument('--report', default=REPORT_PATH)
+    args = parser.parse_args()
+
     print("NIST SP 800-22 Statistical Test Suite")
     print("=" * 42 + "\n")
 
-    if os.path.exists(REPORT_PATH):
-        print(f"[i] Report found: {REPORT_PATH}\n")
-        _parse_existing_report(REPORT_PATH)
-    else:
-        print("[i] Generating keystream and running "
-              "full battery...\n")
-        bits = _generate_keystream_bits(STREAM_LENGTH_BITS)
-        df = _run_nist_battery(bits)
-        _save_report(df, REPORT_PATH)
-
-        failed = df[df["Result"] == "FAIL"]
-        if len(failed) > 0:
-            print(f"\n[-] {len(failed)} test(s) FAILED:")
-            for _, row in failed.iterrows():
-                print(f"    {row['Test']}: p={row['P-Value']}")
-        n = len(df)
-        n_pass = len(df[df["Result"] == "PASS"])
-        print(f"\n[*] Summary: {n_pass}/{n} NIST SP 800-22 "
-              "tests passed.")
+    df = _run_battery(args)
+    _save_report(df, args.report, args)
+
+    failed = df[df["Result"] == "FAIL"]
+    if len(failed) > 0:
+        print(f"\n[-] {len(failed)} test(s) FAILED:")
+        for _, row in failed.iterrows():
+            print(f"    {row['Test']}: {row['Passed']}/{row['Sequences']} passed, "
+                  f"uniformity={row['Uniformity P']}")
+    n = len(df[df["Result"] != "N/A"])
+    n_pass = len(df[df["Result"] == "PASS"])
+    print(f"\n[*] Summary: {n_pass}/{n} NIST SP 800-22 "
+          "tests passed.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,198 @@
+"""
+Throughput and latency benchmark suite.
+
+Times the keystream generator, the XOR kernel and full encrypt/decrypt
+for a range of message sizes, backends (the reference and optimized pure
+Python implementations and the ``ckhan`` extension) and prime sizes.  Every case runs in a fresh child process so
+the first call is genuinely cold (no cached pow10 tables, no warmed
+allocator) and peak RSS is attributable to that case alone.
+
+For each case the suite reports warm throughput (MB/s at the median),
+p50/p99 warm latency, cold first-call latency and peak RSS, writes them
+to JSON, and optionally compares warm throughput against a saved
+baseline, exiting non-zero if any case regressed.
+
+Usage:
+    python benchmarks/perf_suite.py [--max-size 1G] [--backends pure pure-optimized native]
+        [--output benchmarks/data/perf.json] [--baseline benchmarks/data/perf_baseline.json]
+        [--save-baseline]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+
+from khan_cipher import backends as khan_backends
+from khan_cipher import core
+from khan_cipher.primes import PRIME_REGISTRY
+
+SIZES = [64, 1024, 64 * 1024, 1 << 20, 16 << 20, 256 << 20, 1 << 30]
+OPERATIONS = ['keystream', 'xor', 'encrypt', 'decrypt']
+PRIMES = {p.bit_length(): p for p in PRIME_REGISTRY.values()}
+
+# Pure Python runs at roughly 0.5 MB/s; larger sizes would take hours.
+PURE_MAX_SIZE = 1 << 20
+
+
+def _parse_size(text: str) -> int:
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    if text[-1].upper() in units:
+        return int(text[:-1]) * units[text[-1].upper()]
+    return int(text)
+
+
+def _operation(op: str, size: int, prime: int):
+    """Return a zero-argument callable that performs one timed call."""
+    key = os.urandom(32)
+    data = os.urandom(size)
+    if op == 'keystream':
+        iv = os.urandom(16)
+        return lambda: core.new_keystream(key, prime, iv).generate(size)
+    if op == 'xor':
+        keystream = os.urandom(size)
+        return lambda: core._xor_bytes(data, keystream)
+    if op == 'encrypt':
+        return lambda: core.encrypt(data, key, prime)
+    payload = core.encrypt(data, key, prime)
+    return lambda: core.decrypt(payload, key, prime)
+
+
+def _run_case(op: str, backend: str, bits: int, size: int, repeat: int) -> dict:
+    """Body of one child process."""
+    with khan_backends.use_backend(backend):
+        call = _operation(op, size, PRIMES[bits])
+        core._pow10_table.cache_clear()
+
+        t0 = time.perf_counter()
+        call()
+        cold = time.perf_counter() - t0
+
+        samples = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - t0)
+
+    samples.sort()
+    p50 = statistics.median(samples)
+    p99 = samples[min(len(samples) - 1, int(round(0.99 * (len(samples) - 1))))]
+    return {
+        'operation': op,
+        'backend': backend,
+        'prime_bits': bits,
+        'size': size,
+        'repeat': repeat,
+        'mb_per_s': size / p50 / 1e6 if p50 > 0 else float('inf'),
+        'p50_ms': p50 * 1e3,
+        'p99_ms': p99 * 1e3,
+        'cold_ms': cold * 1e3,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _repeats(size: int, requested: int) -> int:
+    """Fewer repetitions for large sizes keep the suite's runtime bounded."""
+    if size >= 64 << 20:
+        return 3
+    if size >= 1 << 20:
+        return min(requested, 10)
+    return requested
+
+
+def _case_key(result: dict) -> str:
+    return f"{result['operation']}/{result['backend']}/{result['prime_bits']}/{result['size']}"
+
+
+def _compare(results: list[dict], baseline_path: str, tolerance: float) -> list[str]:
+    """Return descriptions of cases whose warm throughput regressed."""
+    with open(baseline_path) as f:
+        baseline = {_case_key(r): r for r in json.load(f)['results']}
+
+    regressions = []
+    for result in results:
+        old = baseline.get(_case_key(result))
+        if old is None:
+            continue
+        if result['mb_per_s'] < old['mb_per_s'] * (1 - tolerance):
+            regressions.append(
+                f"{_case_key(result)}: {result['mb_per_s']:.2f} MB/s "
+                f"vs baseline {old['mb_per_s']:.2f} MB/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-size', type=_parse_size, default=1 << 30)
+    parser.add_argument('--pure-max-size', type=_parse_size, default=PURE_MAX_SIZE)
+    parser.add_argument('--backends', nargs='+', default=list(khan_backends.AUTO_ORDER),
+                        choices=list(khan_backends.AUTO_ORDER))
+    parser.add_argument('--operations', nargs='+', default=OPERATIONS, choices=OPERATIONS)
+    parser.add_argument('--prime-bits', nargs='+', type=int, default=sorted(PRIMES),
+                        choices=sorted(PRIMES))
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', default='benchmarks/data/perf.json')
+    parser.add_argument('--baseline', default='benchmarks/data/perf_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed fractional throughput drop before flagging")
+    args = parser.parse_args()
+
+    available = khan_backends.available_backends()
+    backends = [name for name in args.backends if name in available]
+    for name in set(args.backends) - set(backends):
+        print(f"backend {name!r} is not available; skipping", file=sys.stderr)
+
+    context = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+    results = []
+    print(f"{'case':<36} {'MB/s':>10} {'p50 ms':>10} {'p99 ms':>10} "
+          f"{'cold ms':>10} {'RSS MB':>8}")
+    for op in args.operations:
+        for backend in backends:
+            limit = args.max_size if backend == 'native' else min(args.max_size, args.pure_max_size)
+            for bits in args.prime_bits:
+                for size in (s for s in SIZES if s <= limit):
+                    with context.Pool(1, maxtasksperchild=1) as pool:
+                        result = pool.apply(_run_case, (op, backend, bits, size,
+                                                        _repeats(size, args.repeat)))
+                    results.append(result)
+                    print(f"{_case_key(result):<36} {result['mb_per_s']:>10.2f} "
+                          f"{result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+                          f"{result['cold_ms']:>10.3f} {result['peak_rss_mb']:>8.1f}")
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        regressions = _compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+NIST SP 800-22 tests whose nistrng implementations are unusable.
+
+nistrng 1.2.3 gets three tests wrong:
+
+* random excursion (§2.14) adds every cycle with five or more visits to
+  all six visit classes, so any sequence of useful length scores p = 0;
+* random excursion variant (§2.15) returns "p-values" above 1;
+* non-overlapping template matching (§2.7) divides by the variance
+  squared, so p is always about 1, and draws its template from the
+  unseeded ``random`` module on every call.
+
+The versions here work on the whole sequence with NumPy and reproduce the
+worked examples of the specification.  Like ``linear_complexity_test`` they
+return ``(p-value(s), passed at alpha = 0.01)``; the random excursion tests
+return None for sequences with fewer than 500 cycles, for which §2.14.5
+says the test does not apply.
+"""
+
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+ALPHA = 0.01
+MIN_CYCLES = 500
+EXCURSION_STATES = (-4, -3, -2, -1, 1, 2, 3, 4)
+VARIANT_STATES = tuple(x for x in range(-9, 10) if x)
+DEFAULT_TEMPLATE = (0, 0, 0, 0, 0, 0, 0, 0, 1)
+
+
+def igamc(a: float, x: float) -> float:
+    """Regularized upper incomplete gamma Q(a, x) for half-integer a."""
+    if a * 2 != int(a * 2) or a <= 0:
+        raise ValueError("a must be a positive half-integer")
+    if a == int(a):
+        q, k = math.exp(-x), 1.0
+    else:
+        q, k = math.erfc(math.sqrt(x)), 0.5
+    while k < a:
+        q += x ** k * math.exp(-x) / math.gamma(k + 1)
+        k += 1
+    return q
+
+
+def _walk(bits: np.ndarray) -> tuple[np.ndarray, int]:
+    """The padded walk S' = 0, S_1, ..., S_n, 0 and its number of cycles J."""
+    steps = 2 * np.asarray(bits, dtype=np.int64) - 1
+    walk = np.concatenate(([0], np.cumsum(steps), [0]))
+    return walk, int(np.count_nonzero(walk == 0)) - 1
+
+
+def _visit_probabilities(x: int) -> np.ndarray:
+    """pi_k(x), k = 0..5: a cycle visits state x exactly k (k = 5: >= 5) times."""
+    q = 1 / (2 * abs(x))
+    pi = [1 - q] + [q * q * (1 - q) ** (k - 1) for k in range(1, 5)] + [q * (1 - q) ** 4]
+    return np.array(pi)
+
+
+def random_excursion_test(bits: np.ndarray) -> tuple[list[float], bool] | None:
+    """
+    SP 800-22 §2.14 random excursion test.
+
+    Returns:
+        (p-values for states -4..-1, 1..4, all passed), or None if the
+        walk has fewer than MIN_CYCLES cycles.
+    """
+    walk, cycles = _walk(bits)
+    if cycles < MIN_CYCLES:
+        return None
+    # Every non-zero state lies strictly inside a cycle; number them 0..J-1.
+    cycle_of = np.cumsum(walk == 0) - 1
+    p_values = []
+    for x in EXCURSION_STATES:
+        visits = np.bincount(cycle_of[walk == x], minlength=cycles)
+        nu = np.bincount(np.minimum(visits, 5), minlength=6)
+        expected = cycles * _visit_probabilities(x)
+        chi2 = float(((nu - expected) ** 2 / expected).sum())
+        p_values.append(igamc(5 / 2, chi2 / 2))
+    return p_values, min(p_values) >= ALPHA
+
+
+def random_excursion_variant_test(bits: np.ndarray) -> tuple[list[float], bool] | None:
+    """
+    SP 800-22 §2.15 random excursion variant test.
+
+    Returns:
+        (p-values for states -9..-1, 1..9, all passed), or None if the
+        walk has fewer than MIN_CYCLES cycles.
+    """
+    walk, cycles = _walk(bits)
+    if cycles < MIN_CYCLES:
+        return None
+    p_values = []
+    for x in VARIANT_STATES:
+        visits = int(np.count_nonzero(walk == x))
+        p_values.append(math.erfc(abs(visits - cycles) / math.sqrt(2 * cycles * (4 * abs(x) - 2))))
+    return p_values, min(p_values) >= ALPHA
+
+
+def non_overlapping_template_test(
+    bits: np.ndarray, template=DEFAULT_TEMPLATE, n_blocks: int = 8
+) -> tuple[float, bool]:
+    """
+    SP 800-22 §2.7 non-overlapping template matching test.
+
+    The template must be aperiodic (no proper prefix equal to a suffix):
+    its occurrences then never overlap, so counting every matching
+    window gives the count of the specification's skip-ahead scan.
+
+    Args:
+        bits: Sequence of 0/1 values.
+        template: Aperiodic m-bit template B (default 000000001).
+        n_blocks: N, the number of independent blocks.
+
+    Returns:
+        (p-value, passed at alpha = 0.01).
+    """
+    template = np.asarray(template, dtype=np.uint8)
+    m = len(template)
+    if any((template[k:] == template[:m - k]).all() for k in range(1, m)):
+        raise ValueError("Template must be aperiodic.")
+    bits = np.asarray(bits, dtype=np.uint8)
+    block_size = len(bits) // n_blocks
+    if block_size < m:
+        raise ValueError("Sequence is too short for the template.")
+
+    blocks = bits[:n_blocks * block_size].reshape(n_blocks, block_size)
+    windows = sliding_window_view(blocks, m, axis=1)
+    matches = (windows == template).all(axis=2).sum(axis=1)
+
+    mu = (block_size - m + 1) / 2 ** m
+    variance = block_size * (1 / 2 ** m - (2 * m - 1) / 2 ** (2 * m))
+    chi2 = float(((matches - mu) ** 2).sum() / variance)
+    p_value = igamc(n_blocks / 2, chi2 / 2)
+    return p_value, p_value >= ALPHA
@@ -16,6 +16,12 @@ setup(
     packages=find_packages(where='src'),
     package_dir={'': 'src'},
     ext_modules=[ckhan_ext],
+    entry_points={
+        'console_scripts': [
+            'khan=khan_cipher.cli:main',
+            'khan-keystream=khan_cipher.cli:keystream_main',
+        ],
+    },
     python_requires='>=3.8',
     install_requires=[
         'cryptography>=41.0.0',
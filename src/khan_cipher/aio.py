@@ -0,0 +1,408 @@
+"""
+asyncio integration.
+
+:func:`encrypt` and :func:`decrypt` run the cipher in an executor so large
+payloads do not stall the event loop.  With the native extension the
+keystream and XOR kernels release the GIL, so the default thread pool runs
+them truly in parallel with the loop; in pure-Python mode pass a
+``ProcessPoolExecutor`` to keep the loop responsive.
+
+:class:`EncryptingStreamWriter` and :class:`DecryptingStreamReader` wrap
+``asyncio.StreamWriter``/``StreamReader`` with the incremental
+:class:`~khan_cipher.stream.KhanEncryptor`/:class:`~khan_cipher.stream.KhanDecryptor`,
+processing one chunk at a time in a thread so a long transfer never holds
+the loop for more than a chunk's worth of scheduling.
+
+:class:`RecordStreamWriter` and :class:`RecordStreamReader` speak the
+record protocol of :mod:`khan_cipher.record`, for long-lived connections
+where each record must be delivered as soon as it is verified.  The reader
+opens several records concurrently while reading ahead, up to a bounded
+number of records.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from . import core
+from .compression import MAX_DECOMPRESSED_SIZE
+from .record import (
+    DEFAULT_RECORD_SIZE, INITIATOR, MAX_RECORD_SIZE, RESPONDER, RecordOpener, RecordSealer,
+)
+from .stream import DEFAULT_MAX_OUTPUT, KhanDecryptor, KhanEncryptor
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_default_executor: Executor | None = None
+
+
+def set_default_executor(executor: Executor | None) -> None:
+    """
+    Set the executor used when none is passed explicitly.
+
+    Args:
+        executor: Any ``concurrent.futures.Executor``, or None to use the
+            running loop's default thread pool.
+    """
+    global _default_executor
+    _default_executor = executor
+
+
+async def _run(executor: Executor | None, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def encrypt(
+    plaintext: bytes, key: bytes, prime: int | None = None,
+    workers: int | None = None, version: int = 1,
+    executor: Executor | None = None,
+    compression: str | int | None = None,
+    compress_threshold: int = core.COMPRESS_THRESHOLD,
+    parallel_threshold: int = core.PARALLEL_THRESHOLD,
+) -> bytes:
+    """
+    Asynchronous :func:`khan_cipher.core.encrypt`.
+
+    Args:
+        plaintext, key, prime, workers, version, compression,
+        compress_threshold, parallel_threshold: As for :func:`core.encrypt`.
+        executor: Executor to run in; defaults to the one set with
+            :func:`set_default_executor`, else the loop's thread pool.
+
+    Returns:
+        bytes: Encrypted payload.
+    """
+    if executor is None:
+        executor = _default_executor
+    return await _run(executor, core.encrypt, plaintext, key, prime,
+                      workers=workers, version=version, compression=compression,
+                      compress_threshold=compress_threshold,
+                      parallel_threshold=parallel_threshold)
+
+
+async def decrypt(
+    payload: bytes, key: bytes, prime: int | None = None,
+    workers: int | None = None, executor: Executor | None = None,
+    max_decompressed_size: int = MAX_DECOMPRESSED_SIZE,
+    parallel_threshold: int = core.PARALLEL_THRESHOLD,
+) -> bytes:
+    """
+    Asynchronous :func:`khan_cipher.core.decrypt`.
+
+    Raises:
+        KhanDecryptionError: If the payload is invalid or MAC fails.
+    """
+    if executor is None:
+        executor = _default_executor
+    return await _run(executor, core.decrypt, payload, key, prime, workers=workers,
+                      max_decompressed_size=max_decompressed_size,
+                      parallel_threshold=parallel_threshold)
+
+
+def _stream_executor(executor: Executor | None) -> Executor | None:
+    """Stream adapters keep state in-process, so they need threads."""
+    if executor is None:
+        executor = _default_executor
+    if executor is not None and not isinstance(executor, ThreadPoolExecutor):
+        return None
+    return executor
+
+
+class EncryptingStreamWriter:
+    """
+    Encrypts everything written to it onto an ``asyncio.StreamWriter``.
+
+    The output is one standard payload; the MAC is written by
+    :meth:`finalize` (or on leaving an ``async with`` block without an
+    error).
+
+    Args:
+        writer: The underlying ``asyncio.StreamWriter``.
+        key (bytes): The master cryptographic key.
+        prime (int | None): As for :class:`KhanEncryptor`.
+        version (int): Payload format, as for :func:`core.encrypt`.
+        chunk_size (int): Largest slice encrypted per executor call.
+        executor: Thread pool used for encryption (process pools cannot
+            share the running cipher state and fall back to the loop's
+            default thread pool).
+        compression (str | int | None): As for :class:`KhanEncryptor`.
+    """
+
+    def __init__(
+        self, writer: asyncio.StreamWriter, key: bytes, prime: int | None = None,
+        version: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+        executor: Executor | None = None, compression: str | int | None = None,
+    ):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self._writer = writer
+        self._encryptor = KhanEncryptor(key, prime, version, compression)
+        self._chunk_size = chunk_size
+        self._executor = _stream_executor(executor)
+
+    async def write(self, data: bytes) -> None:
+        """Encrypt data, write it and wait for the transport to drain."""
+        view = memoryview(data)
+        for start in range(0, len(view), self._chunk_size):
+            chunk = view[start:start + self._chunk_size]
+            self._writer.write(await _run(self._executor, self._encryptor.update, chunk))
+            await self._writer.drain()
+
+    async def finalize(self) -> None:
+        """
+        Write the trailing MAC.
+
+        Raises:
+            ValueError: If nothing was written.
+        """
+        self._writer.write(await _run(self._executor, self._encryptor.finalize))
+        await self._writer.drain()
+
+    async def __aenter__(self) -> 'EncryptingStreamWriter':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.finalize()
+
+
+class DecryptingStreamReader:
+    """
+    Decrypts a payload read from an ``asyncio.StreamReader``.
+
+    :meth:`read` returns plaintext as it arrives and verifies the MAC when
+    the underlying stream reaches EOF.  As with :class:`KhanDecryptor`,
+    plaintext is unauthenticated until the final :meth:`read` returns
+    ``b''`` without raising.  The MAC check and, for a compressed payload,
+    the decompression of its buffered tail run in the executor; the tail
+    is then handed out at most ``max_output`` bytes per :meth:`read`.
+
+    Args:
+        reader: The underlying ``asyncio.StreamReader``.
+        key (bytes): The symmetric master key.
+        prime (int | None): As for :class:`KhanDecryptor`.
+        version (int | None): As for :class:`KhanDecryptor`.
+        chunk_size (int): Bytes read from the stream per step.
+        executor: Thread pool used for decryption.
+        max_output (int): Largest block of decompressed plaintext one
+            :meth:`read` returns, as for :class:`KhanDecryptor`.
+        max_decompressed_size (int): As for :class:`KhanDecryptor`.
+    """
+
+    def __init__(
+        self, reader: asyncio.StreamReader, key: bytes, prime: int | None = None,
+        version: int | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+        executor: Executor | None = None, max_output: int = DEFAULT_MAX_OUTPUT,
+        max_decompressed_size: int = MAX_DECOMPRESSED_SIZE,
+    ):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if max_output <= 0:
+            raise ValueError("max_output must be positive")
+        self._reader = reader
+        self._decryptor = KhanDecryptor(key, prime, version, max_output=max_output,
+                                        max_decompressed_size=max_decompressed_size)
+        self._chunk_size = chunk_size
+        self._max_output = max_output
+        self._executor = _stream_executor(executor)
+        self._done = False
+        self._tail = memoryview(b'')
+
+    async def read(self) -> bytes:
+        """
+        Return the next block of plaintext, or ``b''`` at the end.
+
+        Raises:
+            KhanDecryptionError: At the end of the stream, if the payload
+                is truncated or the MAC does not match.
+        """
+        while not self._done:
+            data = await self._reader.read(self._chunk_size)
+            if not data:
+                self._done = True
+                self._tail = memoryview(await _run(self._executor, self._decryptor.finalize))
+                break
+            plaintext = await _run(self._executor, self._decryptor.update, data)
+            if plaintext:
+                return plaintext
+        block, self._tail = self._tail[:self._max_output], self._tail[self._max_output:]
+        return bytes(block)
+
+    async def readall(self) -> bytes:
+        """Read and verify the whole payload."""
+        parts = []
+        while True:
+            block = await self.read()
+            if not block:
+                return b''.join(parts)
+            parts.append(block)
+
+    def __aiter__(self) -> 'DecryptingStreamReader':
+        return self
+
+    async def __anext__(self) -> bytes:
+        block = await self.read()
+        if not block:
+            raise StopAsyncIteration
+        return block
+
+
+class RecordStreamWriter:
+    """
+    Sends data as framed records (see :mod:`khan_cipher.record`) on an
+    ``asyncio.StreamWriter``.
+
+    Each :meth:`write` is flushed as complete records, so the peer can
+    deliver it without waiting for the rest of the stream.  :meth:`close`
+    (or leaving an ``async with`` block without an error) sends the final
+    record.
+
+    Args:
+        writer: The underlying ``asyncio.StreamWriter``.
+        key (bytes): The master cryptographic key.
+        prime (int | None): As for :class:`~khan_cipher.record.RecordSealer`.
+        record_size (int): Largest plaintext per record.
+        executor: Thread pool used for sealing.
+        role (str): This endpoint's role, as for
+            :class:`~khan_cipher.record.RecordSealer`.  On a two-way
+            connection, give the writer and the reader of one end the
+            same role and the other end the opposite one.
+    """
+
+    def __init__(
+        self, writer: asyncio.StreamWriter, key: bytes, prime: int | None = None,
+        record_size: int = DEFAULT_RECORD_SIZE, executor: Executor | None = None,
+        role: str = INITIATOR,
+    ):
+        if not 0 < record_size <= MAX_RECORD_SIZE:
+            raise ValueError(f"record_size must be in (0, {MAX_RECORD_SIZE}]")
+        self._writer = writer
+        self._sealer = RecordSealer(key, prime, role)
+        self._record_size = record_size
+        self._executor = _stream_executor(executor)
+        self._header_sent = False
+
+    def _send_header(self) -> None:
+        if not self._header_sent:
+            self._header_sent = True
+            self._writer.write(self._sealer.header)
+
+    async def write(self, data: bytes) -> None:
+        """Seal data into records, write them and wait for the transport to drain."""
+        self._send_header()
+        view = memoryview(data)
+        for start in range(0, len(view), self._record_size):
+            chunk = view[start:start + self._record_size]
+            # The transport sends record i while record i + 1 is sealed.
+            self._writer.write(await _run(self._executor, self._sealer.seal, chunk))
+        await self._writer.drain()
+
+    async def close(self) -> None:
+        """Send the final record (the underlying writer is left open)."""
+        self._send_header()
+        self._writer.write(self._sealer.close())
+        await self._writer.drain()
+
+    async def __aenter__(self) -> 'RecordStreamWriter':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.close()
+
+
+class RecordStreamReader:
+    """
+    Receives framed records (see :mod:`khan_cipher.record`) from an
+    ``asyncio.StreamReader``.
+
+    A background task reads and frames records and starts verifying each
+    in the executor as soon as it is complete; :meth:`read` returns their
+    plaintext in order.  At most ``prefetch`` records are held ahead of
+    the consumer, so buffering is bounded by ``prefetch`` times the
+    largest record.
+
+    Args:
+        reader: The underlying ``asyncio.StreamReader``.
+        key (bytes): The symmetric master key.
+        prime (int | None): As for :class:`~khan_cipher.record.RecordOpener`.
+        max_record_size (int): Largest record accepted.
+        prefetch (int): Records read and opened ahead of :meth:`read`.
+        chunk_size (int): Bytes read from the stream per step.
+        executor: Thread pool used for verification and decryption.
+        role (str): This endpoint's role, as for
+            :class:`~khan_cipher.record.RecordOpener`.
+    """
+
+    def __init__(
+        self, reader: asyncio.StreamReader, key: bytes, prime: int | None = None,
+        max_record_size: int = MAX_RECORD_SIZE, prefetch: int = 4,
+        chunk_size: int = DEFAULT_CHUNK_SIZE, executor: Executor | None = None,
+        role: str = RESPONDER,
+    ):
+        if prefetch <= 0 or chunk_size <= 0:
+            raise ValueError("prefetch and chunk_size must be positive")
+        self._reader = reader
+        self._opener = RecordOpener(key, prime, max_record_size, role)
+        self._chunk_size = chunk_size
+        self._executor = _stream_executor(executor)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+        self._task: asyncio.Task | None = None
+        self._done = False
+
+    async def _pump(self) -> None:
+        """Frame incoming records and queue their pending plaintext."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                data = await self._reader.read(self._chunk_size)
+                if not data:
+                    await self._queue.put(None)
+                    return
+                for record in self._opener.feed_raw(data):
+                    await self._queue.put((record.final, loop.run_in_executor(
+                        self._executor, self._opener.open, record)))
+                    if record.final:
+                        return
+        except Exception as exc:
+            failed = loop.create_future()
+            failed.set_exception(exc)
+            await self._queue.put((False, failed))
+
+    async def read(self) -> bytes:
+        """
+        Return the plaintext of the next non-empty record, or ``b''`` after
+        the final record.
+
+        Raises:
+            KhanDecryptionError: If a record fails verification, arrives out
+                of order, or the stream ends without the final record.
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._pump())
+        while not self._done:
+            item = await self._queue.get()
+            if item is None:
+                self._done = True
+                raise core.KhanDecryptionError("Stream ended before the final record.")
+            final, pending = item
+            try:
+                plaintext = await pending
+            except Exception:
+                self._done = True
+                self._task.cancel()
+                raise
+            self._done = final
+            if plaintext:
+                return plaintext
+        return b''
+
+    def __aiter__(self) -> 'RecordStreamReader':
+        return self
+
+    async def __anext__(self) -> bytes:
+        block = await self.read()
+        if not block:
+            raise StopAsyncIteration
+        return block
@@ -0,0 +1,142 @@
+"""
+Backend registry.
+
+A backend supplies the three primitives everything else is built on:
+a keystream factory, an XOR returning a new buffer and an in-place XOR.
+:mod:`khan_cipher.core` registers the built-in backends when imported:
+
+``native``
+    The ``ckhan`` C++ extension (only if it was built).  Releases the GIL.
+``pure-optimized``
+    Pure Python with the keystream loop in local variables, a reused
+    ``hashlib`` template and whole-buffer ``int.from_bytes`` XOR.
+``pure``
+    The reference implementation, kept for verification.
+
+The active backend is chosen, in order, by :func:`set_backend`, the
+``KHAN_BACKEND`` environment variable, or auto-detection (the first
+available of native, pure-optimized, pure).  All backends produce
+identical output.
+"""
+
+import os
+from collections.abc import Callable
+from contextlib import contextmanager
+from typing import NamedTuple
+
+AUTO_ORDER = ('native', 'pure-optimized', 'pure')
+
+
+class Backend(NamedTuple):
+    """The primitives of one implementation.
+
+    Attributes:
+        name: Registry name.
+        new_keystream: ``(key, prime, iv) -> generator`` with
+            ``generate(n)``, ``readinto(buffer)`` and ``getstate()``.
+        keystream_from_state: ``(prime, position, current_rem,
+            previous_hash) -> generator`` resuming a saved state.
+        xor: ``(data, keystream) -> bytes`` for equal-length buffers.
+        xor_into: ``(dst, src) -> None``, XOR src into writable dst.
+        releases_gil: True if the primitives run without the GIL, so
+            threads scale across cores.
+    """
+    name: str
+    new_keystream: Callable
+    keystream_from_state: Callable
+    xor: Callable
+    xor_into: Callable
+    releases_gil: bool = False
+
+
+_registry: dict[str, Backend] = {}
+_active: Backend | None = None
+
+
+def _ensure_registered() -> None:
+    # The built-in backends are registered by core at import time.
+    from . import core  # noqa: F401
+
+
+def register_backend(backend: Backend) -> None:
+    """Add (or replace) a backend under ``backend.name``."""
+    _registry[backend.name] = backend
+
+
+def available_backends() -> list[str]:
+    """Names of all registered backends."""
+    _ensure_registered()
+    return list(_registry)
+
+
+def get_backend(name: str | None = None) -> Backend:
+    """
+    Look up a backend by name, or return the active one.
+
+    Raises:
+        ValueError: If no backend of that name is registered.
+    """
+    if name is None:
+        return current()
+    _ensure_registered()
+    try:
+        return _registry[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown or unavailable backend {name!r}; "
+            f"available: {', '.join(_registry)}.") from None
+
+
+def _auto() -> Backend:
+    requested = os.environ.get('KHAN_BACKEND')
+    if requested:
+        return get_backend(requested)
+    _ensure_registered()
+    for name in AUTO_ORDER:
+        if name in _registry:
+            return _registry[name]
+    raise RuntimeError("No KHAN backend is registered.")
+
+
+def current() -> Backend:
+    """The active backend."""
+    global _active
+    if _active is None:
+        _active = _auto()
+    return _active
+
+
+def set_backend(name: str | None) -> Backend:
+    """
+    Select the process-wide backend.
+
+    Args:
+        name: A registered backend name, or None to return to
+            ``KHAN_BACKEND`` / auto-detection.
+
+    Returns:
+        Backend: The newly active backend.
+
+    Raises:
+        ValueError: If the backend is not available.
+    """
+    global _active
+    _active = None if name is None else get_backend(name)
+    return current()
+
+
+@contextmanager
+def use_backend(name: str):
+    """
+    Temporarily select a backend.
+
+    The selection is process-wide, so this is meant for tests and
+    benchmarks rather than for code running concurrently in threads.
+    """
+    global _active
+    previous = _active
+    set_backend(name)
+    try:
+        yield current()
+    finally:
+        _active = previous
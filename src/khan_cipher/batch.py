@@ -0,0 +1,165 @@
+"""
+Batch encryption of many small messages.
+
+For ~200-byte messages the fixed per-call cost of :func:`core.encrypt`
+(two ``os.urandom`` syscalls, two fresh HMAC key schedules) dominates.
+:func:`encrypt_many` draws every salt and IV from a single ``os.urandom``
+read and clones one pre-keyed HMAC state for both key derivation and the
+payload MAC.  Each result is an ordinary payload readable by
+:func:`core.decrypt`.
+
+Results can be returned as a list or as one packed buffer of
+length-prefixed payloads::
+
+    [Len(4) | Payload_0 | Len(4) | Payload_1 | ...]
+"""
+
+import hmac
+import os
+import struct
+from collections.abc import Iterable, Sequence
+
+from .core import (
+    KhanDecryptionError,
+    SEGMENTED_MAGIC,
+    decrypt,
+    _mac_template,
+    _open,
+    _seal,
+)
+from .primes import DEFAULT_PRIME
+
+_LENGTH = struct.Struct('>I')
+
+
+def pack_payloads(payloads: Iterable[bytes]) -> bytes:
+    """Join payloads into one buffer of 4-byte length-prefixed records."""
+    parts = []
+    for payload in payloads:
+        parts.append(_LENGTH.pack(len(payload)))
+        parts.append(payload)
+    return b''.join(parts)
+
+
+def unpack_payloads(packed: bytes) -> list[memoryview]:
+    """
+    Split a buffer produced by :func:`pack_payloads`.
+
+    Returns:
+        list[memoryview]: Zero-copy views of each payload.
+
+    Raises:
+        KhanDecryptionError: If the buffer is truncated.
+    """
+    view = memoryview(packed)
+    payloads = []
+    offset = 0
+    while offset < len(view):
+        if offset + _LENGTH.size > len(view):
+            raise KhanDecryptionError("Packed batch is truncated.")
+        (length,) = _LENGTH.unpack_from(view, offset)
+        offset += _LENGTH.size
+        if offset + length > len(view):
+            raise KhanDecryptionError("Packed batch is truncated.")
+        payloads.append(view[offset:offset + length])
+        offset += length
+    return payloads
+
+
+def encrypt_many(
+    messages: Sequence[bytes],
+    key: bytes,
+    prime: int | None = None,
+    packed: bool = False,
+    version: int = 1,
+) -> list[bytes] | bytes:
+    """
+    Encrypts a batch of messages under one master key.
+
+    Args:
+        messages (Sequence[bytes]): The plaintexts (str is UTF-8 encoded).
+        key (bytes): The master cryptographic key (should be 32 bytes).
+        prime (int | None): An explicit full reptend prime, or None to
+            use (and embed) the default 128-bit prime.
+        packed (bool): Return one length-prefixed buffer instead of a list.
+        version (int): Payload format, as for :func:`core.encrypt`.
+
+    Returns:
+        list[bytes] | bytes: One standard payload per message, in order.
+
+    Raises:
+        ValueError: If any message is empty or version is unsupported.
+    """
+    return _encrypt_batch(_mac_template(key), messages, prime, packed, version)
+
+
+def _encrypt_batch(
+    mac_key: hmac.HMAC, messages: Sequence[bytes], prime: int | None, packed: bool,
+    version: int = 1
+) -> list[bytes] | bytes:
+    """Batch encryption with a pre-keyed HMAC template (see core._seal)."""
+    embed_prime = prime is None
+    if prime is None:
+        prime = DEFAULT_PRIME
+
+    randomness = memoryview(os.urandom(32 * len(messages)))
+
+    payloads = []
+    for i, message in enumerate(messages):
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        if not message:
+            raise ValueError(f"Plaintext cannot be empty (message {i}).")
+        salt = bytes(randomness[32 * i:32 * i + 16])
+        iv = bytes(randomness[32 * i + 16:32 * i + 32])
+        payloads.append(_seal(message, mac_key, salt, iv, prime, embed_prime, version))
+
+    return pack_payloads(payloads) if packed else payloads
+
+
+def decrypt_many(
+    payloads: Iterable[bytes] | bytes,
+    key: bytes,
+    prime: int | None = None,
+    strict: bool = True,
+) -> list[bytes | None]:
+    """
+    Decrypts a batch of payloads under one master key.
+
+    Args:
+        payloads: A list of payloads, or a packed buffer from
+            :func:`encrypt_many` (``packed=True``).
+        key (bytes): The symmetric master key.
+        prime (int | None): Explicit prime override for legacy payloads.
+        strict (bool): If True, raise on the first invalid payload;
+            otherwise return None in its place.
+
+    Returns:
+        list[bytes | None]: The plaintexts, in order.
+
+    Raises:
+        KhanDecryptionError: If ``strict`` and any payload fails to verify.
+    """
+    return _decrypt_batch(_mac_template(key), key, payloads, prime, strict)
+
+
+def _decrypt_batch(
+    mac_key: hmac.HMAC, key: bytes, payloads: Iterable[bytes] | bytes,
+    prime: int | None, strict: bool
+) -> list[bytes | None]:
+    """Batch decryption with a pre-keyed HMAC template (see core._open)."""
+    if isinstance(payloads, (bytes, bytearray, memoryview)):
+        payloads = unpack_payloads(payloads)
+
+    results: list[bytes | None] = []
+    for payload in payloads:
+        try:
+            if payload[:len(SEGMENTED_MAGIC)] == SEGMENTED_MAGIC:
+                results.append(decrypt(bytes(payload), key, prime))
+            else:
+                results.append(_open(payload, mac_key, prime))
+        except KhanDecryptionError:
+            if strict:
+                raise
+            results.append(None)
+    return results
@@ -0,0 +1,270 @@
+"""
+Command-line interface for the KHAN cipher.
+
+Usage::
+
+    khan encrypt SRC DST --key-file master.key [--stats]
+    khan decrypt SRC DST --key-hex 00112233... [--stats] [--max-decompressed-size 4G]
+    khan primes refill --pool primes.json --bits 1024 --count 8 --workers 8
+    khan primes pop --pool primes.json --bits 1024
+
+    khan-keystream --bytes 1G --key-hex 00112233... | dieharder -a -g 200
+    khan-keystream --streams 8 --bytes 256M -o stream-{i}.bin
+
+The master key is read from ``--key-file`` (raw bytes), ``--key-hex`` or
+the ``KHAN_KEY`` environment variable (hex).
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import KhanDecryptionError, new_keystream
+from .compression import MAX_DECOMPRESSED_SIZE
+from .fileio import DEFAULT_CHUNK_SIZE, encrypt_file, decrypt_file
+from .primes import DEFAULT_PRIME, PrimePool, PrimePoolEmpty, generate_full_reptend_prime
+
+KEYSTREAM_CHUNK_SIZE = 1 << 20
+
+
+def _load_key(args: argparse.Namespace) -> bytes:
+    """Resolve the master key from the CLI arguments or environment."""
+    if args.key_file:
+        with open(args.key_file, 'rb') as f:
+            return f.read()
+    key_hex = args.key_hex or os.environ.get('KHAN_KEY')
+    if not key_hex:
+        raise ValueError(
+            "No key given: use --key-file, --key-hex or set KHAN_KEY.")
+    return bytes.fromhex(key_hex)
+
+
+def _add_key_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--key-file', help="file containing the raw master key")
+    group.add_argument('--key-hex', help="master key as a hex string")
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='khan', description="KHAN stream cipher tool.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    for name in ('encrypt', 'decrypt'):
+        cmd = sub.add_parser(name, help=f"{name} a file")
+        cmd.add_argument('src', help="input file")
+        cmd.add_argument('dst', help="output file")
+        _add_key_arguments(cmd)
+        cmd.add_argument('--prime', type=int, default=None,
+                         help="explicit full reptend prime (not embedded)")
+        cmd.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                         help="bytes processed per step")
+        cmd.add_argument('--stats', action='store_true',
+                         help="report throughput when done")
+        if name == 'decrypt':
+            cmd.add_argument('--max-decompressed-size', type=_parse_size,
+                             default=MAX_DECOMPRESSED_SIZE,
+                             help="largest plaintext a compressed payload may "
+                                  "inflate to (K/M/G/T suffixes allowed)")
+
+    primes = sub.add_parser('primes', help="generate or pool full reptend primes")
+    primes.add_argument('action', choices=('generate', 'refill', 'pop'))
+    primes.add_argument('--pool', help="prime pool file (refill/pop)")
+    primes.add_argument('--bits', type=int, default=128)
+    primes.add_argument('--count', type=int, default=16,
+                        help="pool size to refill up to")
+    primes.add_argument('--workers', type=int, default=None,
+                        help="processes used for the search")
+    return parser
+
+
+def _report(verb: str, n_bytes: int, elapsed: float) -> None:
+    rate = n_bytes / elapsed / 1e6 if elapsed > 0 else float('inf')
+    print(f"{verb} {n_bytes:,} bytes in {elapsed:.3f}s ({rate:.2f} MB/s)",
+          file=sys.stderr)
+
+
+def _run_file_command(args: argparse.Namespace) -> int:
+    key = _load_key(args)
+    t0 = time.perf_counter()
+    if args.command == 'encrypt':
+        n_bytes = encrypt_file(args.src, args.dst, key,
+                               prime=args.prime, chunk_size=args.chunk_size)
+    else:
+        n_bytes = decrypt_file(args.src, args.dst, key,
+                               prime=args.prime, chunk_size=args.chunk_size,
+                               max_decompressed_size=args.max_decompressed_size)
+    elapsed = time.perf_counter() - t0
+
+    if args.stats:
+        verb = 'Encrypted' if args.command == 'encrypt' else 'Decrypted'
+        _report(verb, n_bytes, elapsed)
+    return 0
+
+
+def _run_primes_command(args: argparse.Namespace) -> int:
+    if args.action == 'generate':
+        print(generate_full_reptend_prime(args.bits, workers=args.workers))
+        return 0
+
+    if not args.pool:
+        raise ValueError(f"'primes {args.action}' requires --pool.")
+    pool = PrimePool(args.pool)
+    if args.action == 'refill':
+        added = pool.refill(args.bits, args.count, workers=args.workers)
+        print(f"Added {added} prime(s); pool holds {pool.size(args.bits)} "
+              f"{args.bits}-bit prime(s).", file=sys.stderr)
+    else:
+        print(pool.pop(args.bits))
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Entry point for the ``khan`` console script."""
+    args = _build_parser().parse_args(argv)
+
+    try:
+        if args.command == 'primes':
+            return _run_primes_command(args)
+        return _run_file_command(args)
+    except (KhanDecryptionError, PrimePoolEmpty, ValueError, OSError) as e:
+        print(f"khan: error: {e}", file=sys.stderr)
+        return 1
+
+
+def _parse_size(text: str) -> int:
+    """Parse a byte count with an optional K/M/G/T suffix (powers of 1024)."""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    suffix = text[-1:].upper()
+    try:
+        if suffix in units:
+            return int(text[:-1]) * units[suffix]
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}") from None
+
+
+def _build_keystream_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='khan-keystream',
+        description="Write raw KHAN keystream to stdout or files.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--key-file', help="file containing the raw keystream key")
+    group.add_argument('--key-hex', help="keystream key as a hex string")
+    parser.add_argument('--iv-hex', help="16-byte IV as hex (random if omitted)")
+    parser.add_argument('--prime', type=int, default=DEFAULT_PRIME,
+                        help="full reptend prime (default: the 128-bit default prime)")
+    parser.add_argument('-n', '--bytes', type=_parse_size, default=None,
+                        help="bytes per stream, e.g. 1G (default: unlimited)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="output file, '-' for stdout; with --streams, "
+                             "a pattern containing {i} writes one file per stream")
+    parser.add_argument('--streams', type=int, default=1,
+                        help="independent streams (IV, IV+1, ...) generated in parallel")
+    parser.add_argument('--chunk-size', type=_parse_size, default=KEYSTREAM_CHUNK_SIZE)
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="do not print the key and IV to stderr")
+    return parser
+
+
+def _keystream_key(args: argparse.Namespace) -> bytes:
+    if args.key_file:
+        with open(args.key_file, 'rb') as f:
+            return f.read()
+    if args.key_hex:
+        return bytes.fromhex(args.key_hex)
+    return os.urandom(32)
+
+
+def _stream_ivs(iv: bytes, count: int) -> list[bytes]:
+    base = int.from_bytes(iv, 'big')
+    return [((base + i) % (1 << 128)).to_bytes(16, 'big') for i in range(count)]
+
+
+def _chunk_sizes(limit: int | None, chunk_size: int):
+    """Yield chunk lengths until limit bytes (forever if limit is None)."""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        n = chunk_size if remaining is None else min(chunk_size, remaining)
+        yield n
+        if remaining is not None:
+            remaining -= n
+
+
+def _write_stream(ksg, out, limit: int | None, chunk_size: int) -> None:
+    buffer = memoryview(bytearray(chunk_size))
+    for n in _chunk_sizes(limit, chunk_size):
+        ksg.readinto(buffer[:n])
+        out.write(buffer[:n])
+
+
+def _write_interleaved(generators, out, limit: int | None, chunk_size: int) -> None:
+    """Write one chunk from each stream in turn, filling them in parallel."""
+    buffers = [memoryview(bytearray(chunk_size)) for _ in generators]
+    with ThreadPoolExecutor(len(generators)) as pool:
+        for n in _chunk_sizes(limit, chunk_size):
+            views = [b[:n] for b in buffers]
+            list(pool.map(lambda pair: pair[0].readinto(pair[1]), zip(generators, views)))
+            for view in views:
+                out.write(view)
+
+
+def _run_keystream(args: argparse.Namespace) -> int:
+    if args.streams < 1:
+        raise ValueError("--streams must be at least 1.")
+    if args.chunk_size < 1:
+        raise ValueError("--chunk-size must be positive.")
+    key = _keystream_key(args)
+    iv = bytes.fromhex(args.iv_hex) if args.iv_hex else os.urandom(16)
+    if len(iv) != 16:
+        raise ValueError("--iv-hex must be 16 bytes.")
+    ivs = _stream_ivs(iv, args.streams)
+    generators = [new_keystream(key, args.prime, stream_iv) for stream_iv in ivs]
+    if not args.quiet:
+        print(f"key={key.hex()} iv={iv.hex()} prime={args.prime} streams={args.streams}",
+              file=sys.stderr)
+
+    if args.streams > 1 and '{i}' in args.output:
+        def run(i: int) -> None:
+            with open(args.output.format(i=i), 'wb') as out:
+                _write_stream(generators[i], out, args.bytes, args.chunk_size)
+
+        with ThreadPoolExecutor(args.streams) as pool:
+            list(pool.map(run, range(args.streams)))
+        return 0
+
+    if args.output == '-':
+        out = sys.stdout.buffer
+    else:
+        out = open(args.output, 'wb')
+    try:
+        if args.streams == 1:
+            _write_stream(generators[0], out, args.bytes, args.chunk_size)
+        else:
+            _write_interleaved(generators, out, args.bytes, args.chunk_size)
+        out.flush()
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return 0
+
+
+def keystream_main(argv: list[str] | None = None) -> int:
+    """Entry point for the ``khan-keystream`` console script."""
+    args = _build_keystream_parser().parse_args(argv)
+    try:
+        return _run_keystream(args)
+    except BrokenPipeError:
+        # The consumer (e.g. dieharder) closed the pipe: a normal way to stop.
+        # Point stdout at devnull so the interpreter's final flush is silent.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except (ValueError, OSError) as e:
+        print(f"khan-keystream: error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
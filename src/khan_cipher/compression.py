@@ -0,0 +1,177 @@
+"""
+Compression codecs for version 2 payloads.
+
+Keystream generation is by far the most expensive per-byte step, so
+compressing before encryption cuts the work (and the payload) roughly by
+the compression ratio.  The codec is named by a 3-bit ID in the version 2
+header flags; ``zlib`` (1) and ``lzma`` (2) are built in and IDs 3-7 are
+free for :func:`register_codec`.
+
+A codec is a pair of factories for incremental (de)compressor objects
+with the ``zlib``/``lzma`` interface, so the same codec serves one-shot and
+streaming encryption.  Decompression always goes through
+:class:`Decompressor`, which caps both the output of each call and the
+total, so a small hostile payload cannot expand without bound.
+"""
+
+import lzma
+import zlib
+from collections.abc import Callable
+from typing import NamedTuple
+
+MAX_CODEC_ID = 7
+# Default cap on the decompressed size of one payload.
+MAX_DECOMPRESSED_SIZE = 1 << 30
+# What a decompressor may raise on corrupt input; custom codecs should raise ValueError.
+DECOMPRESSION_ERRORS = (zlib.error, lzma.LZMAError, ValueError)
+
+
+class Codec(NamedTuple):
+    """A registered compression codec.
+
+    Attributes:
+        id: Wire ID, 1 to ``MAX_CODEC_ID``.
+        name: Registry name.
+        compressor: Returns a new object with ``compress(data)`` and
+            ``flush()``.
+        decompressor: Returns a new object with ``decompress(data,
+            max_length)``, ``eof`` and ``unused_data`` attributes, and
+            either an ``unconsumed_tail`` attribute (``zlib`` style) or
+            internal buffering of unconsumed input (``lzma`` style).
+    """
+    id: int
+    name: str
+    compressor: Callable
+    decompressor: Callable
+
+
+CODECS: dict[int, Codec] = {}
+
+
+def register_codec(
+    codec_id: int, name: str, compressor: Callable, decompressor: Callable
+) -> Codec:
+    """
+    Register a codec under a wire ID.
+
+    Both ends of a connection must register the same codec under the same
+    ID.
+
+    Raises:
+        ValueError: If the ID is out of range or taken by another codec.
+    """
+    if not 1 <= codec_id <= MAX_CODEC_ID:
+        raise ValueError(f"Codec IDs must be in [1, {MAX_CODEC_ID}].")
+    existing = CODECS.get(codec_id)
+    if existing is not None and existing.name != name:
+        raise ValueError(f"Codec ID {codec_id} is already used by {existing.name!r}.")
+    codec = CODECS[codec_id] = Codec(codec_id, name, compressor, decompressor)
+    return codec
+
+
+def get_codec(codec: str | int) -> Codec:
+    """
+    Look up a codec by name or wire ID.
+
+    Raises:
+        ValueError: If no such codec is registered.
+    """
+    for registered in CODECS.values():
+        if codec in (registered.id, registered.name):
+            return registered
+    raise ValueError(f"Unknown compression codec {codec!r}.")
+
+
+def compress(codec: Codec, data) -> bytes:
+    """Compress data in one shot."""
+    compressor = codec.compressor()
+    return compressor.compress(data) + compressor.flush()
+
+
+class DecompressionLimitError(ValueError):
+    """Decompressed data would exceed the allowed size."""
+
+
+class Decompressor:
+    """
+    Incremental decompression with bounded output.
+
+    Input that would expand past the ``max_length`` of a call stays
+    buffered in compressed form; :attr:`pending` tells whether calling
+    :meth:`decompress` without new input would return more.
+
+    Args:
+        codec (Codec): The codec the data was compressed with.
+        max_size (int): Total output allowed; more is an error.
+    """
+
+    def __init__(self, codec: Codec, max_size: int = MAX_DECOMPRESSED_SIZE):
+        self.codec = codec
+        self._obj = codec.decompressor()
+        self._tail = b''
+        self._full = False
+        self._remaining = max_size
+
+    @property
+    def eof(self) -> bool:
+        """True once the end of the compressed stream has been reached."""
+        return self._obj.eof
+
+    @property
+    def pending(self) -> bool:
+        """True if output may be available without further input."""
+        return not self._obj.eof and (bool(self._tail) or self._full)
+
+    def decompress(self, data, max_length: int) -> bytes:
+        """
+        Feed data and return at most ``max_length`` bytes of output.
+
+        Raises:
+            ValueError: If the data is corrupt or continues past the end
+                of the compressed stream.
+            DecompressionLimitError: If it expands past ``max_size``.
+        """
+        obj = self._obj
+        if obj.eof:
+            if data:
+                raise ValueError(f"Data after the end of the {self.codec.name} stream.")
+            return b''
+        limit = min(max_length, self._remaining + 1)
+        try:
+            if hasattr(obj, 'unconsumed_tail'):
+                out = obj.decompress(self._tail + bytes(data), limit)
+                self._tail = obj.unconsumed_tail
+            elif data or not obj.needs_input:
+                out = obj.decompress(data, limit)
+            else:
+                out = b''
+        except DECOMPRESSION_ERRORS as e:
+            raise ValueError(f"Corrupt {self.codec.name} data: {e}") from None
+        if len(out) > self._remaining:
+            raise DecompressionLimitError(
+                f"Decompressed {self.codec.name} data exceeds the size limit.")
+        if obj.eof and obj.unused_data:
+            raise ValueError(f"Data after the end of the {self.codec.name} stream.")
+        self._remaining -= len(out)
+        self._full = len(out) == limit
+        return out
+
+
+def decompress(codec: Codec, data, max_size: int = MAX_DECOMPRESSED_SIZE) -> bytes:
+    """
+    Decompress a complete compressed stream.
+
+    Raises:
+        ValueError: If the data is corrupt or truncated.
+        DecompressionLimitError: If it expands past ``max_size`` bytes.
+    """
+    decompressor = Decompressor(codec, max_size)
+    out = decompressor.decompress(data, max_size + 1)
+    if not decompressor.eof:
+        raise ValueError(f"Truncated {codec.name} data.")
+    return out
+
+
+register_codec(1, 'zlib', zlib.compressobj, zlib.decompressobj)
+# The payload MAC already authenticates the data, so skip the xz checksum.
+register_codec(2, 'lzma', lambda: lzma.LZMACompressor(check=lzma.CHECK_NONE), lzma.LZMADecompressor)
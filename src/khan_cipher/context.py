@@ -0,0 +1,93 @@
+"""
+Reusable per-key encryption context.
+
+``hmac.new(key, ...)`` hashes the ipad/opad blocks of the key every time it
+is called, and :func:`core.encrypt` does that twice per message (key
+derivation and MAC).  A :class:`KhanContext` keys one HMAC-SHA256 state
+when it is created and clones it per message, which removes that fixed
+overhead for long-lived services that use a single master key.
+"""
+
+import os
+from collections.abc import Iterable, Sequence
+
+from .batch import _decrypt_batch, _encrypt_batch
+from .core import (
+    SEGMENTED_MAGIC,
+    decrypt,
+    _keyed_digest,
+    _mac_template,
+    _open,
+    _seal,
+)
+from .primes import DEFAULT_PRIME
+
+
+class KhanContext:
+    """
+    Encrypts and decrypts under one master key with precomputed HMAC state.
+
+    Payloads are identical in format to :func:`core.encrypt` and
+    interchangeable with the module-level functions.
+
+    Args:
+        master_key (bytes): The master cryptographic key (should be 32 bytes).
+        prime (int | None): An explicit full reptend prime used for every
+            message, or None to use (and embed) the default prime.
+        version (int): Payload format for encryption, as for
+            :func:`core.encrypt`.  Decryption accepts every format.
+    """
+
+    def __init__(self, master_key: bytes, prime: int | None = None, version: int = 1):
+        if version not in (1, 2):
+            raise ValueError(f"Unsupported payload version {version}.")
+        self._master_key = master_key
+        self._mac_key = _mac_template(master_key)
+        self.prime = prime
+        self.version = version
+
+    def derive_key(self, salt: bytes) -> bytes:
+        """Equivalent to ``core.derive_key(master_key, salt)``."""
+        return _keyed_digest(self._mac_key, salt)
+
+    def encrypt(self, plaintext: bytes) -> bytes:
+        """
+        Encrypts a plaintext; see :func:`core.encrypt`.
+
+        Raises:
+            ValueError: If plaintext is empty.
+        """
+        if isinstance(plaintext, str):
+            plaintext = plaintext.encode('utf-8')
+        if not plaintext:
+            raise ValueError("Plaintext cannot be empty.")
+
+        embed_prime = self.prime is None
+        prime = DEFAULT_PRIME if embed_prime else self.prime
+        randomness = os.urandom(32)
+        return _seal(plaintext, self._mac_key, randomness[:16], randomness[16:],
+                     prime, embed_prime, self.version)
+
+    def decrypt(self, payload: bytes) -> bytes:
+        """
+        Decrypts a payload; see :func:`core.decrypt`.
+
+        Raises:
+            KhanDecryptionError: If the payload is invalid or MAC fails.
+        """
+        if payload[:len(SEGMENTED_MAGIC)] == SEGMENTED_MAGIC:
+            return decrypt(payload, self._master_key, self.prime)
+        return _open(payload, self._mac_key, self.prime)
+
+    def encrypt_many(
+        self, messages: Sequence[bytes], packed: bool = False
+    ) -> list[bytes] | bytes:
+        """Batch encryption; see :func:`batch.encrypt_many`."""
+        return _encrypt_batch(self._mac_key, messages, self.prime, packed, self.version)
+
+    def decrypt_many(
+        self, payloads: Iterable[bytes] | bytes, strict: bool = True
+    ) -> list[bytes | None]:
+        """Batch decryption; see :func:`batch.decrypt_many`."""
+        return _decrypt_batch(self._mac_key, self._master_key, payloads,
+                              self.prime, strict)
@@ -9,15 +9,32 @@ Pseudorandom Number Generator (PRNG).
 import os
 import hmac
 import struct
+from functools import lru_cache
 from hashlib import sha256
+from typing import NamedTuple
 
 # Optional C++ extension import
 try:
-    from .ckhan import bulk_xor  # type: ignore[import-untyped]
-except ImportError:
+    from .ckhan import bulk_xor, xor_into  # type: ignore[import-untyped]
+    from .ckhan import KhanKeystream as NativeKhanKeystream  # type: ignore[import-untyped]
+    NATIVE_IMPORT_ERROR = None
+except ImportError as e:
     bulk_xor = None
+    xor_into = None
+    NativeKhanKeystream = None
+    # Kept for diagnostics; see stats.backend_info().
+    NATIVE_IMPORT_ERROR = str(e)
 
-from .primes import DEFAULT_PRIME
+from . import backends as _backends
+from . import compression as _compression
+from . import stats as _stats
+from .primes import DEFAULT_PRIME, PRIME_REGISTRY, prime_id
+
+# Leading bytes of a segmented payload (see khan_cipher.segmented).
+SEGMENTED_MAGIC = b'KHS\x01'
+
+# Leading bytes of a version 2 (compact) payload.
+PAYLOAD_V2_MAGIC = b'KH\x02'
 
 
 class KhanDecryptionError(Exception):
@@ -39,6 +56,47 @@ def derive_key(master_key: bytes, salt: bytes) -> bytes:
     return hmac.new(master_key, salt, sha256).digest()
 
 
+# Primes up to this size get a cached fixed-base table for 10^k mod p.
+_POW10_TABLE_MAX_BITS = 256
+_POW10_WINDOW = 8
+
+
+@lru_cache(maxsize=16)
+def _pow10_table(prime: int) -> list[list[int]]:
+    """Rows of 10^(d * 256^i) mod prime for every 8-bit digit d."""
+    table = []
+    base = 10
+    for _ in range(0, prime.bit_length(), _POW10_WINDOW):
+        row = [1]
+        for _ in range((1 << _POW10_WINDOW) - 1):
+            row.append(row[-1] * base % prime)
+        table.append(row)
+        base = row[-1] * base % prime
+    return table
+
+
+def _pow10(exponent: int, prime: int) -> int:
+    """
+    Compute 10^exponent mod prime for 0 <= exponent < prime.
+
+    Small primes are reused across many messages, so they use a cached
+    fixed-base table: one multiplication per exponent byte instead of a
+    full square-and-multiply ladder.
+    """
+    if prime.bit_length() > _POW10_TABLE_MAX_BITS:
+        return pow(10, exponent, prime)
+    result = 1
+    mask = (1 << _POW10_WINDOW) - 1
+    for row in _pow10_table(prime):
+        if not exponent:
+            break
+        digit = exponent & mask
+        if digit:
+            result = result * row[digit] % prime
+        exponent >>= _POW10_WINDOW
+    return result
+
+
 class KhanKeystream:
     """
     The mathematical PRNG Sequence Generator utilizing Primitive Roots Modulo P.
@@ -56,10 +114,60 @@ class KhanKeystream:
         self.position = (key_int ^ iv_int) % (self.prime - 1)
 
         # O(1) On-the-fly state calculation: 10^position mod p
-        self.current_rem = pow(10, self.position, self.prime)
+        self.current_rem = _pow10(self.position, self.prime)
 
         self.previous_hash = sha256(key + iv).digest()
 
+    @classmethod
+    def from_state(
+        cls, prime: int, position: int, current_rem: int, previous_hash: bytes
+    ) -> 'KhanKeystream':
+        """
+        Build a generator directly from its raw state.
+
+        Args:
+            prime (int): The full reptend prime.
+            position (int): The starting sequence position.
+            current_rem (int): The current remainder 10^k mod prime.
+            previous_hash (bytes): The 32-byte running hash.
+
+        Returns:
+            KhanKeystream: A generator continuing from that state.
+        """
+        self = cls.__new__(cls)
+        self.setstate((prime, position, current_rem, previous_hash))
+        return self
+
+    def getstate(self) -> tuple[int, int, int, bytes]:
+        """
+        Snapshot the generator state.
+
+        Returns:
+            tuple: ``(prime, position, current_rem, previous_hash)``, as
+            accepted by :meth:`from_state` and :meth:`setstate`.
+        """
+        return self.prime, self.position, self.current_rem, self.previous_hash
+
+    def setstate(self, state: tuple[int, int, int, bytes]) -> None:
+        """
+        Restore a state returned by :meth:`getstate`.
+
+        Raises:
+            ValueError: If the state is inconsistent.
+        """
+        prime, position, current_rem, previous_hash = state
+        if not 0 <= current_rem < prime:
+            raise ValueError("current_rem must be in [0, prime)")
+        if len(previous_hash) != 32:
+            raise ValueError("previous_hash must be 32 bytes")
+        self.prime = prime
+        self.position = position
+        self.current_rem = current_rem
+        self.previous_hash = bytes(previous_hash)
+
+    def __reduce__(self):
+        return type(self).from_state, self.getstate()
+
     def get_next_byte(self) -> int:
         current_val = self.current_rem % 256
 
@@ -79,6 +187,161 @@ class KhanKeystream:
             self.previous_hash + bytes([out_byte])).digest()
         return out_byte
 
+    def readinto(self, buffer) -> int:
+        """
+        Fill a writable buffer with the next keystream bytes.
+
+        Args:
+            buffer: Any writable, C-contiguous buffer (bytearray, memoryview,
+                mmap, numpy array).
+
+        Returns:
+            int: The number of bytes written.
+        """
+        view = memoryview(buffer).cast('B')
+        next_byte = self.get_next_byte
+        for i in range(len(view)):
+            view[i] = next_byte()
+        return len(view)
+
+    def generate(self, n: int) -> bytes:
+        """
+        Return the next n keystream bytes.
+
+        Args:
+            n (int): Number of bytes to generate.
+
+        Returns:
+            bytes: The keystream block.
+        """
+        if n < 0:
+            raise ValueError("n must be non-negative")
+        buffer = bytearray(n)
+        self.readinto(buffer)
+        return bytes(buffer)
+
+
+# One-byte bytes objects, indexed by value.
+_SINGLE_BYTES = [bytes((i,)) for i in range(256)]
+_SHA256_TEMPLATE = sha256()
+
+
+class FastKhanKeystream(KhanKeystream):
+    """
+    Pure-Python generator tuned for throughput (the ``pure-optimized``
+    backend).
+
+    Produces exactly the same sequence as :class:`KhanKeystream`, but keeps
+    the state in local variables for the length of a ``readinto`` call,
+    looks up one-byte values in a table and feeds the running hash through
+    copies of a pre-built ``hashlib`` object instead of concatenating
+    ``bytes`` for every output byte.
+    """
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        prime = self.prime
+        rem = self.current_rem
+        prev = self.previous_hash
+        single = _SINGLE_BYTES
+        template = _SHA256_TEMPLATE
+        for i in range(len(view)):
+            old = rem & 0xFF
+            rem = rem * 10 % prime
+            out = ((rem - old) & 0xFF) ^ prev[0]
+            view[i] = out
+            h = template.copy()
+            h.update(prev)
+            h.update(single[out])
+            prev = h.digest()
+        self.current_rem = rem
+        self.previous_hash = prev
+        return len(view)
+
+
+def _initial_state(key: bytes, prime: int, iv: bytes) -> tuple[int, int, bytes]:
+    """(position, 10^position mod prime, initial hash) for (key, iv)."""
+    position = (int.from_bytes(key, 'big') ^ int.from_bytes(iv, 'big')) % (prime - 1)
+    return position, _pow10(position, prime), sha256(bytes(key) + iv).digest()
+
+
+def _fast_keystream(key: bytes, prime: int, iv: bytes) -> FastKhanKeystream:
+    position, rem, prev = _initial_state(key, prime, iv)
+    return FastKhanKeystream.from_state(prime, position, rem, prev)
+
+
+def _native_keystream(key: bytes, prime: int, iv: bytes):
+    position, rem, prev = _initial_state(key, prime, iv)
+    return NativeKhanKeystream.from_state(prime, position, rem, prev)
+
+
+def _xor_reference(data: bytes, keystream: bytes) -> bytes:
+    return bytes([d ^ k for d, k in zip(data, keystream)])
+
+
+def _xor_into_reference(dst, src) -> None:
+    view = memoryview(dst).cast('B')
+    view[:] = bytes([d ^ s for d, s in zip(view, src)])
+
+
+def _xor_int(data: bytes, keystream: bytes) -> bytes:
+    # One big-integer XOR over the whole buffer runs at C speed.
+    n = len(data)
+    return (int.from_bytes(data, 'little') ^ int.from_bytes(keystream, 'little')).to_bytes(n, 'little')
+
+
+def _xor_into_int(dst, src) -> None:
+    view = memoryview(dst).cast('B')
+    view[:] = _xor_int(view, src)
+
+
+_backends.register_backend(_backends.Backend(
+    'pure', KhanKeystream, KhanKeystream.from_state, _xor_reference, _xor_into_reference))
+_backends.register_backend(_backends.Backend(
+    'pure-optimized', _fast_keystream, FastKhanKeystream.from_state, _xor_int, _xor_into_int))
+if NativeKhanKeystream is not None:
+    _backends.register_backend(_backends.Backend(
+        'native', _native_keystream, NativeKhanKeystream.from_state, bulk_xor, xor_into,
+        releases_gil=True))
+
+
+def new_keystream(key: bytes, prime: int, iv: bytes):
+    """
+    Create a keystream generator for (key, prime, iv) on the active backend.
+
+    Every backend (see :mod:`khan_cipher.backends`) produces bit-identical
+    output; by default this is the native ``ckhan.KhanKeystream`` when the
+    C++ extension is built, otherwise :class:`FastKhanKeystream`.
+    """
+    return _backends.current().new_keystream(key, prime, iv)
+
+
+def keystream_from_state(state: tuple[int, int, int, bytes]):
+    """
+    Resume a keystream on the active backend from a saved state.
+
+    Args:
+        state: ``(prime, position, current_rem, previous_hash)`` as returned
+            by ``getstate()`` on a generator of any backend.
+
+    Returns:
+        A generator continuing exactly where the saved one stopped.
+
+    Raises:
+        ValueError: If the state is inconsistent.
+    """
+    return _backends.current().keystream_from_state(*state)
+
+
+def _xor_bytes(data: bytes, keystream: bytes) -> bytes:
+    """XOR data with an equal-length keystream block."""
+    return _backends.current().xor(data, keystream)
+
+
+def _xor_into(dst, src) -> None:
+    """XOR src into the equal-length writable buffer dst in place."""
+    _backends.current().xor_into(dst, src)
+
 
 def _encode_prime(prime: int) -> bytes:
     """Encode a prime as a length-prefixed big-endian byte string."""
@@ -100,8 +363,493 @@ def _decode_prime(data: bytes, offset: int) -> tuple[int, int]:
     return prime, offset + prime_len
 
 
+def _encode_varint(n: int) -> bytes:
+    """Encode a non-negative integer as an unsigned LEB128 varint."""
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _decode_varint(data, offset: int) -> tuple[int, int] | None:
+    """Decode a varint at offset.
+
+    Returns:
+        (value, new_offset) tuple, or None if data ends mid-varint.
+
+    Raises:
+        KhanDecryptionError: If the varint is longer than 10 bytes.
+    """
+    value = 0
+    for i in range(10):
+        if offset + i >= len(data):
+            return None
+        byte = data[offset + i]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value, offset + i + 1
+    raise KhanDecryptionError("Malformed varint in payload header.")
+
+
+# --------------------------------------------------------------------- #
+#  Version 2 payload header.                                             #
+#                                                                        #
+#  [Magic(3) | Flags(1) | Salt(16) | IV(16) | PrimeRef | CT(M) | MAC(32)] #
+#                                                                        #
+#  Flag bits 0-1 say how the prime is conveyed: not at all (supplied by  #
+#  the caller), as a 1-byte registry ID, or as a varint length followed  #
+#  by its big-endian bytes.  A default-prime payload carries 37 header   #
+#  bytes instead of 50.  Bits 2-4 hold the ID of the codec the plaintext  #
+#  was compressed with before encryption (0 for none; see                #
+#  khan_cipher.compression).                                             #
+# --------------------------------------------------------------------- #
+
+_PRIME_EXPLICIT = 0x00
+_PRIME_REGISTERED = 0x01
+_PRIME_EMBEDDED = 0x02
+_PRIME_MODE_MASK = 0x03
+_CODEC_SHIFT = 2
+_CODEC_MASK = 0x1C
+_V2_KNOWN_FLAGS = _PRIME_MODE_MASK | _CODEC_MASK
+_V2_FIXED_SIZE = len(PAYLOAD_V2_MAGIC) + 1 + 32
+
+# Appended to the MAC input of version 2 payloads, so a legacy payload whose
+# salt happens to begin with the magic can never verify as version 2.
+_V2_MAC_DOMAIN = b'KHAN-v2'
+
+
+class _V2Header(NamedTuple):
+    flags: int
+    salt: bytes
+    iv: bytes
+    prime: int | None
+    size: int
+
+
+def _encode_v2_header(
+    salt: bytes, iv: bytes, prime: int, embed_prime: bool, flags: int = 0
+) -> bytes:
+    """Build a version 2 header, referencing registered primes by ID."""
+    prime_field = b''
+    if embed_prime:
+        registered = prime_id(prime)
+        if registered is not None:
+            flags |= _PRIME_REGISTERED
+            prime_field = bytes((registered,))
+        else:
+            flags |= _PRIME_EMBEDDED
+            prime_bytes = prime.to_bytes((prime.bit_length() + 7) // 8, 'big')
+            prime_field = _encode_varint(len(prime_bytes)) + prime_bytes
+    return b''.join((PAYLOAD_V2_MAGIC, bytes((flags,)), salt, iv, prime_field))
+
+
+def _decode_v2_header(data) -> _V2Header | None:
+    """Parse a version 2 header at the start of data without copying.
+
+    Returns:
+        The header (salt and IV are views into data), or None if data is
+        too short to hold the whole header.
+
+    Raises:
+        KhanDecryptionError: If the header uses unknown flags or names an
+            unregistered prime or codec.
+    """
+    view = memoryview(data)
+    if len(view) < _V2_FIXED_SIZE:
+        return None
+    flags = view[3]
+    if flags & ~_V2_KNOWN_FLAGS:
+        raise KhanDecryptionError(f"Unsupported payload flags 0x{flags:02x}.")
+    codec_id = (flags & _CODEC_MASK) >> _CODEC_SHIFT
+    if codec_id and codec_id not in _compression.CODECS:
+        raise KhanDecryptionError(f"Unknown compression codec ID {codec_id}.")
+    salt = view[4:20]
+    iv = view[20:36]
+    offset = _V2_FIXED_SIZE
+
+    mode = flags & _PRIME_MODE_MASK
+    prime = None
+    if mode == _PRIME_REGISTERED:
+        if len(view) < offset + 1:
+            return None
+        prime = PRIME_REGISTRY.get(view[offset])
+        if prime is None:
+            raise KhanDecryptionError(f"Unknown prime ID {view[offset]}.")
+        offset += 1
+    elif mode == _PRIME_EMBEDDED:
+        decoded = _decode_varint(view, offset)
+        if decoded is None:
+            return None
+        prime_len, offset = decoded
+        if len(view) < offset + prime_len:
+            return None
+        prime = int.from_bytes(view[offset:offset + prime_len], 'big')
+        offset += prime_len
+    elif mode != _PRIME_EXPLICIT:
+        raise KhanDecryptionError("Invalid prime encoding in payload header.")
+    return _V2Header(flags, salt, iv, prime, offset)
+
+
+def _mac_template(key: bytes) -> hmac.HMAC:
+    """Return an HMAC-SHA256 object keyed with key, ready to be copied."""
+    return hmac.new(key, digestmod=sha256)
+
+
+def _keyed_digest(template: hmac.HMAC, data: bytes) -> bytes:
+    """HMAC data by cloning a pre-keyed template (skips ipad/opad setup)."""
+    mac = template.copy()
+    mac.update(data)
+    return mac.digest()
+
+
+def _payload_header(
+    salt: bytes, iv: bytes, prime: int, embed_prime: bool, version: int, flags: int = 0
+) -> bytes:
+    """Everything that precedes the ciphertext in a single-chain payload."""
+    if version == 2:
+        return _encode_v2_header(salt, iv, prime, embed_prime, flags)
+    if version != 1:
+        raise ValueError(f"Unsupported payload version {version}.")
+    if flags:
+        raise ValueError("Header flags (e.g. compression) require version 2.")
+    if embed_prime:
+        return salt + iv + _encode_prime(prime)
+    return salt + iv
+
+
+def _seal(
+    plaintext: bytes, mac_key: hmac.HMAC, salt: bytes, iv: bytes,
+    prime: int, embed_prime: bool, version: int = 1, flags: int = 0
+) -> bytes:
+    """Encrypt and authenticate one message in the given payload version.
+
+    ``mac_key`` is a keyed HMAC template (see :func:`_mac_template`) used
+    both for key derivation and for the payload MAC; ``flags`` are extra
+    version 2 header flags.
+    """
+    if version not in (1, 2):
+        raise ValueError(f"Unsupported payload version {version}.")
+    t_start = t = _stats.start()
+    derived_key = _keyed_digest(mac_key, salt)
+    t = _stats.lap(t, 'kdf', len(salt))
+    ksg = new_keystream(derived_key, prime, iv)
+
+    # Generate keystream buffer
+    keystream = ksg.generate(len(plaintext))
+    t = _stats.lap(t, 'keystream', len(plaintext))
+    return _seal_keystream(plaintext, keystream, mac_key, salt, iv, prime,
+                           embed_prime, version, t, t_start, flags)
+
+
+def _seal_keystream(
+    plaintext: bytes, keystream, mac_key: hmac.HMAC, salt: bytes, iv: bytes,
+    prime: int, embed_prime: bool, version: int,
+    t: float | None = None, t_start: float | None = None, flags: int = 0
+) -> bytes:
+    """Finish :func:`_seal` with a keystream generated ahead of time.
+
+    ``keystream`` must be the first ``len(plaintext)`` bytes of the stream
+    for (derived key, prime, iv); ``t`` and ``t_start`` are the running
+    stats timestamps.
+    """
+    header = _payload_header(salt, iv, prime, embed_prime, version, flags)
+    ciphertext = _xor_bytes(plaintext, keystream)
+    t = _stats.lap(t, 'xor', len(plaintext))
+
+    mac = mac_key.copy()
+    mac.update(header)
+    mac.update(ciphertext)
+    if version == 2:
+        mac.update(_V2_MAC_DOMAIN)
+    tag = mac.digest()
+    if t is not None:
+        _stats.lap(t, 'mac', len(header) + len(ciphertext))
+        _stats.lap(t_start, 'encrypt', len(plaintext))
+    return b''.join((header, ciphertext, tag))
+
+
+def _seal_into(
+    plaintext, mac_key: hmac.HMAC, salt: bytes, iv: bytes, prime: int,
+    embed_prime: bool, version: int, out
+) -> int:
+    """Like :func:`_seal`, but write the payload into the start of out.
+
+    The keystream is generated straight into the ciphertext region of
+    out, the plaintext XORed over it in place, and the MAC computed over
+    a view of out, so no intermediate buffers are allocated.
+
+    Returns:
+        int: The payload length.
+    """
+    header = _payload_header(salt, iv, prime, embed_prime, version)
+    n = len(plaintext)
+    size = len(header) + n + 32
+    view = _output_view(out, size)
+
+    t_start = t = _stats.start()
+    view[:len(header)] = header
+    ciphertext = view[len(header):len(header) + n]
+    derived_key = _keyed_digest(mac_key, salt)
+    t = _stats.lap(t, 'kdf', len(salt))
+    new_keystream(derived_key, prime, iv).readinto(ciphertext)
+    t = _stats.lap(t, 'keystream', n)
+    _xor_into(ciphertext, plaintext)
+    t = _stats.lap(t, 'xor', n)
+
+    mac = mac_key.copy()
+    mac.update(view[:len(header) + n])
+    if version == 2:
+        mac.update(_V2_MAC_DOMAIN)
+    view[len(header) + n:size] = mac.digest()
+    if t is not None:
+        _stats.lap(t, 'mac', len(header) + n)
+        _stats.lap(t_start, 'encrypt', n)
+    return size
+
+
+def _output_view(out, size: int) -> memoryview:
+    """A writable byte view of out, which must hold at least size bytes."""
+    view = memoryview(out).cast('B')
+    if view.readonly:
+        raise TypeError("Output buffer must be writable.")
+    if len(view) < size:
+        raise ValueError(
+            f"Output buffer holds {len(view)} bytes; {size} are needed.")
+    return view
+
+
+class _Verified(NamedTuple):
+    ciphertext: memoryview
+    salt: memoryview
+    iv: memoryview
+    prime: int
+    t: float | None
+    codec: int = 0
+
+
+def _verify_v1(payload, mac_key: hmac.HMAC, prime: int | None) -> _Verified:
+    """Authenticate one legacy (version 1) payload and locate its fields.
+
+    Raises:
+        KhanDecryptionError: If the payload is invalid or MAC fails.
+    """
+    min_len = 64 if prime is not None else 67
+    if len(payload) < min_len:
+        raise KhanDecryptionError(
+            "Payload is too short.")
+
+    mac_provided = payload[-32:]
+    body = payload[:-32]
+
+    t = _stats.start()
+    mac_calculated = _keyed_digest(mac_key, body)
+    t = _stats.lap(t, 'mac', len(body))
+
+    if not hmac.compare_digest(mac_calculated, mac_provided):
+        raise KhanDecryptionError(
+            "MAC verification failed. Data may have been tampered with.")
+
+    salt = body[:16]
+    iv = body[16:32]
+
+    if prime is not None:
+        # Legacy mode: caller provides the prime, rest is ciphertext
+        ciphertext = body[32:]
+    else:
+        # New format: prime is embedded after IV
+        prime, ct_offset = _decode_prime(body, 32)
+        ciphertext = body[ct_offset:]
+
+    return _Verified(ciphertext, salt, iv, prime, t)
+
+
+def _resolve_prime(named: int | None, explicit: int | None) -> int:
+    """Reconcile the prime an authenticated header names with ``prime=``.
+
+    Every format that names its prime (embedded or by registry ID) uses
+    that prime; an explicit prime is only needed when the header names
+    none, and must agree with the header when both are present.
+
+    Raises:
+        KhanDecryptionError: If neither names a prime, or they differ.
+    """
+    if named is None:
+        if explicit is None:
+            raise KhanDecryptionError(
+                "Payload does not carry its prime; pass prime explicitly.")
+        return explicit
+    if explicit is not None and explicit != named:
+        raise KhanDecryptionError(
+            "Payload names a different prime than the one passed explicitly.")
+    return named
+
+
+def _verify_v2(payload, mac_key: hmac.HMAC, prime: int | None) -> _Verified | None:
+    """Authenticate one version 2 payload and locate its fields.
+
+    Returns:
+        The fields, or None if the MAC does not verify under the version 2
+        domain (the payload may be legacy).
+
+    Raises:
+        KhanDecryptionError: If an authenticated header cannot be used.
+    """
+    if len(payload) < _V2_FIXED_SIZE + 32:
+        return None
+
+    body = payload[:-32]
+    t = _stats.start()
+    mac = mac_key.copy()
+    mac.update(body)
+    mac.update(_V2_MAC_DOMAIN)
+    if not hmac.compare_digest(mac.digest(), payload[-32:]):
+        return None
+    t = _stats.lap(t, 'mac', len(body))
+
+    header = _decode_v2_header(body)
+    if header is None:
+        raise KhanDecryptionError("Payload header is truncated.")
+    prime = _resolve_prime(header.prime, prime)
+
+    return _Verified(body[header.size:], header.salt, header.iv, prime, t,
+                     (header.flags & _CODEC_MASK) >> _CODEC_SHIFT)
+
+
+def _verify(payload, mac_key: hmac.HMAC, prime: int | None) -> _Verified:
+    """Authenticate a payload of either single-chain version (no copies).
+
+    Raises:
+        KhanDecryptionError: If the payload is invalid or MAC fails.
+    """
+    view = memoryview(payload).cast('B')
+    verified = None
+    if view[:len(PAYLOAD_V2_MAGIC)] == PAYLOAD_V2_MAGIC:
+        verified = _verify_v2(view, mac_key, prime)
+    if verified is None:
+        verified = _verify_v1(view, mac_key, prime)
+    return verified
+
+
+def _decrypt_body(
+    ciphertext, mac_key: hmac.HMAC, salt, iv, prime: int, t: float | None
+) -> bytes:
+    """Derive the key and strip the keystream from authenticated ciphertext.
+
+    ``t`` is the running stats timestamp (None when instrumentation is off).
+    """
+    derived_key = _keyed_digest(mac_key, salt)
+    t = _stats.lap(t, 'kdf', len(salt))
+    ksg = new_keystream(derived_key, prime, iv)
+    keystream = ksg.generate(len(ciphertext))
+    t = _stats.lap(t, 'keystream', len(ciphertext))
+    plaintext = _xor_bytes(ciphertext, keystream)
+    _stats.lap(t, 'xor', len(ciphertext))
+    return plaintext
+
+
+def _open(
+    payload, mac_key: hmac.HMAC, prime: int | None,
+    max_decompressed_size: int = _compression.MAX_DECOMPRESSED_SIZE
+) -> bytes:
+    """Verify and decrypt one payload of either single-chain version.
+
+    Raises:
+        KhanDecryptionError: If the payload is invalid or MAC fails.
+    """
+    t = _stats.start()
+    v = _verify(payload, mac_key, prime)
+    plaintext = _decrypt_body(v.ciphertext, mac_key, v.salt, v.iv, v.prime, v.t)
+    if v.codec:
+        try:
+            plaintext = _decompress(plaintext, v.codec, max_decompressed_size)
+        except _compression.DecompressionLimitError as e:
+            raise KhanDecryptionError(str(e)) from None
+    _stats.lap(t, 'decrypt', len(plaintext))
+    return plaintext
+
+
+def _open_into(payload, mac_key: hmac.HMAC, prime: int | None, out) -> int:
+    """Like :func:`_open`, but write the plaintext into the start of out.
+
+    Returns:
+        int: The plaintext length.
+    """
+    t_start = _stats.start()
+    v = _verify(payload, mac_key, prime)
+    if v.codec:
+        view = _output_view(out, 0)
+        body = _decrypt_body(v.ciphertext, mac_key, v.salt, v.iv, v.prime, v.t)
+        try:
+            plaintext = _decompress(body, v.codec, len(view))
+        except _compression.DecompressionLimitError:
+            raise ValueError(
+                f"Output buffer holds {len(view)} bytes; the plaintext is larger.") from None
+        view[:len(plaintext)] = plaintext
+        _stats.lap(t_start, 'decrypt', len(plaintext))
+        return len(plaintext)
+    n = len(v.ciphertext)
+    plaintext = _output_view(out, n)[:n]
+    derived_key = _keyed_digest(mac_key, v.salt)
+    t = _stats.lap(v.t, 'kdf', len(v.salt))
+    new_keystream(derived_key, v.prime, v.iv).readinto(plaintext)
+    t = _stats.lap(t, 'keystream', n)
+    _xor_into(plaintext, v.ciphertext)
+    _stats.lap(t, 'xor', n)
+    _stats.lap(t_start, 'decrypt', n)
+    return n
+
+
+# Inputs shorter than this are not worth compressing.
+COMPRESS_THRESHOLD = 256
+# Inputs smaller than this are encrypted serially even when workers > 1.
+PARALLEL_THRESHOLD = 4 * 1024 * 1024
+
+
+def _compress(plaintext, compression: str | int | None, threshold: int) -> tuple[bytes, int]:
+    """Compress plaintext if worthwhile.
+
+    Returns:
+        (data, header flags): the compressed data and its codec flags, or
+        the plaintext and 0 if it is below the threshold or did not shrink.
+    """
+    if compression is None:
+        return plaintext, 0
+    codec = _compression.get_codec(compression)
+    if len(plaintext) < threshold:
+        return plaintext, 0
+    t = _stats.start()
+    packed = _compression.compress(codec, plaintext)
+    _stats.lap(t, 'compress', len(plaintext))
+    if len(packed) >= len(plaintext):
+        return plaintext, 0
+    return packed, codec.id << _CODEC_SHIFT
+
+
+def _decompress(data: bytes, codec_id: int, max_size: int) -> bytes:
+    """Undo :func:`_compress` on authenticated, decrypted data.
+
+    Raises:
+        KhanDecryptionError: If the data is corrupt.
+        compression.DecompressionLimitError: If it expands past max_size.
+    """
+    t = _stats.start()
+    try:
+        plaintext = _compression.decompress(_compression.CODECS[codec_id], data, max_size)
+    except _compression.DecompressionLimitError:
+        raise
+    except ValueError as e:
+        raise KhanDecryptionError(str(e)) from None
+    _stats.lap(t, 'decompress', len(plaintext))
+    return plaintext
+
+
 def encrypt(
-    plaintext: bytes, key: bytes, prime: int | None = None
+    plaintext: bytes, key: bytes, prime: int | None = None,
+    workers: int | None = None, version: int = 1,
+    compression: str | int | None = None, compress_threshold: int = COMPRESS_THRESHOLD,
+    parallel_threshold: int = PARALLEL_THRESHOLD
 ) -> bytes:
     """
     Encrypts a plaintext using the KHAN PRNG stream cipher.
@@ -115,16 +863,35 @@ def encrypt(
         key (bytes): The master cryptographic key (should be 32 bytes).
         prime (int | None): An explicit full reptend prime, or None to
             use the default 128-bit prime (embedded in payload).
+        workers (int | None): When greater than 1 and the plaintext is at
+            least ``parallel_threshold`` bytes, encrypt on that many cores
+            into a segmented payload (see :mod:`khan_cipher.parallel`).
+        version (int): Single-chain payload format.  1 is the legacy
+            layout; 2 is the compact layout with a version header that
+            names registered primes (see ``primes.PRIME_REGISTRY``) by a
+            1-byte ID.
+        compression (str | int | None): Codec (``'zlib'``, ``'lzma'`` or
+            any registered in :mod:`khan_cipher.compression`) applied
+            before encryption, so less keystream is generated.  Requires
+            version 2 and always produces a single-chain payload.
+        compress_threshold (int): Plaintexts shorter than this are not
+            compressed; neither are those that do not shrink.
+        parallel_threshold (int): Smallest plaintext worth spreading over
+            ``workers`` cores.
 
     Returns:
         bytes: Encrypted payload.
-            - With embedded prime:
+            - Version 1 with embedded prime:
               [Salt(16) | IV(16) | PrimeLen(2) | Prime(N) | CT(M) | MAC(32)]
-            - With explicit prime (caller-managed):
+            - Version 1 with explicit prime (caller-managed):
               [Salt(16) | IV(16) | Ciphertext(M) | MAC(32)]
+            - Version 2:
+              [Magic(3) | Flags(1) | Salt(16) | IV(16) | PrimeRef | CT(M) | MAC(32)]
 
     Raises:
-        ValueError: If plaintext is empty.
+        ValueError: If plaintext is empty, version is unsupported, or
+            compression is requested for a version 1 payload or names an
+            unknown codec.
     """
     if isinstance(plaintext, str):
         plaintext = plaintext.encode('utf-8')
@@ -132,6 +899,18 @@ def encrypt(
     if not plaintext:
         raise ValueError("Plaintext cannot be empty.")
 
+    flags = 0
+    if compression is not None:
+        if version != 2:
+            raise ValueError("Compression requires version=2.")
+        plaintext, flags = _compress(plaintext, compression, compress_threshold)
+    elif workers is not None and workers > 1:
+        # Imported lazily: the parallel module builds on this one.
+        from . import parallel
+        if len(plaintext) >= parallel_threshold:
+            return parallel.encrypt_parallel(plaintext, key, prime, workers,
+                                             parallel_threshold=parallel_threshold)
+
     embed_prime = prime is None
     if prime is None:
         prime = DEFAULT_PRIME
@@ -139,28 +918,34 @@ def encrypt(
     iv = os.urandom(16)
     salt = os.urandom(16)
 
-    derived_key = derive_key(key, salt)
-    ksg = KhanKeystream(derived_key, prime, iv)
+    return _seal(plaintext, _mac_template(key), salt, iv, prime, embed_prime,
+                 version, flags)
 
-    # Generate keystream buffer
-    if bulk_xor is not None:
-        keystream_bytes = bytes([ksg.get_next_byte()
-                                for _ in range(len(plaintext))])
-        ciphertext = bulk_xor(plaintext, keystream_bytes)
-    else:
-        ciphertext = bytes([p ^ ksg.get_next_byte() for p in plaintext])
 
-    if embed_prime:
-        body = salt + iv + _encode_prime(prime) + ciphertext
-    else:
-        body = salt + iv + ciphertext
+def _segmented_header_ok(payload, key: bytes) -> bool:
+    """True if payload carries an authentic segmented header.
 
-    mac = hmac.new(key, body, sha256).digest()
-    return body + mac
+    A payload that merely starts with the magic may be a legacy payload
+    whose salt happens to match it, so only a header that fails to parse
+    or authenticate sends decryption down the single-chain path; errors in
+    the segments of an authentic header are the caller's to report.
+    """
+    if payload[:len(SEGMENTED_MAGIC)] != SEGMENTED_MAGIC:
+        return False
+    # Imported lazily: the segmented module builds on this one.
+    from .segmented import _authenticate_header
+    try:
+        _authenticate_header(payload, key)
+    except KhanDecryptionError:
+        return False
+    return True
 
 
 def decrypt(
-    payload: bytes, key: bytes, prime: int | None = None
+    payload: bytes, key: bytes, prime: int | None = None,
+    workers: int | None = None,
+    max_decompressed_size: int = _compression.MAX_DECOMPRESSED_SIZE,
+    parallel_threshold: int = PARALLEL_THRESHOLD
 ) -> bytes:
     """
     Decrypts a KHAN payload back to plaintext.
@@ -168,52 +953,143 @@ def decrypt(
     If no prime is provided, the prime is read from the payload header
     (new self-describing format).  For backward compatibility with legacy
     payloads that used an explicit prime, the caller may pass one directly.
+    Version 2 payloads are recognised by their magic prefix.  When the
+    header of a version 2 or segmented payload names its prime, an
+    explicit prime must be the same one or decryption fails.
+    Segmented payloads (see :mod:`khan_cipher.segmented`) are detected by
+    their magic prefix and decrypted transparently.
 
     Args:
         payload (bytes): The full encrypted byte array.
         key (bytes): The symmetric master key.
         prime (int | None): Explicit prime override, or None to read
             from the payload.
+        workers (int | None): When greater than 1, decrypt segmented
+            payloads of at least ``parallel_threshold`` bytes on that many
+            cores.  Single-chain payloads are always decrypted serially.
+        max_decompressed_size (int): Largest plaintext a compressed
+            payload may expand to.
+        parallel_threshold (int): Smallest payload worth spreading over
+            ``workers`` cores.
 
     Returns:
         bytes: The pristine original plaintext.
 
     Raises:
-        KhanDecryptionError: If the payload is invalid or MAC fails.
+        KhanDecryptionError: If the payload is invalid, MAC fails, or a
+            compressed payload expands past max_decompressed_size.
     """
-    min_len = 64 if prime is not None else 67
-    if len(payload) < min_len:
-        raise KhanDecryptionError(
-            "Payload is too short.")
+    if _segmented_header_ok(payload, key):
+        from .segmented import decrypt_segmented
+        if workers is not None and workers > 1 and len(payload) >= parallel_threshold:
+            from .parallel import decrypt_parallel
+            return decrypt_parallel(payload, key, prime, workers,
+                                    parallel_threshold=parallel_threshold)
+        return decrypt_segmented(payload, key, prime)
 
-    mac_provided = payload[-32:]
-    body = payload[:-32]
+    return _open(payload, _mac_template(key), prime, max_decompressed_size)
 
-    mac_calculated = hmac.new(key, body, sha256).digest()
 
-    if not hmac.compare_digest(mac_calculated, mac_provided):
-        raise KhanDecryptionError(
-            "MAC verification failed. Data may have been tampered with.")
+def payload_size(
+    plaintext_len: int, prime: int | None = None, version: int = 1
+) -> int:
+    """
+    Size of the single-chain payload :func:`encrypt` produces.
 
-    salt = body[:16]
-    iv = body[16:32]
+    Args:
+        plaintext_len (int): Length of the plaintext in bytes.
+        prime (int | None): The prime that will be passed to
+            :func:`encrypt_into`; None for the embedded default prime.
+        version (int): Payload format (1 or 2).
 
-    if prime is not None:
-        # Legacy mode: caller provides the prime, rest is ciphertext
-        ciphertext = body[32:]
-    else:
-        # New format: prime is embedded after IV
-        prime, ct_offset = _decode_prime(body, 32)
-        ciphertext = body[ct_offset:]
+    Returns:
+        int: The exact payload length, for sizing :func:`encrypt_into`
+        output buffers.
+
+    Raises:
+        ValueError: If version is unsupported.
+    """
+    embed_prime = prime is None
+    header = _payload_header(bytes(16), bytes(16), DEFAULT_PRIME if embed_prime else prime,
+                             embed_prime, version)
+    return len(header) + plaintext_len + 32
 
-    derived_key = derive_key(key, salt)
-    ksg = KhanKeystream(derived_key, prime, iv)
 
-    if bulk_xor is not None:
-        keystream_bytes = bytes([ksg.get_next_byte()
-                                for _ in range(len(ciphertext))])
-        plaintext = bulk_xor(ciphertext, keystream_bytes)
-    else:
-        plaintext = bytes([c ^ ksg.get_next_byte() for c in ciphertext])
+def encrypt_into(
+    plaintext, key: bytes, out, prime: int | None = None, version: int = 1
+) -> int:
+    """
+    Encrypt directly into a caller-provided buffer.
 
-    return plaintext
+    Produces the same payload as :func:`encrypt` (always single-chain)
+    without intermediate copies: the header, ciphertext and MAC are
+    written in one pass into ``out``, and the plaintext is read through a
+    memoryview.
+
+    Args:
+        plaintext: Any bytes-like object (bytes, bytearray, memoryview,
+            mmap).
+        key (bytes): The master cryptographic key.
+        out: A writable buffer (bytearray, memoryview, writable mmap) of
+            at least ``payload_size(len(plaintext), prime, version)``
+            bytes.  The payload is written at its start.
+        prime (int | None): As for :func:`encrypt`.
+        version (int): As for :func:`encrypt`.
+
+    Returns:
+        int: The number of bytes written.
+
+    Raises:
+        ValueError: If plaintext is empty, out is too small or version is
+            unsupported.
+        TypeError: If out is read-only.
+    """
+    plaintext = memoryview(plaintext).cast('B')
+    if not plaintext:
+        raise ValueError("Plaintext cannot be empty.")
+
+    embed_prime = prime is None
+    if prime is None:
+        prime = DEFAULT_PRIME
+
+    iv = os.urandom(16)
+    salt = os.urandom(16)
+
+    return _seal_into(plaintext, _mac_template(key), salt, iv, prime, embed_prime,
+                      version, out)
+
+
+def decrypt_into(payload, key: bytes, out, prime: int | None = None) -> int:
+    """
+    Decrypt directly into a caller-provided buffer.
+
+    The payload is parsed through memoryview slices and the MAC checked
+    before anything is written; the plaintext is then produced in one
+    pass into ``out``.  Segmented payloads are decrypted with
+    :func:`decrypt` and copied in.
+
+    Args:
+        payload: Any bytes-like object holding the encrypted payload.
+        key (bytes): The symmetric master key.
+        out: A writable buffer that must not overlap payload.  Unless the
+            payload is compressed, a buffer of ``len(payload) - 64`` bytes
+            is always large enough; a compressed payload is never expanded
+            past ``len(out)`` bytes.
+        prime (int | None): As for :func:`decrypt`.
+
+    Returns:
+        int: The plaintext length (bytes written to the start of out).
+
+    Raises:
+        KhanDecryptionError: If the payload is invalid or MAC fails.
+        ValueError: If out is too small.
+        TypeError: If out is read-only.
+    """
+    view = memoryview(payload).cast('B')
+    if _segmented_header_ok(view, key):
+        from .segmented import decrypt_segmented
+        plaintext = decrypt_segmented(view, key, prime)
+        _output_view(out, len(plaintext))[:len(plaintext)] = plaintext
+        return len(plaintext)
+
+    return _open_into(view, _mac_template(key), prime, out)
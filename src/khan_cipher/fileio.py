@@ -0,0 +1,226 @@
+"""
+File encryption using memory-mapped input and chunked output.
+
+The input file is mapped read-only and processed in large chunks aligned
+to the mmap allocation granularity, so arbitrarily large files can be
+encrypted without reading them into memory.  Output files use exactly the
+same wire format as :func:`khan_cipher.core.encrypt`, and
+:func:`decrypt_file` reads every format :func:`khan_cipher.core.decrypt`
+does, verifying through the same helpers.  Decrypted output is written to
+a temporary file beside dst and renamed over it only once it is complete,
+so a failed decryption never leaves partial plaintext at dst.
+"""
+
+import hmac
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+from .compression import CODECS, MAX_DECOMPRESSED_SIZE, Decompressor
+from .core import (
+    SEGMENTED_MAGIC,
+    KhanDecryptionError,
+    derive_key,
+    new_keystream,
+    _mac_template,
+    _resolve_prime,
+    _verify,
+    _xor_into,
+)
+from .segmented import _authenticate_header, _crypt_segment, _segment_bounds, _segment_mac
+from .stream import KhanEncryptor
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _aligned(chunk_size: int) -> int:
+    """Round chunk_size up to a multiple of the mmap allocation granularity."""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive.")
+    granularity = mmap.ALLOCATIONGRANULARITY
+    return -(-chunk_size // granularity) * granularity
+
+
+def encrypt_file(
+    src: str | os.PathLike,
+    dst: str | os.PathLike,
+    key: bytes,
+    prime: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """
+    Encrypts the file at src into dst.
+
+    Args:
+        src: Path of the plaintext file.
+        dst: Path of the payload file to write (overwritten).
+        key (bytes): The master cryptographic key (should be 32 bytes).
+        prime (int | None): An explicit full reptend prime, or None to
+            use (and embed) the default 128-bit prime.
+        chunk_size (int): Bytes processed per step, rounded up to the mmap
+            allocation granularity.
+
+    Returns:
+        int: The number of plaintext bytes encrypted.
+
+    Raises:
+        ValueError: If the source file is empty or src and dst are the
+            same file.
+    """
+    chunk_size = _aligned(chunk_size)
+    _check_distinct(src, dst)
+    with open(src, 'rb') as fin:
+        size = os.fstat(fin.fileno()).st_size
+        if size == 0:
+            raise ValueError("Plaintext cannot be empty.")
+
+        enc = KhanEncryptor(key, prime)
+        with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                open(dst, 'wb', buffering=chunk_size) as fout:
+            view = memoryview(mm)
+            try:
+                for offset in range(0, size, chunk_size):
+                    fout.write(enc.update(view[offset:offset + chunk_size]))
+            finally:
+                view.release()
+            fout.write(enc.finalize())
+    return size
+
+
+def _check_distinct(src, dst) -> None:
+    """Refuse to truncate the file that is about to be mapped."""
+    try:
+        same = os.path.samefile(src, dst)
+    except FileNotFoundError:
+        same = False
+    if same:
+        raise ValueError("src and dst must be different files.")
+
+
+@contextmanager
+def _atomic_output(dst, buffering: int = -1):
+    """Open a temporary file beside dst, renamed over dst on success only."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.fspath(dst)) or '.',
+                               prefix='.khan-', suffix='.tmp')
+    try:
+        with open(fd, 'wb', buffering=buffering) as fout:
+            yield fout
+        os.replace(tmp, dst)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _write_segmented(view: memoryview, key: bytes, prime: int | None, dst) -> int | None:
+    """Decrypt a segmented payload to dst, verifying every segment first.
+
+    Returns:
+        int | None: Bytes written, or None if view is not a valid
+        segmented payload (it may be a legacy payload whose salt matches
+        the magic).
+    """
+    try:
+        header = _authenticate_header(view, key)
+    except KhanDecryptionError:
+        return None
+    header = header._replace(prime=_resolve_prime(header.prime, prime))
+    bounds = [_segment_bounds(header, index) for index in range(header.segment_count)]
+    for index, (start, end) in enumerate(bounds):
+        with view[start:end] as ciphertext:
+            mac = _segment_mac(key, header.fixed, index, ciphertext)
+        if not hmac.compare_digest(mac, header.macs[index]):
+            raise KhanDecryptionError(
+                f"MAC verification failed for segment {index}. "
+                "Data may have been tampered with.")
+
+    derived_key = derive_key(key, header.salt)
+    with _atomic_output(dst) as fout:
+        for index, (start, end) in enumerate(bounds):
+            with view[start:end] as ciphertext:
+                fout.write(_crypt_segment(derived_key, header.prime, header.iv, index, ciphertext))
+    return header.length
+
+
+def decrypt_file(
+    src: str | os.PathLike,
+    dst: str | os.PathLike,
+    key: bytes,
+    prime: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_decompressed_size: int = MAX_DECOMPRESSED_SIZE,
+) -> int:
+    """
+    Decrypts the payload file at src into dst.
+
+    Every format :func:`khan_cipher.core.decrypt` reads is accepted.  All
+    MACs are verified over the mapped payload before any keystream is
+    generated, so tampered files are rejected cheaply.  Output goes to a
+    temporary file in dst's directory that replaces dst only once
+    decryption (and decompression) has succeeded; on any error dst is
+    left untouched.
+
+    Args:
+        src: Path of the payload file.
+        dst: Path of the plaintext file to write (overwritten).
+        key (bytes): The symmetric master key.
+        prime (int | None): Explicit prime override, or None to read
+            from the payload.
+        chunk_size (int): Bytes processed per step, rounded up to the mmap
+            allocation granularity.
+        max_decompressed_size (int): Upper bound on the plaintext of a
+            compressed payload.
+
+    Returns:
+        int: The number of plaintext bytes written.
+
+    Raises:
+        KhanDecryptionError: If the payload is invalid, MAC fails or a
+            compressed payload inflates past max_decompressed_size.
+        ValueError: If src and dst are the same file.
+    """
+    chunk_size = _aligned(chunk_size)
+    _check_distinct(src, dst)
+    with open(src, 'rb') as fin:
+        if os.fstat(fin.fileno()).st_size == 0:
+            raise KhanDecryptionError("Payload is too short.")
+        # Not closed explicitly: the verifier hands out views of the map that
+        # a traceback may keep alive, and closing would then mask the error.
+        # The map is released with its last view.
+        mm = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mm)
+    if view[:len(SEGMENTED_MAGIC)] == SEGMENTED_MAGIC:
+        written = _write_segmented(view, key, prime, dst)
+        if written is not None:
+            return written
+
+    v = _verify(view, _mac_template(key), prime)
+    ksg = new_keystream(derive_key(key, bytes(v.salt)), v.prime, bytes(v.iv))
+    decompressor = Decompressor(CODECS[v.codec], max_decompressed_size) if v.codec else None
+    out = memoryview(bytearray(chunk_size))
+    written = 0
+    with _atomic_output(dst, buffering=0) as fout:
+        for offset in range(0, len(v.ciphertext), chunk_size):
+            chunk = v.ciphertext[offset:offset + chunk_size]
+            block = out[:len(chunk)]
+            ksg.readinto(block)
+            _xor_into(block, chunk)
+            if decompressor is None:
+                written += fout.write(block)
+                continue
+            data = _inflate(decompressor, block, chunk_size)
+            while data:
+                written += fout.write(data)
+                data = _inflate(decompressor, b'', chunk_size) if decompressor.pending else b''
+        if decompressor is not None and not decompressor.eof:
+            raise KhanDecryptionError(f"Truncated {decompressor.codec.name} data.")
+    return written
+
+
+def _inflate(decompressor: Decompressor, data, limit: int) -> bytes:
+    """Decompress up to limit bytes of authenticated plaintext."""
+    try:
+        return decompressor.decompress(data, limit)
+    except ValueError as e:
+        raise KhanDecryptionError(str(e)) from None
@@ -0,0 +1,201 @@
+"""
+Multi-core encryption of large payloads.
+
+A single KHAN keystream is a serial hash chain, so one payload can only
+use one core.  Here large inputs are written in the segmented format (see
+:mod:`khan_cipher.segmented`), whose independently keyed segments are
+encrypted and decrypted concurrently.  On a backend that releases the GIL
+(the C++ extension, where keystream generation, ``bulk_xor`` and HMAC all
+run without it) the work runs on threads; otherwise on a process pool.
+
+Callers normally reach this module through ``encrypt(..., workers=N)`` and
+``decrypt(..., workers=N)``.
+"""
+
+import hmac
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from . import backends
+from .core import PARALLEL_THRESHOLD, KhanDecryptionError, derive_key
+from .segmented import (
+    DEFAULT_SEGMENT_SIZE,
+    _assemble,
+    _crypt_segment,
+    _new_header,
+    _segment_count,
+    _segment_mac,
+    parse_header,
+)
+
+# Each task handles this many segments per worker pass, keeping pool
+# overhead small while still balancing uneven progress.
+_TASKS_PER_WORKER = 4
+
+
+def default_workers() -> int:
+    """Return the number of usable CPU cores."""
+    return os.cpu_count() or 1
+
+
+def _make_executor(workers: int, mp_context=None) -> Executor:
+    backend = backends.current()
+    if backend.releases_gil:
+        return ThreadPoolExecutor(max_workers=workers)
+    # Spawned and forkserver children start from KHAN_BACKEND / auto-detection,
+    # so pin them to the backend selected here.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                               initializer=backends.set_backend, initargs=(backend.name,))
+
+
+def _runs(count: int, workers: int) -> list[tuple[int, int]]:
+    """Split ``count`` segments into contiguous (first, stop) index runs."""
+    n_tasks = max(1, min(count, workers * _TASKS_PER_WORKER))
+    step = -(-count // n_tasks)
+    return [(first, min(first + step, count)) for first in range(0, count, step)]
+
+
+def _task_data(pool: Executor, data: memoryview):
+    """Threads share the caller's buffer; processes need a picklable copy."""
+    if isinstance(pool, ThreadPoolExecutor):
+        return data
+    return data.tobytes()
+
+
+def _encrypt_run(
+    derived_key: bytes, prime: int, iv: bytes, first: int, data: bytes, segment_size: int
+) -> list[bytes]:
+    return [
+        _crypt_segment(derived_key, prime, iv, first + i, data[off:off + segment_size])
+        for i, off in enumerate(range(0, len(data), segment_size))
+    ]
+
+
+def _decrypt_run(
+    key: bytes, fixed: bytes, macs: list[bytes], derived_key: bytes, prime: int,
+    iv: bytes, first: int, data: bytes, segment_size: int
+) -> bytes:
+    out = []
+    for i, off in enumerate(range(0, len(data), segment_size)):
+        index = first + i
+        ciphertext = data[off:off + segment_size]
+        if not hmac.compare_digest(_segment_mac(key, fixed, index, ciphertext), macs[i]):
+            raise KhanDecryptionError(
+                f"MAC verification failed for segment {index}. "
+                "Data may have been tampered with.")
+        out.append(_crypt_segment(derived_key, prime, iv, index, ciphertext))
+    return b''.join(out)
+
+
+def encrypt_parallel(
+    plaintext: bytes,
+    key: bytes,
+    prime: int | None = None,
+    workers: int | None = None,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    executor: Executor | None = None,
+    parallel_threshold: int = PARALLEL_THRESHOLD,
+) -> bytes:
+    """
+    Encrypts plaintext into a segmented payload using several cores.
+
+    Plaintexts smaller than ``parallel_threshold`` are still segmented but
+    encrypted in the calling thread, as starting a pool would cost more
+    than it saves.
+
+    Args:
+        plaintext (bytes): The arbitrary data to encrypt.
+        key (bytes): The master cryptographic key (should be 32 bytes).
+        prime (int | None): An explicit full reptend prime, or None to
+            use the default 128-bit prime (embedded in payload).
+        workers (int | None): Degree of parallelism; defaults to the CPU count.
+        segment_size (int): Plaintext bytes per independently keyed segment.
+        executor (Executor | None): Pool to run on instead of a fresh one.
+        parallel_threshold (int): Smallest plaintext encrypted on the pool.
+
+    Returns:
+        bytes: A segmented payload, readable by :func:`core.decrypt`.
+
+    Raises:
+        ValueError: If plaintext is empty.
+    """
+    if isinstance(plaintext, str):
+        plaintext = plaintext.encode('utf-8')
+    if not plaintext:
+        raise ValueError("Plaintext cannot be empty.")
+    if not 0 < segment_size < 1 << 32:
+        raise ValueError("segment_size must be between 1 and 2**32 - 1.")
+    workers = workers or default_workers()
+
+    view = memoryview(plaintext)
+    salt, iv, prime, fixed = _new_header(prime, segment_size, len(view))
+    derived_key = derive_key(key, salt)
+    if len(view) < parallel_threshold:
+        return _assemble(key, fixed, _encrypt_run(derived_key, prime, iv, 0, view, segment_size))
+    runs = _runs(_segment_count(len(view), segment_size), workers)
+
+    pool = executor or _make_executor(workers)
+    try:
+        futures = [
+            pool.submit(_encrypt_run, derived_key, prime, iv, first,
+                        _task_data(pool, view[first * segment_size:stop * segment_size]),
+                        segment_size)
+            for first, stop in runs
+        ]
+        segments = [ct for future in futures for ct in future.result()]
+    finally:
+        if executor is None:
+            pool.shutdown()
+    return _assemble(key, fixed, segments)
+
+
+def decrypt_parallel(
+    payload: bytes,
+    key: bytes,
+    prime: int | None = None,
+    workers: int | None = None,
+    executor: Executor | None = None,
+    parallel_threshold: int = PARALLEL_THRESHOLD,
+) -> bytes:
+    """
+    Decrypts a segmented payload using several cores.
+
+    Payloads smaller than ``parallel_threshold`` are decrypted in the
+    calling thread.
+
+    Args:
+        payload (bytes): The segmented payload.
+        key (bytes): The symmetric master key.
+        prime (int | None): Explicit prime override.
+        workers (int | None): Degree of parallelism; defaults to the CPU count.
+        executor (Executor | None): Pool to run on instead of a fresh one.
+        parallel_threshold (int): Smallest payload decrypted on the pool.
+
+    Returns:
+        bytes: The original plaintext.
+
+    Raises:
+        KhanDecryptionError: If the payload is invalid or any MAC fails.
+    """
+    workers = workers or default_workers()
+    view = memoryview(payload)
+    header = parse_header(view, key, prime)
+    derived_key = derive_key(key, header.salt)
+    size = header.segment_size
+    body = view[header.data_offset:]
+    if len(view) < parallel_threshold:
+        return _decrypt_run(key, header.fixed, header.macs, derived_key, header.prime,
+                            header.iv, 0, body, size)
+
+    pool = executor or _make_executor(workers)
+    try:
+        futures = [
+            pool.submit(_decrypt_run, key, header.fixed, header.macs[first:stop],
+                        derived_key, header.prime, header.iv, first,
+                        _task_data(pool, body[first * size:stop * size]), size)
+            for first, stop in _runs(header.segment_count, workers)
+        ]
+        return b''.join(future.result() for future in futures)
+    finally:
+        if executor is None:
+            pool.shutdown()
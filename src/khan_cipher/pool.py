@@ -0,0 +1,320 @@
+"""
+Background keystream pregeneration.
+
+The keystream of a message depends only on the derived key, the prime and
+the IV, never on the plaintext.  A :class:`KeystreamPool` bound to one
+master key draws fresh (salt, IV) pairs and generates their keystreams in
+the background, so :meth:`KeystreamPool.encrypt` on the request path is
+only an XOR and an HMAC::
+
+    with KeystreamPool(master_key, sizes=(1024, 65536)) as pool:
+        pool.wait_ready()
+        payload = pool.encrypt(message)   # readable by core.decrypt
+
+Entries are kept per size class.  A message takes an entry from the
+smallest non-empty class that fits and uses a prefix of its keystream;
+each entry is removed from the pool before use, so no (salt, IV,
+keystream) tuple is ever used twice.
+Messages larger than every class, or arriving while their class is empty,
+are encrypted inline and counted as misses.
+
+Generation runs on threads when the backend releases the GIL and on
+processes otherwise (see :mod:`khan_cipher.parallel`).  Pooled keystream
+is key material: it lives in process memory until used or the pool is
+closed.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import Executor, Future
+from typing import NamedTuple
+
+from . import stats as _stats
+from .core import (
+    SEGMENTED_MAGIC,
+    decrypt,
+    new_keystream,
+    _keyed_digest,
+    _mac_template,
+    _open,
+    _seal,
+    _seal_keystream,
+)
+from .parallel import _make_executor
+from .primes import DEFAULT_PRIME
+
+DEFAULT_SIZES = (1024, 16 * 1024, 256 * 1024)
+DEFAULT_MEMORY_LIMIT = 32 << 20
+
+
+class _Entry(NamedTuple):
+    salt: bytes
+    iv: bytes
+    keystream: bytes
+
+
+def _generate(derived_key: bytes, prime: int, iv: bytes, size: int) -> bytes:
+    """Worker: the first ``size`` keystream bytes (module-level for pickling)."""
+    return new_keystream(derived_key, prime, iv).generate(size)
+
+
+class _SizeClass:
+    __slots__ = ('size', 'capacity', 'ready', 'in_flight')
+
+    def __init__(self, size: int, capacity: int):
+        self.size = size
+        self.capacity = capacity
+        self.ready: deque[_Entry] = deque()
+        self.in_flight = 0
+
+
+class KeystreamPool:
+    """
+    Pregenerates single-use keystreams for one master key.
+
+    Payloads are identical in format to :func:`core.encrypt` and
+    interchangeable with the module-level functions.
+
+    Args:
+        master_key (bytes): The master cryptographic key (should be 32 bytes).
+        sizes (Sequence[int]): Keystream lengths of the size classes.
+        memory_limit (int): Upper bound on pooled plus in-flight keystream
+            bytes, shared equally between the size classes.  Every class
+            holds at least one entry.
+        workers (int): Background generators running at once.
+        prime (int | None): An explicit full reptend prime used for every
+            message, or None to use (and embed) the default prime.
+        version (int): Payload format, as for :func:`core.encrypt`.
+        executor (Executor | None): Pool to generate on instead of a
+            fresh one; it is not shut down by :meth:`close`.
+    """
+
+    def __init__(
+        self,
+        master_key: bytes,
+        sizes: Sequence[int] = DEFAULT_SIZES,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        workers: int = 1,
+        prime: int | None = None,
+        version: int = 1,
+        executor: Executor | None = None,
+    ):
+        if not sizes or min(sizes) <= 0:
+            raise ValueError("sizes must be positive.")
+        if version not in (1, 2):
+            raise ValueError(f"Unsupported payload version {version}.")
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        self._master_key = master_key
+        self._mac_key = _mac_template(master_key)
+        self._embed_prime = prime is None
+        self.prime = DEFAULT_PRIME if prime is None else prime
+        self.version = version
+        self.workers = workers
+
+        share = memory_limit // len(set(sizes))
+        self._classes = [_SizeClass(size, max(1, share // size))
+                         for size in sorted(set(sizes))]
+        self._lock = threading.Lock()
+        self._ready_event = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._closed = False
+        self._hits = 0
+        self._misses = 0
+        self._generated = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._errors = 0
+        self._error: BaseException | None = None
+
+        self._own_executor = executor is None
+        self._executor = _make_executor(workers) if executor is None else executor
+        self._refill()
+
+    # ----------------------------------------------------------------- #
+    #  Background refill.                                                #
+    # ----------------------------------------------------------------- #
+
+    def _refill(self) -> None:
+        """Submit generation jobs until every class is full or all workers are busy."""
+        jobs = []
+        with self._lock:
+            while not self._closed and self._in_flight < self.workers:
+                size_class = min(
+                    (c for c in self._classes if len(c.ready) + c.in_flight < c.capacity),
+                    key=lambda c: (len(c.ready) + c.in_flight) / c.capacity,
+                    default=None)
+                if size_class is None:
+                    break
+                size_class.in_flight += 1
+                self._in_flight += 1
+                jobs.append(size_class)
+
+        for size_class in jobs:
+            randomness = os.urandom(32)
+            salt, iv = randomness[:16], randomness[16:]
+            derived_key = _keyed_digest(self._mac_key, salt)
+            requested = time.perf_counter()
+            try:
+                future = self._executor.submit(_generate, derived_key, self.prime, iv, size_class.size)
+            except RuntimeError as e:  # executor shut down
+                self._job_done(size_class, e)
+                continue
+            future.add_done_callback(
+                lambda f, c=size_class, s=salt, i=iv, r=requested: self._on_ready(f, c, s, i, r))
+
+    def _job_done(self, size_class: _SizeClass, error: BaseException) -> None:
+        with self._lock:
+            size_class.in_flight -= 1
+            self._in_flight -= 1
+            if not self._closed:
+                self._errors += 1
+                self._error = self._error or error
+            self._ready_event.notify_all()
+
+    def _on_ready(
+        self, future: Future, size_class: _SizeClass, salt: bytes, iv: bytes, requested: float
+    ) -> None:
+        lag = time.perf_counter() - requested
+        keystream = error = None
+        try:
+            keystream = future.result()
+        except BaseException as e:  # including CancelledError
+            error = e
+        with self._lock:
+            size_class.in_flight -= 1
+            self._in_flight -= 1
+            if self._closed:
+                keystream = None
+            elif keystream is None:
+                self._errors += 1
+                self._error = self._error or error
+            else:
+                size_class.ready.append(_Entry(salt, iv, keystream))
+                self._generated += 1
+                self._lag_total += lag
+                self._lag_max = max(self._lag_max, lag)
+            self._ready_event.notify_all()
+        if keystream is not None:
+            if _stats.is_enabled():
+                _stats.record('pool_refill', lag, size_class.size)
+            self._refill()
+
+    # ----------------------------------------------------------------- #
+    #  Request path.                                                     #
+    # ----------------------------------------------------------------- #
+
+    def _take(self, n: int) -> _Entry | None:
+        """Remove and return an entry of at least n bytes, or None."""
+        with self._lock:
+            for size_class in self._classes:
+                if size_class.size >= n and size_class.ready:
+                    self._hits += 1
+                    return size_class.ready.popleft()
+            self._misses += 1
+            return None
+
+    def encrypt(self, plaintext: bytes) -> bytes:
+        """
+        Encrypts a plaintext with a pregenerated keystream if one fits.
+
+        Raises:
+            ValueError: If plaintext is empty.
+        """
+        if isinstance(plaintext, str):
+            plaintext = plaintext.encode('utf-8')
+        if not plaintext:
+            raise ValueError("Plaintext cannot be empty.")
+
+        entry = self._take(len(plaintext))
+        self._refill()
+        if entry is None:
+            randomness = os.urandom(32)
+            return _seal(plaintext, self._mac_key, randomness[:16], randomness[16:],
+                         self.prime, self._embed_prime, self.version)
+        t = _stats.start()
+        keystream = memoryview(entry.keystream)[:len(plaintext)]
+        return _seal_keystream(plaintext, keystream, self._mac_key, entry.salt, entry.iv,
+                               self.prime, self._embed_prime, self.version, t, t)
+
+    def decrypt(self, payload: bytes) -> bytes:
+        """
+        Decrypts a payload; see :func:`core.decrypt`.
+
+        Raises:
+            KhanDecryptionError: If the payload is invalid or MAC fails.
+        """
+        if payload[:len(SEGMENTED_MAGIC)] == SEGMENTED_MAGIC:
+            return decrypt(payload, self._master_key, None if self._embed_prime else self.prime)
+        return _open(payload, self._mac_key, None if self._embed_prime else self.prime)
+
+    # ----------------------------------------------------------------- #
+    #  Lifecycle and metrics.                                            #
+    # ----------------------------------------------------------------- #
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """
+        Block until every size class is full.
+
+        Returns:
+            bool: False if the timeout expired first.
+
+        Raises:
+            RuntimeError: If a background generation has failed, since
+                its class may then never fill.  :meth:`encrypt` keeps
+                working, falling back to inline encryption.
+        """
+        def done():
+            return (self._closed or self._error is not None
+                    or all(len(c.ready) >= c.capacity for c in self._classes))
+        with self._ready_event:
+            ready = self._ready_event.wait_for(done, timeout)
+            if self._error is not None:
+                raise RuntimeError("Background keystream generation failed.") from self._error
+            return ready
+
+    def metrics(self) -> dict:
+        """
+        Pool statistics.
+
+        Returns:
+            dict: ``hits``, ``misses`` and ``hit_rate`` of :meth:`encrypt`
+            calls; ``refill_lag_mean_s`` / ``refill_lag_max_s``, the time
+            from scheduling an entry to its keystream being ready;
+            ``generated``, ``errors``, ``in_flight``, ``pooled_bytes``
+            and, per class, ``ready`` / ``capacity``.
+        """
+        with self._lock:
+            calls = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / calls if calls else 0.0,
+                'generated': self._generated,
+                'errors': self._errors,
+                'refill_lag_mean_s': self._lag_total / self._generated if self._generated else 0.0,
+                'refill_lag_max_s': self._lag_max,
+                'in_flight': self._in_flight,
+                'pooled_bytes': sum(c.size * len(c.ready) for c in self._classes),
+                'classes': {c.size: {'ready': len(c.ready), 'capacity': c.capacity}
+                            for c in self._classes},
+            }
+
+    def close(self) -> None:
+        """Stop refilling and discard every pooled keystream."""
+        with self._lock:
+            self._closed = True
+            for size_class in self._classes:
+                size_class.ready.clear()
+            self._ready_event.notify_all()
+        if self._own_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> 'KeystreamPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
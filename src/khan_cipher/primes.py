@@ -6,11 +6,236 @@ meaning ord_p(10) = p - 1. This module provides utilities for validating
 and generating such primes at cryptographic bit sizes.
 """
 
+import atexit
+import json
+import multiprocessing
+import os
 import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
 from sympy import isprime, factorint
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None  # type: ignore[assignment]
 
-def is_full_reptend_prime(p: int) -> bool:
+
+# --------------------------------------------------------------------- #
+#  Shared JSON file helpers (prime pool and verification cache).        #
+# --------------------------------------------------------------------- #
+
+@contextmanager
+def _file_lock(path: str):
+    """Hold an exclusive flock on ``path + '.lock'`` for the block."""
+    with open(path + '.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_json(path: str, data: dict) -> None:
+    """Atomically replace ``path`` with ``data``."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+# --------------------------------------------------------------------- #
+#  Validation.                                                           #
+# --------------------------------------------------------------------- #
+
+class PrimeValidationTimeout(TimeoutError):
+    """Raised when p - 1 cannot be factored within the allowed time."""
+    pass
+
+
+class VerificationCache:
+    """
+    Remembers full reptend verdicts keyed by prime.
+
+    Entries live in memory and, when ``path`` is given, in a JSON file
+    that is loaded on creation and merged on every write, so several
+    processes (or restarts) share the work.  With ``max_size`` the
+    in-memory entries form an LRU: once full, the least recently used
+    verdict is dropped, so primes taken from untrusted input cannot grow
+    the cache without bound.
+
+    Args:
+        path: Optional JSON file backing the cache.
+        max_size: Most verdicts kept in memory, or None for no limit.
+    """
+
+    def __init__(self, path: str | os.PathLike | None = None, max_size: int | None = None):
+        if max_size is not None and max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+        self.path = os.fspath(path) if path is not None else None
+        self.max_size = max_size
+        self._verdicts: OrderedDict[int, bool] = OrderedDict()
+        self._lock = threading.Lock()
+        if self.path is not None:
+            with _file_lock(self.path):
+                self._merge(_read_json(self.path))
+
+    def _merge(self, stored: dict[str, bool]) -> None:
+        for key, verdict in stored.items():
+            self._remember(int(key, 16), bool(verdict))
+
+    def _remember(self, p: int, verdict: bool) -> None:
+        with self._lock:
+            self._verdicts[p] = verdict
+            self._verdicts.move_to_end(p)
+            if self.max_size is not None and len(self._verdicts) > self.max_size:
+                self._verdicts.popitem(last=False)
+
+    def get(self, p: int) -> bool | None:
+        """Return the cached verdict for p, or None if unknown."""
+        with self._lock:
+            verdict = self._verdicts.get(p)
+            if verdict is not None:
+                self._verdicts.move_to_end(p)
+            return verdict
+
+    def put(self, p: int, verdict: bool) -> None:
+        """Record a verdict, persisting it if the cache is file-backed."""
+        self._remember(p, verdict)
+        if self.path is None:
+            return
+        with _file_lock(self.path):
+            stored = _read_json(self.path)
+            stored[format(p, 'x')] = verdict
+            _write_json(self.path, stored)
+            self._merge(stored)
+
+    def __len__(self) -> int:
+        return len(self._verdicts)
+
+    def __contains__(self, p: int) -> bool:
+        return p in self._verdicts
+
+
+# Process-wide cache used when no explicit cache is passed.
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_CACHE = VerificationCache(max_size=DEFAULT_CACHE_SIZE)
+
+
+def _factorint_worker(n: int) -> dict[int, int]:
+    return factorint(n)
+
+
+# Worker process for time-bounded factorizations.  Starting a process costs
+# far more than most factorizations, so one is kept for the life of the
+# process and replaced only when a timeout forces it to be killed.
+_factor_pool = None
+_factor_pool_pid = None
+_factor_lock = threading.Lock()
+
+
+def _factor_with_timeout(n: int, timeout: float) -> dict[int, int]:
+    """factorint(n) in the shared worker, killing it after timeout seconds."""
+    global _factor_pool, _factor_pool_pid
+    with _factor_lock:
+        if _factor_pool is None or _factor_pool_pid != os.getpid():
+            _factor_pool = multiprocessing.Pool(1)
+            _factor_pool_pid = os.getpid()
+        result = _factor_pool.apply_async(_factorint_worker, (n,))
+        try:
+            return result.get(timeout)
+        except multiprocessing.TimeoutError:
+            _factor_pool.terminate()
+            _factor_pool = None
+            raise
+
+
+@atexit.register
+def _close_factor_pool() -> None:
+    if _factor_pool is not None and _factor_pool_pid == os.getpid():
+        _factor_pool.terminate()
+
+
+def _prime_factors_of_order(p: int, timeout: float | None) -> set[int]:
+    """
+    Distinct prime factors of p - 1.
+
+    Safe primes are recognised directly.  Otherwise factors below
+    _SIEVE_LIMIT are removed by trial division and any composite cofactor
+    is factored fully -- in a shared worker process, killed after
+    ``timeout`` seconds, when a timeout is given.
+    """
+    order = p - 1
+    if order % 2 == 0 and isprime(order // 2):
+        return {2, order // 2}
+
+    factors = set()
+    remaining = order
+    for q in (2, 3, 5) + _small_primes():
+        if remaining % q == 0:
+            factors.add(q)
+            while remaining % q == 0:
+                remaining //= q
+    if remaining == 1 or isprime(remaining):
+        return factors | {remaining} if remaining > 1 else factors
+
+    if timeout is None:
+        return factors | set(factorint(remaining))
+
+    try:
+        return factors | set(_factor_with_timeout(remaining, timeout))
+    except multiprocessing.TimeoutError:
+        raise PrimeValidationTimeout(
+            f"Could not factor p - 1 within {timeout}s; "
+            "supply factors= or use a safe prime.") from None
+
+
+def _factors_from_supplied(p: int, factors) -> set[int]:
+    """Validate a caller-supplied factorization of p - 1."""
+    if isinstance(factors, dict):
+        exponents = dict(factors)
+    else:
+        exponents = {}
+        remaining = p - 1
+        for q in set(factors):
+            if q < 2 or remaining % q:
+                raise ValueError(f"{q} does not divide p - 1.")
+            e = 0
+            while remaining % q == 0:
+                remaining //= q
+                e += 1
+            exponents[q] = e
+
+    product = 1
+    for q, e in exponents.items():
+        product *= q ** e
+    if product != p - 1:
+        raise ValueError("Supplied factors do not multiply to p - 1.")
+    for q in exponents:
+        if not isprime(q):
+            raise ValueError(f"Supplied factor {q} is not prime.")
+    return set(exponents)
+
+
+def is_full_reptend_prime(
+    p: int,
+    factors=None,
+    timeout: float | None = None,
+    cache: VerificationCache | None = None,
+) -> bool:
     """
     Check whether p is a full reptend prime (10 is a primitive root mod p).
 
@@ -18,26 +243,51 @@ def is_full_reptend_prime(p: int) -> bool:
         1. p is prime.
         2. For every prime factor q of (p - 1), 10^((p-1)/q) ≢ 1 (mod p).
 
+    The factorization of p - 1 comes from, in order of preference: the
+    ``factors`` argument, the safe-prime structure p - 1 = 2q, or trial
+    division followed by a full (optionally time-bounded) factorization.
+    Verdicts are memoised in ``cache`` (``DEFAULT_CACHE`` if omitted), so
+    repeated checks of the same prime are free.
+
     Args:
         p: The candidate integer.
+        factors: Optional factorization of p - 1, either a ``{q: e}``
+            mapping or an iterable of its distinct prime factors.
+        timeout: Maximum seconds to spend factoring p - 1, or None for
+            no limit.  Bounded factorizations run one at a time in a
+            worker process that is started on first use (a few hundred
+            milliseconds) and restarted after each timeout; p whose
+            p - 1 yields to trial division never reach it.
+        cache: Verification cache to consult and update.
 
     Returns:
         True if p is a full reptend prime, False otherwise.
+
+    Raises:
+        ValueError: If ``factors`` is not a prime factorization of p - 1.
+        PrimeValidationTimeout: If factoring exceeds ``timeout``.
     """
-    if p < 3 or not isprime(p):
+    if p < 3:
         return False
 
-    if p == 2 or p == 5:
-        return False  # gcd(10, p) != 1
-
-    order = p - 1
-    prime_factors = factorint(order)
+    if cache is None:
+        cache = DEFAULT_CACHE
+    cached = cache.get(p)
+    if cached is not None:
+        return cached
 
-    for q in prime_factors:
-        if pow(10, order // q, p) == 1:
-            return False
+    if not isprime(p) or p == 5:
+        verdict = False  # composite, or gcd(10, p) != 1
+    else:
+        if factors is not None:
+            prime_factors = _factors_from_supplied(p, factors)
+        else:
+            prime_factors = _prime_factors_of_order(p, timeout)
+        order = p - 1
+        verdict = all(pow(10, order // q, p) != 1 for q in prime_factors)
 
-    return True
+    cache.put(p, verdict)
+    return verdict
 
 
 # --------------------------------------------------------------------- #
@@ -62,7 +312,144 @@ def _find_default_prime() -> int:
 DEFAULT_PRIME: int = _find_default_prime()
 
 
-def generate_full_reptend_prime(bits: int = 128) -> int:
+# --------------------------------------------------------------------- #
+#  Prime registry.                                                       #
+#  Version 2 payloads name a well-known prime by a 1-byte ID instead of  #
+#  embedding it.  IDs are part of the wire format: never renumber them.  #
+# --------------------------------------------------------------------- #
+
+PRIME_REGISTRY: dict[int, int] = {
+    # 128-bit default prime.
+    1: DEFAULT_PRIME,
+    # 256-bit safe full reptend prime.
+    2: 0x8a7c9962f6f606b458a94bc487b66ae1e66d44d9362859e8e0999e70a3ad9077,
+    # 512-bit safe full reptend prime.
+    3: int(
+        '8144c3c958fe33988334bf46eb320bae220fe78359f91471dd4b96271d2693b9'
+        '9e99a2cc8aa497801a1b2442e66b39a4716d4c3e3b601ee6011c605d0d368d8f', 16),
+}
+
+# Reverse lookup: prime -> registry ID.
+_PRIME_IDS: dict[int, int] = {p: i for i, p in PRIME_REGISTRY.items()}
+
+
+def prime_id(prime: int) -> int | None:
+    """Return the registry ID of a prime, or None if it is not registered."""
+    return _PRIME_IDS.get(prime)
+
+
+def register_prime(registry_id: int, prime: int) -> None:
+    """
+    Register an application-specific prime under a 1-byte ID.
+
+    Both the encrypting and decrypting side must register the same
+    mapping before exchanging payloads that use it.
+
+    Args:
+        registry_id: An ID in [1, 255].
+        prime: A full reptend prime.
+
+    Raises:
+        ValueError: If the ID is out of range or already bound to another
+            prime, the prime already has an ID, or it is not full reptend.
+    """
+    if not 1 <= registry_id <= 255:
+        raise ValueError("Prime IDs must be in [1, 255].")
+    if PRIME_REGISTRY.get(registry_id) == prime:
+        return
+    if registry_id in PRIME_REGISTRY:
+        raise ValueError(f"Prime ID {registry_id} is already registered.")
+    if prime in _PRIME_IDS:
+        raise ValueError(f"Prime is already registered as ID {_PRIME_IDS[prime]}.")
+    if not is_full_reptend_prime(prime):
+        raise ValueError(f"{prime} is not a full reptend prime.")
+    PRIME_REGISTRY[registry_id] = prime
+    _PRIME_IDS[prime] = registry_id
+
+
+# --------------------------------------------------------------------- #
+#  Sieved candidate pipeline.                                           #
+#                                                                       #
+#  For a safe prime p = 2q + 1 (q > 5), 10^q mod p is the Legendre     #
+#  symbol (10/p), so 10 is a primitive root exactly when (10/p) = -1.  #
+#  By quadratic reciprocity that happens iff q mod 20 is 3, 9 or 11,   #
+#  so candidates are drawn only from those residue classes and sieved  #
+#  for small factors of both q and 2q + 1 before any primality test.   #
+# --------------------------------------------------------------------- #
+
+_Q_RESIDUES = (3, 9, 11)
+_Q_STEP = 20
+_SIEVE_LIMIT = 1 << 16
+_SIEVE_WIDTH = 1 << 14
+
+
+@lru_cache(maxsize=1)
+def _small_primes() -> tuple[int, ...]:
+    """Odd primes below _SIEVE_LIMIT except 5, which the residues handle."""
+    flags = bytearray([1]) * _SIEVE_LIMIT
+    flags[:2] = b'\x00\x00'
+    for i in range(2, int(_SIEVE_LIMIT ** 0.5) + 1):
+        if flags[i]:
+            flags[i * i::i] = bytes(len(range(i * i, _SIEVE_LIMIT, i)))
+    return tuple(i for i in range(3, _SIEVE_LIMIT) if flags[i] and i != 5)
+
+
+def _sieve(q0: int, width: int) -> bytearray:
+    """
+    Mark q = q0 + 20k (0 <= k < width) whose q and 2q + 1 have no factor
+    below _SIEVE_LIMIT.
+    """
+    survivors = bytearray([1]) * width
+    for s in _small_primes():
+        inv_step = pow(_Q_STEP, -1, s)
+        # q == 0 (mod s)  and  2q + 1 == 0, i.e. q == (s - 1) / 2 (mod s)
+        for target in (0, (s - 1) // 2):
+            k = (target - q0) * inv_step % s
+            if k < width:
+                survivors[k::s] = bytes(len(range(k, width, s)))
+    return survivors
+
+
+def _probable_prime(n: int) -> bool:
+    """Cheap base-2 Fermat filter run before the full sympy test."""
+    return pow(2, n - 1, n) == 1
+
+
+def _search_window(bits: int) -> int | None:
+    """Scan one random sieved window for a safe full reptend prime."""
+    top = 1 << (bits - 2)
+    start = secrets.randbits(bits - 1) | top
+    for residue in _Q_RESIDUES:
+        q0 = start - start % _Q_STEP + residue
+        for k, alive in enumerate(_sieve(q0, _SIEVE_WIDTH)):
+            if not alive:
+                continue
+            q = q0 + _Q_STEP * k
+            p = 2 * q + 1
+            if p.bit_length() != bits:
+                break
+            if not (_probable_prime(q) and _probable_prime(p)):
+                continue
+            if isprime(q) and isprime(p) and _is_safe_full_reptend(p, q):
+                return p
+    return None
+
+
+def _search_windows(bits: int, windows: int) -> int | None:
+    """Process-pool task: try up to ``windows`` windows."""
+    for _ in range(windows):
+        p = _search_window(bits)
+        if p is not None:
+            return p
+    return None
+
+
+def _is_safe_full_reptend(p: int, q: int) -> bool:
+    """Primitive root check for p = 2q + 1: the prime factors of p - 1 are {2, q}."""
+    return pow(10, 2, p) != 1 and pow(10, q, p) != 1
+
+
+def generate_full_reptend_prime(bits: int = 128, workers: int | None = None) -> int:
     """
     Generate a random full reptend prime of approximately the given bit size.
 
@@ -71,8 +458,15 @@ def generate_full_reptend_prime(bits: int = 128) -> int:
     so the primitive root check reduces to two modular exponentiations:
         10^2 ≢ 1 (mod p)   AND   10^q ≢ 1 (mod p).
 
+    Candidates come from a sieved pipeline (see ``_sieve``): only residue
+    classes of q that make 10 a primitive root are scanned, and q and 2q + 1
+    are both trial-divided by every prime below 2^16 at once.  With
+    ``workers`` > 1 the windows are searched on a process pool.
+
     Args:
         bits: Desired bit size of the prime (minimum 32).
+        workers: Number of processes to search with; None or 1 searches
+            in the calling process.
 
     Returns:
         A full reptend prime of the requested bit size.
@@ -83,24 +477,106 @@ def generate_full_reptend_prime(bits: int = 128) -> int:
     if bits < 32:
         raise ValueError("Minimum prime size is 32 bits.")
 
-    while True:
-        # Generate a random odd number of the correct bit size
-        q = secrets.randbits(bits - 1) | (1 << (bits - 2)) | 1
+    if workers is None or workers <= 1:
+        while True:
+            p = _search_window(bits)
+            if p is not None:
+                return p
 
-        if not isprime(q):
-            continue
+    # Not a ``with`` block: its exit would wait for every window still being
+    # searched.  The searches left running finish their window and the
+    # worker processes exit in the background.
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = {pool.submit(_search_windows, bits, 1) for _ in range(workers)}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                p = future.result()
+                if p is not None:
+                    return p
+                pending.add(pool.submit(_search_windows, bits, 1))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --------------------------------------------------------------------- #
+#  On-disk prime pool.                                                   #
+# --------------------------------------------------------------------- #
+
+class PrimePoolEmpty(LookupError):
+    """Raised when a PrimePool has no prime of the requested size."""
+    pass
+
+
+class PrimePool:
+    """
+    A persisted pool of verified full reptend primes, grouped by bit size.
+
+    A background job calls :meth:`refill` to keep the pool topped up;
+    services that rotate primes call :meth:`pop` to take one instantly.
+    The pool is a small JSON file; every read-modify-write holds an
+    exclusive ``flock`` on a sibling ``.lock`` file so several processes
+    can share it.
+
+    Args:
+        path: Location of the JSON pool file (created on first write).
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = os.fspath(path)
+
+    def size(self, bits: int = 128) -> int:
+        """Number of pooled primes of the given bit size."""
+        with _file_lock(self.path):
+            return len(_read_json(self.path).get(str(bits), []))
 
-        p = 2 * q + 1
+    def add(self, *primes: int) -> None:
+        """
+        Verify and add primes to the pool.
 
-        if not isprime(p):
-            continue
+        Raises:
+            ValueError: If any value is not a full reptend prime.
+        """
+        for p in primes:
+            if not is_full_reptend_prime(p):
+                raise ValueError(f"{p} is not a full reptend prime.")
+        with _file_lock(self.path):
+            pool = _read_json(self.path)
+            for p in primes:
+                pool.setdefault(str(p.bit_length()), []).append(format(p, 'x'))
+            _write_json(self.path, pool)
 
-        # Safe prime found.  Check primitive root condition:
-        #   p - 1 = 2q, prime factors are {2, q}
-        #   Need: 10^2 mod p != 1  AND  10^q mod p != 1
-        if pow(10, 2, p) == 1:
-            continue
-        if pow(10, q, p) == 1:
-            continue
+    def pop(self, bits: int = 128) -> int:
+        """
+        Remove and return a pooled prime of the given bit size.
 
+        Raises:
+            PrimePoolEmpty: If no prime of that size is available.
+        """
+        with _file_lock(self.path):
+            pool = _read_json(self.path)
+            entries = pool.get(str(bits))
+            if not entries:
+                raise PrimePoolEmpty(f"No {bits}-bit primes in {self.path}.")
+            p = int(entries.pop(), 16)
+            _write_json(self.path, pool)
         return p
+
+    def refill(self, bits: int = 128, target: int = 16, workers: int | None = None) -> int:
+        """
+        Generate primes until the pool holds ``target`` of the given size.
+
+        Args:
+            bits: Bit size of the primes.
+            target: Desired number of pooled primes.
+            workers: Processes used by :func:`generate_full_reptend_prime`.
+
+        Returns:
+            The number of primes added.
+        """
+        added = 0
+        while self.size(bits) < target:
+            self.add(generate_full_reptend_prime(bits, workers=workers))
+            added += 1
+        return added
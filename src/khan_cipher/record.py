@@ -0,0 +1,378 @@
+"""
+Record-layer framing for long-lived encrypted streams.
+
+A standard payload carries a single trailing MAC, so nothing can be
+released before the whole message has arrived.  The record protocol cuts a
+stream into independently authenticated records, so the receiver verifies
+and delivers each one as soon as it is complete and never buffers more
+than one record.
+
+Wire format::
+
+    StreamHeader: Magic(4) | Flags(1) | Salt(16) | IV(16) |
+                  [PrimeLen(2) | Prime(N)] | HeaderTag(16)
+    Record:       LengthAndFinal(4) | Sequence(8) | Ciphertext(L) | Tag(16)
+
+``Flags`` bit 0 marks an embedded prime; other bits are reserved and
+rejected.  ``HeaderTag`` is a truncated HMAC of the header under the master
+key.  Record i is encrypted with its own keystream, keyed from the derived
+key and i, so records can be sealed and opened concurrently.  Its tag is a
+truncated HMAC, under a MAC key derived from the salt, of the 12-byte
+record header and the ciphertext.
+
+Both directions of a connection share the master key, so every endpoint
+has a role, ``'initiator'`` or ``'responder'``.  The sender's role is mixed
+into the header tag and into both per-record derivations, and a receiver
+only accepts the opposite role, so a stream reflected back at its sender
+fails authentication.
+The top bit of the length field marks the final record; a stream that ends
+without it has been truncated.  Sequence numbers must arrive in order, so
+dropped, replayed or reordered records are rejected.
+
+:class:`RecordSocket` runs the protocol over a blocking socket; see
+:class:`khan_cipher.aio.RecordStreamWriter` and
+:class:`~khan_cipher.aio.RecordStreamReader` for asyncio.
+"""
+
+import hmac
+import os
+import socket
+import struct
+from collections import deque
+from hashlib import sha256
+from typing import NamedTuple
+
+from .core import (
+    KhanDecryptionError,
+    derive_key,
+    new_keystream,
+    _decode_prime,
+    _encode_prime,
+    _keyed_digest,
+    _mac_template,
+    _resolve_prime,
+    _xor_bytes,
+)
+from .primes import DEFAULT_PRIME
+
+RECORD_MAGIC = b'KHR\x01'
+TAG_SIZE = 16
+DEFAULT_RECORD_SIZE = 16 * 1024
+MAX_RECORD_SIZE = 1 << 24
+
+INITIATOR = 'initiator'
+RESPONDER = 'responder'
+
+_FLAG_EMBEDDED_PRIME = 0x01
+_DIRECTIONS = {INITIATOR: b'initiator', RESPONDER: b'responder'}
+_FINAL = 0x8000_0000
+_RECORD = struct.Struct('>IQ')
+_SEQUENCE = struct.Struct('>Q')
+_FIXED_HEADER_SIZE = len(RECORD_MAGIC) + 1 + 32
+
+
+class RawRecord(NamedTuple):
+    """A framed record whose tag has not been checked yet."""
+    sequence: int
+    final: bool
+    header: bytes
+    ciphertext: bytes
+    tag: bytes
+
+
+def _direction(role: str, peer: bool = False) -> bytes:
+    """Label of the records sent by ``role`` (or by its peer)."""
+    if role not in _DIRECTIONS:
+        raise ValueError(f"role must be {INITIATOR!r} or {RESPONDER!r}.")
+    if peer:
+        role = RESPONDER if role == INITIATOR else INITIATOR
+    return _DIRECTIONS[role]
+
+
+def _header_tag(key: bytes, direction: bytes, header) -> bytes:
+    return hmac.new(key, direction + bytes(header), sha256).digest()[:TAG_SIZE]
+
+
+class _Session:
+    """Keys of one direction of a record stream."""
+
+    def __init__(self, key: bytes, salt: bytes, iv: bytes, prime: int, direction: bytes):
+        derived = derive_key(key, salt)
+        self._derived = _mac_template(derived)
+        self._mac = _mac_template(_keyed_digest(self._derived, b'record-mac' + direction))
+        self._direction = direction
+        self.iv = iv
+        self.prime = prime
+
+    def crypt(self, sequence: int, data) -> bytes:
+        """XOR data with record ``sequence``'s keystream."""
+        record_key = _keyed_digest(
+            self._derived, b'record' + self._direction + _SEQUENCE.pack(sequence))
+        return _xor_bytes(data, new_keystream(record_key, self.prime, self.iv).generate(len(data)))
+
+    def tag(self, header: bytes, ciphertext) -> bytes:
+        mac = self._mac.copy()
+        mac.update(header)
+        mac.update(ciphertext)
+        return mac.digest()[:TAG_SIZE]
+
+
+class RecordSealer:
+    """
+    Sender side of the record protocol.
+
+    Send :attr:`header` once, then the output of :meth:`seal` for each
+    record and finally :meth:`close`.
+
+    Args:
+        key (bytes): The master cryptographic key (should be 32 bytes).
+        prime (int | None): An explicit full reptend prime, or None to
+            use (and embed) the default prime.
+        role (str): This endpoint's role, ``INITIATOR`` or ``RESPONDER``.
+
+    Raises:
+        ValueError: If role is not one of the two roles.
+    """
+
+    def __init__(self, key: bytes, prime: int | None = None, role: str = INITIATOR):
+        direction = _direction(role)
+        flags = 0
+        prime_field = b''
+        if prime is None:
+            prime = DEFAULT_PRIME
+            flags |= _FLAG_EMBEDDED_PRIME
+            prime_field = _encode_prime(prime)
+        salt = os.urandom(16)
+        iv = os.urandom(16)
+        header = RECORD_MAGIC + bytes((flags,)) + salt + iv + prime_field
+        self.header = header + _header_tag(key, direction, header)
+        self._session = _Session(key, salt, iv, prime, direction)
+        self._sequence = 0
+        self._closed = False
+
+    def seal(self, data, final: bool = False) -> bytes:
+        """
+        Frame and encrypt one record.
+
+        Args:
+            data: Any bytes-like plaintext of at most ``MAX_RECORD_SIZE``
+                bytes (may be empty).
+            final (bool): Mark this as the last record of the stream.
+
+        Returns:
+            bytes: The framed record.
+
+        Raises:
+            ValueError: If data is too large or the stream is closed.
+        """
+        if self._closed:
+            raise ValueError("Record stream is closed.")
+        if len(data) > MAX_RECORD_SIZE:
+            raise ValueError(f"Records are limited to {MAX_RECORD_SIZE} bytes.")
+        sequence = self._sequence
+        self._sequence += 1
+        self._closed = final
+        header = _RECORD.pack(len(data) | (_FINAL if final else 0), sequence)
+        ciphertext = self._session.crypt(sequence, data)
+        return b''.join((header, ciphertext, self._session.tag(header, ciphertext)))
+
+    def close(self) -> bytes:
+        """Return the empty final record that ends the stream."""
+        return self.seal(b'', final=True)
+
+
+class RecordOpener:
+    """
+    Receiver side of the record protocol.
+
+    Feed received bytes to :meth:`feed`, which returns the plaintext of
+    every record completed by them.  Framing and sequencing are handled by
+    :meth:`feed_raw` and verification by :meth:`open`; the latter keeps no
+    state of its own, so records may be opened concurrently.
+
+    Args:
+        key (bytes): The symmetric master key.
+        prime (int | None): Prime for streams that do not embed one; it
+            must match the prime of a stream that does.
+        max_record_size (int): Largest record accepted; bounds buffering.
+        role (str): This endpoint's role; only streams sealed by the
+            other role are accepted.  The default pairs with a
+            :class:`RecordSealer` of the default role.
+
+    Raises:
+        ValueError: If role is not one of the two roles.
+    """
+
+    def __init__(self, key: bytes, prime: int | None = None,
+                 max_record_size: int = MAX_RECORD_SIZE, role: str = RESPONDER):
+        self._direction = _direction(role, peer=True)
+        self._key = key
+        self._prime = prime
+        self._max_record_size = max_record_size
+        self._session: _Session | None = None
+        self._buffer = bytearray()
+        self._sequence = 0
+        self._final_seen = False
+        self.closed = False
+
+    def _parse_header(self) -> bool:
+        """Consume and authenticate the stream header once it is buffered."""
+        data = self._buffer
+        if len(data) < _FIXED_HEADER_SIZE:
+            if RECORD_MAGIC[:len(data)] != data[:len(RECORD_MAGIC)]:
+                raise KhanDecryptionError("Not a record stream.")
+            return False
+        if data[:len(RECORD_MAGIC)] != RECORD_MAGIC:
+            raise KhanDecryptionError("Not a record stream.")
+        flags = data[4]
+        if flags & ~_FLAG_EMBEDDED_PRIME:
+            raise KhanDecryptionError(f"Unsupported record stream flags 0x{flags:02x}.")
+        offset = _FIXED_HEADER_SIZE
+        prime = None
+        if flags & _FLAG_EMBEDDED_PRIME:
+            if len(data) < offset + 2:
+                return False
+            if len(data) < offset + 2 + struct.unpack_from('>H', data, offset)[0]:
+                return False
+            prime, offset = _decode_prime(data, offset)
+        if len(data) < offset + TAG_SIZE:
+            return False
+        expected = _header_tag(self._key, self._direction, data[:offset])
+        if not hmac.compare_digest(expected, bytes(data[offset:offset + TAG_SIZE])):
+            raise KhanDecryptionError("Record stream header failed authentication.")
+        prime = _resolve_prime(prime, self._prime)
+        self._session = _Session(
+            self._key, bytes(data[5:21]), bytes(data[21:37]), prime, self._direction)
+        del data[:offset + TAG_SIZE]
+        return True
+
+    def feed_raw(self, data) -> list[RawRecord]:
+        """
+        Buffer received bytes and split off every complete record.
+
+        Raises:
+            KhanDecryptionError: On a bad header, an oversized record, an
+                out-of-order sequence number or data after the final
+                record.
+        """
+        self._buffer += data
+        if self._session is None and not self._parse_header():
+            return []
+        records = []
+        buffer = self._buffer
+        offset = 0
+        while len(buffer) - offset >= _RECORD.size:
+            if self._final_seen:
+                raise KhanDecryptionError("Data after the final record.")
+            length_field, sequence = _RECORD.unpack_from(buffer, offset)
+            length = length_field & ~_FINAL
+            if length > self._max_record_size:
+                raise KhanDecryptionError(f"Record of {length} bytes exceeds the limit.")
+            if sequence != self._sequence:
+                raise KhanDecryptionError(
+                    f"Record {sequence} arrived, expected {self._sequence}.")
+            end = offset + _RECORD.size + length + TAG_SIZE
+            if len(buffer) < end:
+                break
+            body = offset + _RECORD.size
+            records.append(RawRecord(
+                sequence, bool(length_field & _FINAL), bytes(buffer[offset:body]),
+                bytes(buffer[body:body + length]), bytes(buffer[end - TAG_SIZE:end])))
+            self._sequence += 1
+            self._final_seen = records[-1].final
+            offset = end
+        del buffer[:offset]
+        if self._final_seen and buffer:
+            raise KhanDecryptionError("Data after the final record.")
+        return records
+
+    def open(self, record: RawRecord) -> bytes:
+        """
+        Verify and decrypt one record from :meth:`feed_raw`.
+
+        Raises:
+            KhanDecryptionError: If the tag does not match.
+        """
+        if not hmac.compare_digest(self._session.tag(record.header, record.ciphertext), record.tag):
+            raise KhanDecryptionError(
+                f"MAC verification failed for record {record.sequence}. "
+                "Data may have been tampered with.")
+        plaintext = self._session.crypt(record.sequence, record.ciphertext)
+        if record.final:
+            self.closed = True
+        return plaintext
+
+    def feed(self, data) -> list[bytes]:
+        """Return the verified plaintext of every record completed by data."""
+        return [self.open(record) for record in self.feed_raw(data)]
+
+
+class RecordSocket:
+    """
+    The record protocol over a connected blocking socket.
+
+    Each :meth:`recv` returns one verified record as soon as it has
+    arrived.  :meth:`close` sends the final record; the peer's
+    :meth:`recv` then returns ``b''``.
+
+    Args:
+        sock (socket.socket): A connected stream socket.
+        key (bytes): The master key shared by both ends.
+        role (str): ``INITIATOR`` on one end and ``RESPONDER`` on the
+            other, typically the connecting and the accepting side.
+        prime (int | None): As for :class:`RecordSealer`.
+        record_size (int): Largest plaintext per record sent.
+        max_record_size (int): Largest record accepted from the peer.
+    """
+
+    def __init__(self, sock: socket.socket, key: bytes, role: str, prime: int | None = None,
+                 record_size: int = DEFAULT_RECORD_SIZE,
+                 max_record_size: int = MAX_RECORD_SIZE):
+        if not 0 < record_size <= MAX_RECORD_SIZE:
+            raise ValueError(f"record_size must be in (0, {MAX_RECORD_SIZE}].")
+        self._sock = sock
+        self._sealer = RecordSealer(key, prime, role)
+        self._opener = RecordOpener(key, prime, max_record_size, role)
+        self._record_size = record_size
+        self._header_sent = False
+        self._ready: deque[bytes] = deque()
+
+    def send(self, data) -> None:
+        """Encrypt data as one or more records and send them."""
+        view = memoryview(data).cast('B')
+        out = [] if self._header_sent else [self._sealer.header]
+        self._header_sent = True
+        for start in range(0, len(view), self._record_size):
+            out.append(self._sealer.seal(view[start:start + self._record_size]))
+        self._sock.sendall(b''.join(out))
+
+    def recv(self, bufsize: int = 65536) -> bytes:
+        """
+        Return the plaintext of the next record, or ``b''`` once the peer
+        has closed the stream.
+
+        Raises:
+            KhanDecryptionError: If a record fails verification or the
+                connection ends without the final record.
+        """
+        while not self._ready:
+            if self._opener.closed:
+                return b''
+            chunk = self._sock.recv(bufsize)
+            if not chunk:
+                raise KhanDecryptionError("Connection closed before the final record.")
+            self._ready.extend(p for p in self._opener.feed(chunk) if p)
+        return self._ready.popleft()
+
+    def close(self) -> None:
+        """Send the final record (the socket itself is left open)."""
+        out = b'' if self._header_sent else self._sealer.header
+        self._header_sent = True
+        self._sock.sendall(out + self._sealer.close())
+
+    def __enter__(self) -> 'RecordSocket':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
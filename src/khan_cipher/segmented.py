@@ -0,0 +1,310 @@
+"""
+Segmented KHAN payloads with random-access decryption.
+
+The standard payload uses a single hash-chained keystream, so reaching
+byte k means generating k bytes of keystream first.  The segmented format
+splits the plaintext into fixed-size segments, each encrypted with an
+independent keystream derived from the key, IV and segment index, and
+stores one MAC per segment in an authenticated header table.  A byte range
+can then be decrypted by touching only the segments that overlap it.
+
+Layout::
+
+    Magic(4) | Flags(1) | Salt(16) | IV(16) | [PrimeLen(2) | Prime(N)] |
+    SegmentSize(4) | Length(8) | SegmentMAC(32) * S | HeaderMAC(32) |
+    Segment_0 | ... | Segment_{S-1}
+
+``Flags`` bit 0 marks an embedded prime.  Each segment MAC covers the fixed
+header, the segment index and the segment ciphertext; the header MAC covers
+everything before it, including the MAC table.
+"""
+
+import hmac
+import os
+import struct
+from hashlib import sha256
+from typing import NamedTuple
+
+from .core import (
+    SEGMENTED_MAGIC,
+    KhanDecryptionError,
+    derive_key,
+    new_keystream,
+    _decode_prime,
+    _encode_prime,
+    _resolve_prime,
+    _xor_bytes,
+)
+from .primes import DEFAULT_PRIME
+
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+MAC_SIZE = 32
+
+_FLAG_EMBEDDED_PRIME = 0x01
+_INDEX = struct.Struct('>Q')
+_GEOMETRY = struct.Struct('>IQ')
+
+
+class SegmentedHeader(NamedTuple):
+    """Parsed and authenticated header of a segmented payload."""
+    salt: bytes
+    iv: bytes
+    prime: int
+    segment_size: int
+    length: int
+    fixed: bytes
+    macs: list[bytes]
+    data_offset: int
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.macs)
+
+
+def is_segmented(payload: bytes) -> bool:
+    """Return True if payload starts with the segmented-format magic."""
+    return bytes(payload[:len(SEGMENTED_MAGIC)]) == SEGMENTED_MAGIC
+
+
+def segment_key(derived_key: bytes, index: int) -> bytes:
+    """Derive the independent keystream key for segment ``index``."""
+    return hmac.new(derived_key, b'segment' + _INDEX.pack(index), sha256).digest()
+
+
+def _segment_mac(key: bytes, fixed: bytes, index: int, ciphertext: bytes) -> bytes:
+    mac = hmac.new(key, fixed, sha256)
+    mac.update(_INDEX.pack(index))
+    mac.update(ciphertext)
+    return mac.digest()
+
+
+def _crypt_segment(
+    derived_key: bytes, prime: int, iv: bytes, index: int, data: bytes, skip: int = 0
+) -> bytes:
+    """XOR data with segment ``index``'s keystream, starting ``skip`` bytes in."""
+    ksg = new_keystream(segment_key(derived_key, index), prime, iv)
+    if skip:
+        ksg.generate(skip)
+    return _xor_bytes(data, ksg.generate(len(data)))
+
+
+def _segment_count(length: int, segment_size: int) -> int:
+    return -(-length // segment_size)
+
+
+def _new_header(
+    prime: int | None, segment_size: int, length: int
+) -> tuple[bytes, bytes, int, bytes]:
+    """Draw a fresh salt/IV and build the fixed header bytes."""
+    flags = 0
+    prime_field = b''
+    if prime is None:
+        prime = DEFAULT_PRIME
+        flags |= _FLAG_EMBEDDED_PRIME
+        prime_field = _encode_prime(prime)
+
+    iv = os.urandom(16)
+    salt = os.urandom(16)
+    fixed = (SEGMENTED_MAGIC + bytes([flags]) + salt + iv + prime_field
+             + _GEOMETRY.pack(segment_size, length))
+    return salt, iv, prime, fixed
+
+
+def _assemble(key: bytes, fixed: bytes, segments: list[bytes]) -> bytes:
+    """Join the header, MAC table and encrypted segments into a payload."""
+    table = b''.join(_segment_mac(key, fixed, index, ct)
+                     for index, ct in enumerate(segments))
+    header = fixed + table
+    header_mac = hmac.new(key, header, sha256).digest()
+    return b''.join([header, header_mac] + segments)
+
+
+def encrypt_segmented(
+    plaintext: bytes,
+    key: bytes,
+    prime: int | None = None,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+) -> bytes:
+    """
+    Encrypts plaintext into a segmented, randomly accessible payload.
+
+    Args:
+        plaintext (bytes): The arbitrary data to encrypt.
+        key (bytes): The master cryptographic key (should be 32 bytes).
+        prime (int | None): An explicit full reptend prime, or None to
+            use the default 128-bit prime (embedded in payload).
+        segment_size (int): Plaintext bytes per independently keyed segment.
+
+    Returns:
+        bytes: The segmented payload.
+
+    Raises:
+        ValueError: If plaintext is empty or segment_size is out of range.
+    """
+    if isinstance(plaintext, str):
+        plaintext = plaintext.encode('utf-8')
+    if not plaintext:
+        raise ValueError("Plaintext cannot be empty.")
+    if not 0 < segment_size < 1 << 32:
+        raise ValueError("segment_size must be between 1 and 2**32 - 1.")
+
+    view = memoryview(plaintext)
+    count = _segment_count(len(view), segment_size)
+    salt, iv, prime, fixed = _new_header(prime, segment_size, len(view))
+    derived_key = derive_key(key, salt)
+
+    segments = []
+    for index in range(count):
+        chunk = view[index * segment_size:(index + 1) * segment_size]
+        segments.append(_crypt_segment(derived_key, prime, iv, index, chunk))
+    return _assemble(key, fixed, segments)
+
+
+def parse_header(payload: bytes, key: bytes, prime: int | None = None) -> SegmentedHeader:
+    """
+    Parse and authenticate the header of a segmented payload.
+
+    Args:
+        payload (bytes): The segmented payload (any bytes-like object).
+        key (bytes): The symmetric master key.
+        prime (int | None): Explicit prime for payloads without an
+            embedded one; if given for one that embeds its prime, the
+            two must match.
+
+    Returns:
+        SegmentedHeader: The verified header fields.
+
+    Raises:
+        KhanDecryptionError: If the header is malformed, its MAC fails, or
+            it embeds a prime other than an explicit ``prime``.
+    """
+    header = _authenticate_header(payload, key)
+    return header._replace(prime=_resolve_prime(header.prime, prime))
+
+
+def _authenticate_header(payload, key: bytes) -> SegmentedHeader:
+    """Parse and authenticate a header; ``prime`` is None unless embedded."""
+    view = memoryview(payload)
+    if not is_segmented(view) or len(view) < 37:
+        raise KhanDecryptionError("Not a segmented KHAN payload.")
+
+    flags = view[4]
+    salt = bytes(view[5:21])
+    iv = bytes(view[21:37])
+    offset = 37
+    prime = None
+    if flags & _FLAG_EMBEDDED_PRIME:
+        if len(view) < offset + 2:
+            raise KhanDecryptionError("Payload is too short.")
+        prime, offset = _decode_prime(view, offset)
+
+    if len(view) < offset + _GEOMETRY.size:
+        raise KhanDecryptionError("Payload is too short.")
+    segment_size, length = _GEOMETRY.unpack_from(view, offset)
+    offset += _GEOMETRY.size
+    fixed = bytes(view[:offset])
+    if segment_size == 0:
+        raise KhanDecryptionError("Invalid segment size.")
+
+    count = _segment_count(length, segment_size)
+    table_end = offset + count * MAC_SIZE
+    data_offset = table_end + MAC_SIZE
+    if len(view) != data_offset + length:
+        raise KhanDecryptionError("Payload length does not match its header.")
+
+    header_mac = hmac.new(key, view[:table_end], sha256).digest()
+    if not hmac.compare_digest(header_mac, bytes(view[table_end:data_offset])):
+        raise KhanDecryptionError(
+            "MAC verification failed. Data may have been tampered with.")
+
+    macs = [bytes(view[i:i + MAC_SIZE]) for i in range(offset, table_end, MAC_SIZE)]
+    return SegmentedHeader(salt, iv, prime, segment_size, length, fixed, macs, data_offset)
+
+
+def _segment_bounds(header: SegmentedHeader, index: int) -> tuple[int, int]:
+    start = header.data_offset + index * header.segment_size
+    return start, min(start + header.segment_size, header.data_offset + header.length)
+
+
+def _open_segment(
+    view: memoryview, key: bytes, header: SegmentedHeader, derived_key: bytes,
+    index: int, skip: int = 0, count: int | None = None
+) -> bytes:
+    """Verify segment ``index`` and decrypt ``count`` bytes from ``skip``."""
+    start, end = _segment_bounds(header, index)
+    ciphertext = view[start:end]
+    mac = _segment_mac(key, header.fixed, index, ciphertext)
+    if not hmac.compare_digest(mac, header.macs[index]):
+        raise KhanDecryptionError(
+            f"MAC verification failed for segment {index}. "
+            "Data may have been tampered with.")
+    stop = len(ciphertext) if count is None else skip + count
+    return _crypt_segment(derived_key, header.prime, header.iv, index,
+                          ciphertext[skip:stop], skip)
+
+
+def decrypt_segmented(payload: bytes, key: bytes, prime: int | None = None) -> bytes:
+    """
+    Decrypts a complete segmented payload.
+
+    Args:
+        payload (bytes): The segmented payload.
+        key (bytes): The symmetric master key.
+        prime (int | None): Explicit prime override.
+
+    Returns:
+        bytes: The original plaintext.
+
+    Raises:
+        KhanDecryptionError: If the payload is invalid or any MAC fails.
+    """
+    view = memoryview(payload)
+    header = parse_header(view, key, prime)
+    derived_key = derive_key(key, header.salt)
+    return b''.join(_open_segment(view, key, header, derived_key, index)
+                    for index in range(header.segment_count))
+
+
+def decrypt_range(
+    payload: bytes, key: bytes, offset: int, length: int, prime: int | None = None
+) -> bytes:
+    """
+    Decrypts ``length`` plaintext bytes starting at ``offset``.
+
+    Only the header and the segments overlapping the range are
+    authenticated and decrypted.  Like a file read, a range that extends
+    past the end of the plaintext is truncated.
+
+    Args:
+        payload (bytes): The segmented payload (bytes, memoryview or mmap).
+        key (bytes): The symmetric master key.
+        offset (int): Plaintext offset of the first byte to return.
+        length (int): Number of bytes to return.
+        prime (int | None): Explicit prime override.
+
+    Returns:
+        bytes: The requested plaintext bytes.
+
+    Raises:
+        ValueError: If offset or length is negative.
+        KhanDecryptionError: If the header or a touched segment fails
+            verification.
+    """
+    if offset < 0 or length < 0:
+        raise ValueError("offset and length must be non-negative.")
+
+    view = memoryview(payload)
+    header = parse_header(view, key, prime)
+    end = min(offset + length, header.length)
+    if offset >= end:
+        return b''
+
+    derived_key = derive_key(key, header.salt)
+    size = header.segment_size
+    parts = []
+    for index in range(offset // size, (end - 1) // size + 1):
+        seg_start = index * size
+        skip = max(offset - seg_start, 0)
+        count = min(end - seg_start, size) - skip
+        parts.append(_open_segment(view, key, header, derived_key, index, skip, count))
+    return b''.join(parts)
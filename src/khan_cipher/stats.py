@@ -0,0 +1,177 @@
+"""
+Opt-in performance instrumentation.
+
+When enabled (``stats.enable()`` or ``KHAN_STATS=1`` in the environment),
+the single-chain encrypt/decrypt paths and the streaming classes time
+each stage -- key derivation (``kdf``), keystream generation
+(``keystream``), XOR (``xor``) and authentication (``mac``) -- as well as
+whole ``encrypt``/``decrypt`` calls.  Each stage keeps a call count, a
+byte count, total time and a log2 latency histogram.
+
+Disabled, every instrumentation point costs one function call that
+returns None, so the overhead is well under a percent even for the
+smallest messages.
+
+Example::
+
+    from khan_cipher import stats
+    stats.enable()
+    ...
+    print(stats.snapshot())
+"""
+
+import os
+import threading
+from collections.abc import Callable
+from time import perf_counter
+
+# Histogram bucket i counts samples in [2^(i-1), 2^i) nanoseconds.
+_BUCKETS = 48
+
+_enabled = False
+_lock = threading.Lock()
+_stages: dict[str, '_Stage'] = {}
+_hooks: list[Callable[[str, float, int], None]] = []
+
+
+class _Stage:
+    __slots__ = ('calls', 'bytes', 'seconds', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.histogram = [0] * _BUCKETS
+
+    def add(self, seconds: float, n_bytes: int) -> None:
+        self.calls += 1
+        self.bytes += n_bytes
+        self.seconds += seconds
+        bucket = min(int(seconds * 1e9).bit_length(), _BUCKETS - 1)
+        self.histogram[bucket] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket holding the q-quantile."""
+        target = q * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return (1 << bucket) / 1e9
+        return 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'calls': self.calls,
+            'bytes': self.bytes,
+            'seconds': self.seconds,
+            'p50_s': self.quantile(0.50),
+            'p99_s': self.quantile(0.99),
+            'histogram_ns': {1 << b: c for b, c in enumerate(self.histogram) if c},
+        }
+
+
+def enable() -> None:
+    """Start recording."""
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    """Stop recording (collected data is kept until :func:`reset`)."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Discard all collected data."""
+    with _lock:
+        _stages.clear()
+
+
+def add_hook(hook: Callable[[str, float, int], None]) -> None:
+    """
+    Register a profiling hook.
+
+    Hooks are called as ``hook(stage, seconds, n_bytes)`` after every
+    recorded stage while instrumentation is enabled.  They run inline on
+    the encrypting thread, so keep them cheap.
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[str, float, int], None]) -> None:
+    """Unregister a hook added with :func:`add_hook`."""
+    _hooks.remove(hook)
+
+
+def start() -> float | None:
+    """Return a start timestamp, or None while disabled."""
+    return perf_counter() if _enabled else None
+
+
+def lap(t0: float | None, stage: str, n_bytes: int) -> float | None:
+    """
+    Record the time since ``t0`` against ``stage``.
+
+    Returns:
+        The timestamp to pass to the next :func:`lap`, or None when ``t0``
+        is None (instrumentation was disabled when the operation began).
+    """
+    if t0 is None:
+        return None
+    now = perf_counter()
+    record(stage, now - t0, n_bytes)
+    return now
+
+
+def record(stage: str, seconds: float, n_bytes: int = 0) -> None:
+    """Add one sample to a stage and run the hooks."""
+    with _lock:
+        entry = _stages.get(stage)
+        if entry is None:
+            entry = _stages[stage] = _Stage()
+        entry.add(seconds, n_bytes)
+    for hook in _hooks:
+        hook(stage, seconds, n_bytes)
+
+
+def backend_info() -> dict:
+    """
+    Describe the active implementation.
+
+    Returns:
+        dict: ``backend`` is the name of the active backend (see
+        :mod:`khan_cipher.backends`), ``available`` lists every registered
+        backend and ``native_error`` holds the reason the C++ extension
+        failed to import, if it did.
+    """
+    from . import backends, core
+    return {
+        'backend': backends.current().name,
+        'available': backends.available_backends(),
+        'native_error': core.NATIVE_IMPORT_ERROR,
+    }
+
+
+def snapshot() -> dict:
+    """
+    Export everything collected so far as plain data.
+
+    Returns:
+        dict: ``{'enabled', 'backend', 'stages': {name: {...}}}`` where each
+        stage has ``calls``, ``bytes``, ``seconds``, approximate ``p50_s``
+        and ``p99_s``, and a ``histogram_ns`` mapping each bucket's
+        (exclusive) upper bound in nanoseconds to its sample count.
+    """
+    with _lock:
+        stages = {name: entry.as_dict() for name, entry in _stages.items()}
+    return {'enabled': _enabled, 'backend': backend_info(), 'stages': stages}
+
+
+if os.environ.get('KHAN_STATS', '').lower() in ('1', 'true', 'yes', 'on'):
+    enable()
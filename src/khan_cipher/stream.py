@@ -0,0 +1,464 @@
+"""
+Incremental (streaming) KHAN encryption.
+
+:class:`KhanEncryptor` and :class:`KhanDecryptor` process data chunk by
+chunk while keeping a running HMAC and a single persistent keystream, so
+memory use is bounded by the chunk size rather than the payload size.  The
+concatenated output is byte-for-byte the same wire format produced by
+:func:`khan_cipher.core.encrypt`.
+
+An encryptor can be checkpointed and later resumed, to continue an
+interrupted transfer or append to an already finalized payload (an
+encrypted log) without regenerating the keystream from the start::
+
+    saved = enc.checkpoint()                  # store alongside the output
+    ...
+    enc = KhanEncryptor.resume(key, saved, output_so_far)
+    out.write(enc.update(more) + enc.finalize())
+"""
+
+import os
+import hmac
+import struct
+from hashlib import sha256
+
+from . import compression as _compression
+from . import stats as _stats
+from .core import (
+    PAYLOAD_V2_MAGIC,
+    KhanDecryptionError,
+    decrypt,
+    derive_key,
+    encrypt,
+    keystream_from_state,
+    new_keystream,
+    _CODEC_MASK,
+    _CODEC_SHIFT,
+    _V2_MAC_DOMAIN,
+    _decode_v2_header,
+    _decode_varint,
+    _encode_prime,
+    _encode_v2_header,
+    _encode_varint,
+    _resolve_prime,
+    _xor_bytes,
+)
+from .primes import DEFAULT_PRIME
+
+MAC_SIZE = 32
+# Most unauthenticated plaintext one KhanDecryptor.update may inflate to.
+DEFAULT_MAX_OUTPUT = 1 << 20
+
+# Leading bytes of a (decrypted) encryptor checkpoint.
+CHECKPOINT_MAGIC = b'KHC\x01'
+_HEADER_SENT = 0x01
+_FINALIZED = 0x02
+
+
+def _encode_int(n: int) -> bytes:
+    raw = n.to_bytes((n.bit_length() + 7) // 8, 'big')
+    return _encode_varint(len(raw)) + raw
+
+
+def _decode_field(data, offset: int) -> tuple[bytes, int]:
+    decoded = _decode_varint(data, offset)
+    if decoded is None:
+        raise KhanDecryptionError("Checkpoint is truncated.")
+    length, offset = decoded
+    if offset + length > len(data):
+        raise KhanDecryptionError("Checkpoint is truncated.")
+    return bytes(data[offset:offset + length]), offset + length
+
+
+class KhanEncryptor:
+    """
+    Streaming counterpart of :func:`khan_cipher.core.encrypt`.
+
+    Feed plaintext with :meth:`update` and close the stream with
+    :meth:`finalize`.  The header (salt, IV and optionally the prime) is
+    emitted with the first output and the MAC with the last.
+
+    Args:
+        key (bytes): The master cryptographic key (should be 32 bytes).
+        prime (int | None): An explicit full reptend prime, or None to
+            use (and embed) the default 128-bit prime.
+        version (int): Payload format, as for :func:`core.encrypt`.
+        compression (str | int | None): Codec to compress the stream with
+            before encryption, as for :func:`core.encrypt` (requires
+            version 2).  Unlike :func:`core.encrypt`, a stream is always
+            compressed once a codec is given, since its size is unknown.
+    """
+
+    def __init__(self, key: bytes, prime: int | None = None, version: int = 1,
+                 compression: str | int | None = None):
+        if version not in (1, 2):
+            raise ValueError(f"Unsupported payload version {version}.")
+        flags = 0
+        self._compressor = None
+        if compression is not None:
+            if version != 2:
+                raise ValueError("Compression requires version=2.")
+            codec = _compression.get_codec(compression)
+            flags = codec.id << _CODEC_SHIFT
+            self._compressor = codec.compressor()
+        embed_prime = prime is None
+        if prime is None:
+            prime = DEFAULT_PRIME
+
+        iv = os.urandom(16)
+        salt = os.urandom(16)
+
+        self._ksg = new_keystream(derive_key(key, salt), prime, iv)
+        if version == 2:
+            self._header = _encode_v2_header(salt, iv, prime, embed_prime, flags)
+        else:
+            self._header = salt + iv
+            if embed_prime:
+                self._header += _encode_prime(prime)
+
+        self._key = key
+        self._mac = hmac.new(key, self._header, sha256)
+        self._version = version
+        self._header_sent = False
+        self._length = 0
+        self._consumed = 0
+        self._finalized = False
+
+    def _take_header(self) -> bytes:
+        if self._header_sent:
+            return b''
+        self._header_sent = True
+        return self._header
+
+    def update(self, data: bytes) -> bytes:
+        """
+        Encrypt the next chunk of plaintext.
+
+        Args:
+            data (bytes): Any bytes-like plaintext chunk.
+
+        Returns:
+            bytes: The ciphertext for this chunk, preceded by the payload
+            header on the first call.
+        """
+        if self._finalized:
+            raise ValueError("Encryptor has already been finalized.")
+
+        self._consumed += len(data)
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        return self._take_header() + self._crypt(data)
+
+    def _crypt(self, data) -> bytes:
+        """Encrypt and MAC the next bytes of (possibly compressed) plaintext."""
+        t = _stats.start()
+        keystream = self._ksg.generate(len(data))
+        t = _stats.lap(t, 'keystream', len(data))
+        ciphertext = _xor_bytes(data, keystream)
+        t = _stats.lap(t, 'xor', len(data))
+        self._mac.update(ciphertext)
+        _stats.lap(t, 'mac', len(ciphertext))
+        self._length += len(ciphertext)
+        return ciphertext
+
+    def finalize(self) -> bytes:
+        """
+        Finish the stream and return the trailing MAC.
+
+        Returns:
+            bytes: The 32-byte MAC, preceded by the header if nothing has
+            been emitted yet and by the compressor's remaining output.
+
+        Raises:
+            ValueError: If no plaintext was processed.
+        """
+        if self._finalized:
+            raise ValueError("Encryptor has already been finalized.")
+        if self._consumed == 0:
+            raise ValueError("Plaintext cannot be empty.")
+
+        tail = b''
+        if self._compressor is not None:
+            tail = self._crypt(self._compressor.flush())
+        self._finalized = True
+        if self._version == 2:
+            self._mac.update(_V2_MAC_DOMAIN)
+        return self._take_header() + tail + self._mac.digest()
+
+    def checkpoint(self) -> bytes:
+        """
+        Snapshot the encryptor so it can be resumed with :meth:`resume`.
+
+        The checkpoint holds the keystream state and the payload header,
+        and is itself encrypted and authenticated under the master key.
+        It may be taken at any point, including after :meth:`finalize`.
+
+        Returns:
+            bytes: An opaque checkpoint.
+
+        Raises:
+            ValueError: If the stream is compressed (compressor state
+                cannot be saved).
+        """
+        if self._compressor is not None:
+            raise ValueError("Compressed streams cannot be checkpointed.")
+        prime, position, current_rem, previous_hash = self._ksg.getstate()
+        flags = (_HEADER_SENT if self._header_sent else 0) | (_FINALIZED if self._finalized else 0)
+        state = b''.join((
+            CHECKPOINT_MAGIC, bytes((self._version, flags)), _encode_varint(self._length),
+            _encode_varint(len(self._header)), self._header,
+            _encode_int(prime), _encode_int(position), _encode_int(current_rem), previous_hash,
+        ))
+        return encrypt(state, self._key)
+
+    @classmethod
+    def resume(cls, key: bytes, checkpoint: bytes, written) -> 'KhanEncryptor':
+        """
+        Continue encrypting from a checkpoint without replaying the keystream.
+
+        The running MAC is rebuilt from ``written`` (one HMAC pass, no
+        keystream generation).  If the checkpoint was taken after
+        :meth:`finalize`, ``written`` ends with the old MAC: it is verified
+        and the resumed stream appends to the payload, so the caller must
+        drop those last 32 bytes before writing new output.  The result of
+        the resumed stream decrypts to the old and new plaintext joined.
+
+        A checkpoint only matches output of exactly the length it
+        recorded, so a stale checkpoint cannot rewind a stream that has
+        since grown.  Never resume one checkpoint twice with different
+        data: that reuses keystream.
+
+        Args:
+            key (bytes): The master key the stream was started with.
+            checkpoint (bytes): Output of :meth:`checkpoint`.
+            written: Everything the encryptor had emitted when the
+                checkpoint was taken, as a bytes-like object (e.g. an
+                ``mmap`` of the output file).
+
+        Returns:
+            KhanEncryptor: An encryptor whose next :meth:`update` continues
+            the payload.
+
+        Raises:
+            KhanDecryptionError: If the checkpoint is invalid for this key or
+                the finalized payload's MAC does not verify.
+            ValueError: If ``written`` does not match the checkpoint.
+        """
+        state = memoryview(decrypt(checkpoint, key))
+        if state[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC or len(state) < len(CHECKPOINT_MAGIC) + 2:
+            raise KhanDecryptionError("Not an encryptor checkpoint.")
+        version, flags = state[4], state[5]
+        if version not in (1, 2):
+            raise KhanDecryptionError(f"Unsupported payload version {version}.")
+        decoded = _decode_varint(state, 6)
+        if decoded is None:
+            raise KhanDecryptionError("Checkpoint is truncated.")
+        length, offset = decoded
+        header, offset = _decode_field(state, offset)
+        fields = []
+        for _ in range(3):
+            raw, offset = _decode_field(state, offset)
+            fields.append(int.from_bytes(raw, 'big'))
+        previous_hash = bytes(state[offset:])
+        if len(previous_hash) != 32:
+            raise KhanDecryptionError("Checkpoint is truncated.")
+
+        header_sent = bool(flags & _HEADER_SENT)
+        finalized = bool(flags & _FINALIZED)
+        view = memoryview(written).cast('B')
+        expected = (len(header) if header_sent else 0) + length + (MAC_SIZE if finalized else 0)
+        if len(view) != expected:
+            raise ValueError(
+                f"Checkpoint expects {expected} bytes of output; got {len(view)}.")
+        if header_sent and view[:len(header)] != header:
+            raise ValueError("Output does not start with the checkpointed header.")
+
+        self = cls.__new__(cls)
+        self._key = key
+        self._header = header
+        self._version = version
+        self._header_sent = header_sent
+        self._length = length
+        self._consumed = length
+        self._compressor = None
+        self._finalized = False
+        self._mac = hmac.new(key, header, sha256)
+        body_start = len(header) if header_sent else 0
+        self._mac.update(view[body_start:body_start + length])
+        if finalized:
+            mac = self._mac.copy()
+            if version == 2:
+                mac.update(_V2_MAC_DOMAIN)
+            if not hmac.compare_digest(mac.digest(), view[-MAC_SIZE:]):
+                raise KhanDecryptionError(
+                    "MAC verification failed. Data may have been tampered with.")
+        self._ksg = keystream_from_state((fields[0], fields[1], fields[2], previous_hash))
+        return self
+
+
+class KhanDecryptor:
+    """
+    Streaming counterpart of :func:`khan_cipher.core.decrypt`.
+
+    The last 32 bytes seen are always withheld because they may be the
+    MAC.  Plaintext returned by :meth:`update` is unauthenticated until
+    :meth:`finalize` returns without raising; callers must discard it if
+    verification fails.  Compressed payloads are decompressed on the fly;
+    because that output is unauthenticated, each :meth:`update` returns at
+    most ``max_output`` bytes of it and keeps the rest buffered in
+    compressed form for later calls, and :meth:`finalize` releases what is
+    left only once the MAC has been checked.
+
+    Args:
+        key (bytes): The symmetric master key.
+        prime (int | None): Explicit prime for legacy payloads, or None to
+            read the embedded prime from the header.
+        version (int | None): Expected payload format, or None to detect
+            version 2 by its magic prefix.  Unlike :func:`core.decrypt`, a
+            stream cannot retry another layout after releasing plaintext,
+            so pass ``version=1`` for legacy streams whose salt could
+            begin with the magic (a 2^-24 chance per payload).
+        max_output (int): Largest plaintext one :meth:`update` returns
+            for a compressed payload.
+        max_decompressed_size (int): Largest plaintext a compressed
+            payload may expand to in total.
+    """
+
+    def __init__(self, key: bytes, prime: int | None = None,
+                 version: int | None = None, max_output: int = DEFAULT_MAX_OUTPUT,
+                 max_decompressed_size: int = _compression.MAX_DECOMPRESSED_SIZE):
+        if version not in (None, 1, 2):
+            raise ValueError(f"Unsupported payload version {version}.")
+        self._key = key
+        self._prime = prime
+        self._version = version
+        self._mac = hmac.new(key, digestmod=sha256)
+        self._ksg = None
+        self._decompressor = None
+        self._max_output = max_output
+        self._max_decompressed_size = max_decompressed_size
+        self._pending = b''
+        self._finalized = False
+
+    def _parse_header(self) -> tuple[int, bytes, bytes, int | None, int] | None:
+        """Return (size, salt, iv, prime, codec ID) once the header is buffered."""
+        data = self._pending
+        magic = PAYLOAD_V2_MAGIC
+        if self._version is None and len(data) < len(magic):
+            return None
+        if self._version != 1 and data.startswith(magic):
+            header = _decode_v2_header(data)
+            if header is None:
+                return None
+            self._version = 2
+            prime = _resolve_prime(header.prime, self._prime)
+            codec_id = (header.flags & _CODEC_MASK) >> _CODEC_SHIFT
+            return header.size, bytes(header.salt), bytes(header.iv), prime, codec_id
+        if self._version == 2:
+            raise KhanDecryptionError("Not a version 2 payload.")
+
+        self._version = 1
+        if self._prime is not None:
+            size = 32
+            prime = self._prime
+        elif len(data) < 34:
+            return None
+        else:
+            size = 34 + struct.unpack('>H', data[32:34])[0]
+            prime = int.from_bytes(data[34:size], byteorder='big')
+        if len(data) < size:
+            return None
+        return size, data[:16], data[16:32], prime, 0
+
+    def _start(self) -> bool:
+        """Parse the header once enough bytes are buffered."""
+        parsed = self._parse_header()
+        if parsed is None:
+            return False
+
+        size, salt, iv, prime, codec_id = parsed
+        if prime is None:
+            raise KhanDecryptionError(
+                "Payload does not carry its prime; pass prime explicitly.")
+        if codec_id:
+            self._decompressor = _compression.Decompressor(
+                _compression.CODECS[codec_id], self._max_decompressed_size)
+        self._mac.update(self._pending[:size])
+        self._ksg = new_keystream(derive_key(self._key, salt), prime, iv)
+        self._pending = self._pending[size:]
+        return True
+
+    def update(self, data: bytes) -> bytes:
+        """
+        Decrypt the next chunk of payload.
+
+        Args:
+            data (bytes): Any bytes-like payload chunk.
+
+        Returns:
+            bytes: Plaintext released so far (possibly empty).
+        """
+        if self._finalized:
+            raise ValueError("Decryptor has already been finalized.")
+
+        self._pending += bytes(data)
+        if self._ksg is None and not self._start():
+            return b''
+
+        if len(self._pending) <= MAC_SIZE:
+            if self._decompressor is not None and self._decompressor.pending:
+                return self._inflate(b'')
+            return b''
+
+        ciphertext = self._pending[:-MAC_SIZE]
+        self._pending = self._pending[-MAC_SIZE:]
+        t = _stats.start()
+        self._mac.update(ciphertext)
+        t = _stats.lap(t, 'mac', len(ciphertext))
+        keystream = self._ksg.generate(len(ciphertext))
+        t = _stats.lap(t, 'keystream', len(ciphertext))
+        plaintext = _xor_bytes(ciphertext, keystream)
+        _stats.lap(t, 'xor', len(ciphertext))
+        if self._decompressor is not None:
+            plaintext = self._inflate(plaintext)
+        return plaintext
+
+    def _inflate(self, data) -> bytes:
+        """Decompress up to max_output bytes, buffering any excess input."""
+        try:
+            return self._decompressor.decompress(data, self._max_output)
+        except ValueError as e:
+            raise KhanDecryptionError(str(e)) from None
+
+    def finalize(self) -> bytes:
+        """
+        Verify the trailing MAC.
+
+        Returns:
+            bytes: Plaintext of a compressed payload not yet returned by
+            :meth:`update`, else ``b''``.
+
+        Raises:
+            KhanDecryptionError: If the payload is truncated, the MAC does
+                not match, or compressed data is corrupt or too large.
+        """
+        if self._finalized:
+            raise ValueError("Decryptor has already been finalized.")
+        self._finalized = True
+
+        if self._ksg is None or len(self._pending) < MAC_SIZE:
+            raise KhanDecryptionError("Payload is too short.")
+
+        if self._version == 2:
+            self._mac.update(_V2_MAC_DOMAIN)
+        if not hmac.compare_digest(self._mac.digest(), self._pending):
+            raise KhanDecryptionError(
+                "MAC verification failed. Data may have been tampered with.")
+        if self._decompressor is None:
+            return b''
+        tail = []
+        while self._decompressor.pending:
+            tail.append(self._inflate(b''))
+        if not self._decompressor.eof:
+            raise KhanDecryptionError(f"Truncated {self._decompressor.codec.name} data.")
+        return b''.join(tail)
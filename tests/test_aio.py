@@ -0,0 +1,79 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from khan_cipher import aio
+from khan_cipher.core import KhanDecryptionError, decrypt, encrypt
+
+
+def test_async_encrypt_decrypt_roundtrip():
+    master_key = os.urandom(32)
+    original = os.urandom(100_000)
+
+    async def main():
+        with ThreadPoolExecutor(2) as pool:
+            payload = await aio.encrypt(original, master_key, version=2, executor=pool)
+            return payload, await aio.decrypt(payload, master_key, executor=pool)
+
+    payload, recovered = asyncio.run(main())
+    assert recovered == original
+    assert decrypt(payload, master_key) == original
+
+
+def _feed(payload: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(payload)
+    reader.feed_eof()
+    return reader
+
+
+@pytest.mark.parametrize("chunk_size", [7, 4096])
+def test_decrypting_stream_reader(chunk_size):
+    master_key = os.urandom(32)
+    original = os.urandom(20_000)
+    payload = encrypt(original, master_key)
+
+    async def main():
+        reader = aio.DecryptingStreamReader(_feed(payload), master_key, chunk_size=chunk_size)
+        return b''.join([block async for block in reader])
+
+    assert asyncio.run(main()) == original
+
+
+def test_decrypting_stream_reader_rejects_tampering():
+    master_key = os.urandom(32)
+    payload = bytearray(encrypt(os.urandom(1000), master_key))
+    payload[-1] ^= 1
+
+    async def main():
+        return await aio.DecryptingStreamReader(_feed(bytes(payload)), master_key).readall()
+
+    with pytest.raises(KhanDecryptionError):
+        asyncio.run(main())
+
+
+def test_encrypting_stream_writer_over_socket():
+    master_key = os.urandom(32)
+    original = os.urandom(50_000)
+    received = asyncio.Queue()
+
+    async def handle(reader, writer):
+        plaintext = await aio.DecryptingStreamReader(reader, master_key).readall()
+        await received.put(plaintext)
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        _, writer = await asyncio.open_connection('127.0.0.1', port)
+        async with aio.EncryptingStreamWriter(writer, master_key, chunk_size=8192) as out:
+            await out.write(original[:10_000])
+            await out.write(original[10_000:])
+        writer.close()
+        result = await received.get()
+        server.close()
+        await server.wait_closed()
+        return result
+
+    assert asyncio.run(main()) == original
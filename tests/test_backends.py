@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from khan_cipher import backends
+from khan_cipher.core import KhanKeystream, decrypt, derive_key, encrypt, new_keystream
+from khan_cipher.primes import DEFAULT_PRIME
+
+BACKENDS = backends.available_backends()
+
+
+def test_builtin_backends_registered():
+    assert {'pure', 'pure-optimized'} <= set(BACKENDS)
+    if not os.environ.get('KHAN_BACKEND'):
+        assert backends.current().name == next(n for n in backends.AUTO_ORDER if n in BACKENDS)
+
+
+@pytest.mark.parametrize("name", BACKENDS)
+@pytest.mark.parametrize("prime", [100003, DEFAULT_PRIME, 2**255 - 19, 2**521 - 1])
+def test_keystream_conformance(name, prime):
+    derived = derive_key(b'\x07' * 32, b'\x11' * 16)
+    iv = b'\x22' * 16
+    reference = KhanKeystream(derived, prime, iv)
+    expected = bytes([reference.get_next_byte() for _ in range(3000)])
+
+    ksg = backends.get_backend(name).new_keystream(derived, prime, iv)
+    head = ksg.generate(1000)
+    buffer = bytearray(1999)
+    assert ksg.readinto(memoryview(buffer)) == 1999
+    assert head + bytes(buffer) + bytes([ksg.get_next_byte()]) == expected
+    assert ksg.current_rem == reference.current_rem
+    assert ksg.previous_hash == reference.previous_hash
+
+
+@pytest.mark.parametrize("name", BACKENDS)
+@pytest.mark.parametrize("size", [0, 1, 7, 8, 1000])
+def test_xor_conformance(name, size):
+    backend = backends.get_backend(name)
+    a, b = os.urandom(size), os.urandom(size)
+    expected = bytes(x ^ y for x, y in zip(a, b))
+    assert backend.xor(a, b) == expected
+
+    dst = bytearray(a)
+    assert backend.xor_into(memoryview(dst), b) is None
+    assert dst == expected
+
+
+@pytest.mark.parametrize("name", BACKENDS)
+@pytest.mark.parametrize("version", [1, 2])
+def test_payloads_interoperate(name, version):
+    key = os.urandom(32)
+    message = os.urandom(1500)
+    with backends.use_backend(name):
+        payload = encrypt(message, key, version=version)
+        assert decrypt(payload, key) == message
+    for other in BACKENDS:
+        with backends.use_backend(other):
+            assert decrypt(payload, key) == message
+
+
+def test_set_backend_and_context_manager():
+    before = backends.current()
+    with backends.use_backend('pure') as active:
+        assert active.name == 'pure'
+        assert isinstance(new_keystream(b'k' * 32, DEFAULT_PRIME, b'i' * 16), KhanKeystream)
+    assert backends.current() is before
+
+    try:
+        assert backends.set_backend('pure-optimized').name == 'pure-optimized'
+        assert backends.current().name == 'pure-optimized'
+    finally:
+        backends.set_backend(None)
+    assert backends.current() == before
+
+
+def test_environment_selection(monkeypatch):
+    monkeypatch.setenv('KHAN_BACKEND', 'pure')
+    try:
+        assert backends.set_backend(None).name == 'pure'
+        monkeypatch.setenv('KHAN_BACKEND', 'no-such-backend')
+        with pytest.raises(ValueError, match='no-such-backend'):
+            backends.set_backend(None)
+    finally:
+        monkeypatch.delenv('KHAN_BACKEND')
+        backends.set_backend(None)
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError, match='available'):
+        backends.set_backend('quantum')
+    with pytest.raises(ValueError):
+        with backends.use_backend('quantum'):
+            pass
@@ -0,0 +1,49 @@
+import os
+import pytest
+from khan_cipher.core import encrypt, decrypt, KhanDecryptionError
+from khan_cipher.batch import encrypt_many, decrypt_many
+
+
+def test_batch_roundtrip_list():
+    master_key = os.urandom(32)
+    messages = [os.urandom(200) for _ in range(50)]
+
+    payloads = encrypt_many(messages, master_key)
+
+    assert len(payloads) == len(messages)
+    assert len({p[:32] for p in payloads}) == len(messages)
+    assert [decrypt(p, master_key) for p in payloads] == messages
+    assert decrypt_many(payloads, master_key) == messages
+
+
+def test_batch_roundtrip_packed():
+    master_key = os.urandom(32)
+    messages = [b"alpha", "beta", b"gamma" * 40]
+
+    packed = encrypt_many(messages, master_key, packed=True)
+
+    assert isinstance(packed, bytes)
+    assert decrypt_many(packed, master_key) == [b"alpha", b"beta", b"gamma" * 40]
+
+
+def test_batch_explicit_prime_and_standard_payloads():
+    master_key = os.urandom(32)
+    payloads = encrypt_many([b"one", b"two"], master_key, prime=100003)
+    payloads.append(encrypt(b"three", master_key, prime=100003))
+
+    assert decrypt_many(payloads, master_key, prime=100003) == [b"one", b"two", b"three"]
+
+
+def test_batch_invalid_payload_handling():
+    master_key = os.urandom(32)
+    payloads = encrypt_many([b"good", b"bad"], master_key)
+    payloads[1] = payloads[1][:-1] + bytes([payloads[1][-1] ^ 1])
+
+    with pytest.raises(KhanDecryptionError):
+        decrypt_many(payloads, master_key)
+    assert decrypt_many(payloads, master_key, strict=False) == [b"good", None]
+
+
+def test_batch_rejects_empty_message():
+    with pytest.raises(ValueError):
+        encrypt_many([b"ok", b""], os.urandom(32))
@@ -0,0 +1,57 @@
+import os
+import threading
+import pytest
+
+ckhan = pytest.importorskip("khan_cipher.ckhan")
+
+
+def _reference(a: bytes, b: bytes) -> bytes:
+    return bytes(x ^ y for x, y in zip(a, b))
+
+
+@pytest.mark.parametrize("size", [0, 1, 31, 32, 33, 1000, 200_000])
+def test_bulk_xor_accepts_any_contiguous_buffer(size):
+    a, b = os.urandom(size), os.urandom(size)
+    expected = _reference(a, b)
+
+    assert ckhan.bulk_xor(a, b) == expected
+    assert ckhan.bulk_xor(bytearray(a), memoryview(b)) == expected
+
+    out = bytearray(size)
+    assert ckhan.bulk_xor(a, b, out=out) is out
+    assert out == expected
+
+    dst = bytearray(a)
+    assert ckhan.xor_into(dst, b) is None
+    assert dst == expected
+
+
+def test_xor_into_memoryview_slice():
+    buf = bytearray(b'\x00' * 16)
+    ckhan.xor_into(memoryview(buf)[4:8], b'\xff' * 4)
+    assert buf == b'\x00' * 4 + b'\xff' * 4 + b'\x00' * 8
+
+
+def test_bulk_xor_rejects_bad_arguments():
+    with pytest.raises(ValueError):
+        ckhan.bulk_xor(b'abc', b'ab')
+    with pytest.raises(ValueError):
+        ckhan.bulk_xor(b'abc', b'abc', out=bytearray(2))
+    with pytest.raises(TypeError):
+        ckhan.xor_into(b'readonly', b'readonly')
+
+
+def test_bulk_xor_from_threads():
+    a, b = os.urandom(1 << 20), os.urandom(1 << 20)
+    expected = _reference(a[:1024], b[:1024])
+    results = []
+
+    def worker():
+        results.append(ckhan.bulk_xor(a, b)[:1024])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [expected] * 4
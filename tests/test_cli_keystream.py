@@ -0,0 +1,40 @@
+from khan_cipher.cli import keystream_main
+from khan_cipher.core import new_keystream
+from khan_cipher.primes import DEFAULT_PRIME
+
+KEY = bytes(range(32))
+IV = bytes(range(16))
+ARGS = ["--key-hex", KEY.hex(), "--iv-hex", IV.hex(), "-q"]
+
+
+def _iv(offset: int) -> bytes:
+    return (int.from_bytes(IV, 'big') + offset).to_bytes(16, 'big')
+
+
+def test_keystream_tool_matches_generator(tmp_path):
+    out = tmp_path / "ks.bin"
+    assert keystream_main(ARGS + ["-n", "5000", "--chunk-size", "1K", "-o", str(out)]) == 0
+    assert out.read_bytes() == new_keystream(KEY, DEFAULT_PRIME, IV).generate(5000)
+
+
+def test_keystream_tool_parallel_files(tmp_path):
+    pattern = str(tmp_path / "stream-{i}.bin")
+    assert keystream_main(ARGS + ["-n", "2K", "--streams", "3", "--prime", "100003",
+                                  "-o", pattern]) == 0
+    for i in range(3):
+        expected = new_keystream(KEY, 100003, _iv(i)).generate(2048)
+        assert (tmp_path / f"stream-{i}.bin").read_bytes() == expected
+
+
+def test_keystream_tool_interleaved(tmp_path):
+    out = tmp_path / "mux.bin"
+    assert keystream_main(ARGS + ["-n", "300", "--streams", "2", "--chunk-size", "256",
+                                  "-o", str(out)]) == 0
+    a = new_keystream(KEY, DEFAULT_PRIME, _iv(0)).generate(300)
+    b = new_keystream(KEY, DEFAULT_PRIME, _iv(1)).generate(300)
+    assert out.read_bytes() == a[:256] + b[:256] + a[256:] + b[256:]
+
+
+def test_keystream_tool_rejects_bad_iv(capsys):
+    assert keystream_main(["--iv-hex", "00ff", "-n", "10", "-q"]) == 1
+    assert "16 bytes" in capsys.readouterr().err
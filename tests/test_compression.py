@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+import threading
+import zlib
+
+import pytest
+from khan_cipher import aio, compression, core
+from khan_cipher.core import KhanDecryptionError
+from khan_cipher.stream import KhanDecryptor, KhanEncryptor
+
+DOCUMENT = json.dumps(
+    [{"id": i, "name": f"user-{i}", "active": i % 3 == 0, "tags": ["a", "b"]} for i in range(400)]
+).encode()
+
+
+def _stream(key, data, chunk, **kwargs):
+    encryptor = KhanEncryptor(key, version=2, **kwargs)
+    out = [encryptor.update(data[i:i + chunk]) for i in range(0, len(data), chunk)]
+    return b''.join(out) + encryptor.finalize()
+
+
+@pytest.mark.parametrize("codec", ['zlib', 'lzma', 1, 2])
+def test_compressed_roundtrip(codec):
+    key = os.urandom(32)
+    payload = core.encrypt(DOCUMENT, key, version=2, compression=codec)
+    plain = core.encrypt(DOCUMENT, key, version=2)
+    assert len(payload) < len(plain) // 4
+    assert core.decrypt(payload, key) == DOCUMENT
+
+
+def test_small_and_incompressible_inputs_left_alone():
+    key = os.urandom(32)
+    for data in (b"short" * 10, os.urandom(4096)):
+        payload = core.encrypt(data, key, version=2, compression='zlib')
+        assert payload[3] & core._CODEC_MASK == 0
+        assert len(payload) == len(core.encrypt(data, key, version=2))
+        assert core.decrypt(payload, key) == data
+    payload = core.encrypt(b"short" * 10, key, version=2, compression='zlib', compress_threshold=0)
+    assert payload[3] & core._CODEC_MASK
+    assert core.decrypt(payload, key) == b"short" * 10
+
+
+def test_compression_argument_errors():
+    key = os.urandom(32)
+    with pytest.raises(ValueError, match="version=2"):
+        core.encrypt(DOCUMENT, key, compression='zlib')
+    with pytest.raises(ValueError, match="Unknown"):
+        core.encrypt(DOCUMENT, key, version=2, compression='brotli')
+    with pytest.raises(ValueError):
+        KhanEncryptor(key, compression='zlib')
+
+
+def test_unknown_codec_id_rejected():
+    key = os.urandom(32)
+    payload = bytearray(core.encrypt(DOCUMENT, key, version=2, compression='zlib'))
+    payload[3] = (payload[3] & ~core._CODEC_MASK) | (7 << core._CODEC_SHIFT)
+    with pytest.raises(KhanDecryptionError):
+        core.decrypt(bytes(payload), key)
+
+
+def test_tampered_compressed_payload_rejected():
+    key = os.urandom(32)
+    payload = bytearray(core.encrypt(DOCUMENT, key, version=2, compression='lzma'))
+    payload[60] ^= 1
+    with pytest.raises(KhanDecryptionError):
+        core.decrypt(bytes(payload), key)
+
+
+def test_decrypt_into_compressed_payload():
+    key = os.urandom(32)
+    payload = core.encrypt(DOCUMENT, key, version=2, compression='zlib')
+    out = bytearray(len(DOCUMENT) + 10)
+    assert core.decrypt_into(payload, key, out) == len(DOCUMENT)
+    assert out[:len(DOCUMENT)] == DOCUMENT
+    with pytest.raises(ValueError):
+        core.decrypt_into(payload, key, bytearray(len(payload)))
+
+
+@pytest.mark.parametrize("codec", ['zlib', 'lzma'])
+def test_streaming_roundtrip_and_interop(codec):
+    key = os.urandom(32)
+    payload = _stream(key, DOCUMENT, 100, compression=codec)
+    assert core.decrypt(payload, key) == DOCUMENT
+
+    decryptor = KhanDecryptor(key)
+    out = [decryptor.update(payload[i:i + 7]) for i in range(0, len(payload), 7)]
+    out.append(decryptor.finalize())
+    assert b''.join(out) == DOCUMENT
+
+    decryptor = KhanDecryptor(key)
+    out = decryptor.update(core.encrypt(DOCUMENT, key, version=2, compression=codec))
+    assert out + decryptor.finalize() == DOCUMENT
+
+
+def test_decompression_is_bounded():
+    key = os.urandom(32)
+    bomb = b"\0" * (8 << 20)
+    payload = core.encrypt(bomb, key, version=2, compression='zlib')
+    assert len(payload) < 64 * 1024
+
+    with pytest.raises(KhanDecryptionError, match="limit"):
+        core.decrypt(payload, key, max_decompressed_size=len(bomb) - 1)
+    assert core.decrypt(payload, key, max_decompressed_size=len(bomb)) == bomb
+
+    decryptor = KhanDecryptor(key, max_output=64 * 1024)
+    sizes = [len(decryptor.update(payload[i:i + 4096])) for i in range(0, len(payload), 4096)]
+    sizes += [len(decryptor.update(b'')) for _ in range(10)]
+    assert max(sizes) == 64 * 1024
+    assert sum(sizes) + len(decryptor.finalize()) == len(bomb)
+
+    decryptor = KhanDecryptor(key, max_decompressed_size=1 << 20)
+    with pytest.raises(KhanDecryptionError, match="limit"):
+        for i in range(0, len(payload), 4096):
+            decryptor.update(payload[i:i + 4096])
+        decryptor.finalize()
+
+
+def test_bounded_decompressor_rejects_trailing_data():
+    for codec in map(compression.get_codec, ('zlib', 'lzma')):
+        packed = compression.compress(codec, DOCUMENT)
+        assert compression.decompress(codec, packed) == DOCUMENT
+        with pytest.raises(ValueError, match="after the end"):
+            compression.decompress(codec, packed + b"x")
+        with pytest.raises(ValueError, match="Truncated"):
+            compression.decompress(codec, packed[:-5])
+        with pytest.raises(compression.DecompressionLimitError):
+            compression.decompress(codec, packed, len(DOCUMENT) - 1)
+
+
+def test_streaming_tamper_detected():
+    key = os.urandom(32)
+    payload = bytearray(_stream(key, DOCUMENT, 1000, compression='zlib'))
+    payload[-33] ^= 1
+    decryptor = KhanDecryptor(key)
+    with pytest.raises(KhanDecryptionError):
+        decryptor.update(bytes(payload))
+        decryptor.finalize()
+
+
+def test_compressed_stream_cannot_checkpoint():
+    encryptor = KhanEncryptor(os.urandom(32), version=2, compression='zlib')
+    encryptor.update(b"data")
+    with pytest.raises(ValueError, match="checkpoint"):
+        encryptor.checkpoint()
+
+
+def test_custom_codec():
+    def compressor():
+        return zlib.compressobj(1, zlib.DEFLATED, -15)
+
+    def decompressor():
+        return zlib.decompressobj(-15)
+
+    with pytest.raises(ValueError):
+        compression.register_codec(1, 'raw-deflate', compressor, decompressor)
+    with pytest.raises(ValueError):
+        compression.register_codec(8, 'raw-deflate', compressor, decompressor)
+    codec = compression.register_codec(7, 'raw-deflate', compressor, decompressor)
+    try:
+        assert compression.get_codec(7) is compression.get_codec('raw-deflate') is codec
+        key = os.urandom(32)
+        payload = core.encrypt(DOCUMENT, key, version=2, compression='raw-deflate')
+        assert (payload[3] & core._CODEC_MASK) >> core._CODEC_SHIFT == 7
+        assert core.decrypt(payload, key) == DOCUMENT
+    finally:
+        del compression.CODECS[7]
+
+
+def test_asyncio_one_shot_compression():
+    key = os.urandom(32)
+
+    async def main():
+        payload = await aio.encrypt(DOCUMENT, key, version=2, compression='zlib')
+        assert payload[3] & core._CODEC_MASK
+        small = await aio.encrypt(DOCUMENT[:100], key, version=2, compression='zlib',
+                                  compress_threshold=50)
+        assert small[3] & core._CODEC_MASK
+        with pytest.raises(KhanDecryptionError, match="limit"):
+            await aio.decrypt(payload, key, max_decompressed_size=100)
+        return await aio.decrypt(payload, key)
+
+    assert asyncio.run(main()) == DOCUMENT
+
+
+def test_asyncio_compressed_stream():
+    key = os.urandom(32)
+
+    async def main():
+        reader = asyncio.StreamReader()
+
+        class Sink:
+            def write(self, data):
+                reader.feed_data(data)
+
+            async def drain(self):
+                pass
+
+        async with aio.EncryptingStreamWriter(Sink(), key, version=2, compression='lzma',
+                                              chunk_size=1000) as writer:
+            await writer.write(DOCUMENT)
+        reader.feed_eof()
+        return await aio.DecryptingStreamReader(reader, key).readall()
+
+    assert asyncio.run(main()) == DOCUMENT
+
+
+def test_asyncio_stream_tail_bounded_and_off_loop():
+    key = os.urandom(32)
+    bomb = b"\0" * (1 << 20)
+    payload = _stream(key, bomb, 1 << 16, compression='zlib')
+
+    async def read_all(**kwargs):
+        reader = asyncio.StreamReader()
+        reader.feed_data(payload)
+        reader.feed_eof()
+        decrypting = aio.DecryptingStreamReader(reader, key, chunk_size=len(payload), **kwargs)
+        finalize = decrypting._decryptor.finalize
+        threads = []
+
+        def recording_finalize():
+            threads.append(threading.current_thread())
+            return finalize()
+
+        decrypting._decryptor.finalize = recording_finalize
+        blocks = [block async for block in decrypting]
+        assert threads and threads[0] is not threading.main_thread()
+        return blocks
+
+    blocks = asyncio.run(read_all(max_output=4096))
+    assert max(map(len, blocks)) == 4096
+    assert b''.join(blocks) == bomb
+    with pytest.raises(KhanDecryptionError, match="limit"):
+        asyncio.run(read_all(max_decompressed_size=len(bomb) - 1))
@@ -0,0 +1,38 @@
+import os
+import pytest
+from khan_cipher.core import encrypt, decrypt, derive_key, KhanDecryptionError
+from khan_cipher.context import KhanContext
+
+
+def test_context_interoperates_with_module_functions():
+    master_key = os.urandom(32)
+    ctx = KhanContext(master_key)
+    original = os.urandom(512)
+
+    assert decrypt(ctx.encrypt(original), master_key) == original
+    assert ctx.decrypt(encrypt(original, master_key)) == original
+
+
+def test_context_derive_key_matches_module():
+    master_key = os.urandom(32)
+    salt = os.urandom(16)
+
+    assert KhanContext(master_key).derive_key(salt) == derive_key(master_key, salt)
+
+
+def test_context_explicit_prime_and_batches():
+    master_key = os.urandom(32)
+    ctx = KhanContext(master_key, prime=100003)
+    messages = [b"a", b"bb", b"ccc"]
+
+    payloads = ctx.encrypt_many(messages)
+    assert ctx.decrypt_many(payloads) == messages
+    assert decrypt(payloads[1], master_key, prime=100003) == b"bb"
+    assert ctx.decrypt_many(ctx.encrypt_many(messages, packed=True)) == messages
+
+
+def test_context_rejects_wrong_key():
+    payload = KhanContext(os.urandom(32)).encrypt(b"secret")
+
+    with pytest.raises(KhanDecryptionError):
+        KhanContext(os.urandom(32)).decrypt(payload)
@@ -0,0 +1,116 @@
+import os
+import pytest
+from khan_cipher.core import encrypt, decrypt, KhanDecryptionError
+from khan_cipher.fileio import encrypt_file, decrypt_file
+from khan_cipher.segmented import encrypt_segmented
+from khan_cipher.cli import main
+
+
+def test_file_roundtrip(tmp_path):
+    master_key = os.urandom(32)
+    original = os.urandom(200_000)
+    src, enc, out = tmp_path / "plain", tmp_path / "enc", tmp_path / "out"
+    src.write_bytes(original)
+
+    assert encrypt_file(src, enc, master_key, chunk_size=1) == len(original)
+    assert decrypt(enc.read_bytes(), master_key) == original
+
+    assert decrypt_file(enc, out, master_key, chunk_size=1) == len(original)
+    assert out.read_bytes() == original
+
+
+def test_decrypt_file_accepts_encrypt_payload(tmp_path):
+    master_key = os.urandom(32)
+    enc, out = tmp_path / "enc", tmp_path / "out"
+    enc.write_bytes(encrypt(b"explicit prime", master_key, prime=100003))
+
+    decrypt_file(enc, out, master_key, prime=100003)
+    assert out.read_bytes() == b"explicit prime"
+
+
+def test_decrypt_file_rejects_tampering_before_writing(tmp_path):
+    master_key = os.urandom(32)
+    payload = bytearray(encrypt(b"Sensitive Corporate Data", master_key))
+    payload[-40] ^= 0x01
+    enc, out = tmp_path / "enc", tmp_path / "out"
+    enc.write_bytes(bytes(payload))
+
+    with pytest.raises(KhanDecryptionError):
+        decrypt_file(enc, out, master_key)
+    assert not out.exists()
+
+
+@pytest.mark.parametrize("make", [
+    lambda data, key: encrypt(data, key, version=2),
+    lambda data, key: encrypt(data, key, version=2, compression='zlib'),
+    lambda data, key: encrypt_segmented(data, key, segment_size=1000),
+])
+def test_decrypt_file_accepts_every_format(tmp_path, make):
+    master_key = os.urandom(32)
+    original = b"all formats " * 2000
+    enc, out = tmp_path / "enc", tmp_path / "out"
+    enc.write_bytes(make(original, master_key))
+
+    assert decrypt_file(enc, out, master_key, chunk_size=1) == len(original)
+    assert out.read_bytes() == original
+
+
+def test_decrypt_file_rejects_tampered_segment_before_writing(tmp_path):
+    master_key = os.urandom(32)
+    payload = bytearray(encrypt_segmented(os.urandom(5000), master_key, segment_size=1000))
+    payload[-10] ^= 0x01
+    enc, out = tmp_path / "enc", tmp_path / "out"
+    enc.write_bytes(bytes(payload))
+
+    with pytest.raises(KhanDecryptionError, match="segment 4"):
+        decrypt_file(enc, out, master_key)
+    assert not out.exists()
+
+
+def test_same_src_and_dst_rejected(tmp_path):
+    master_key = os.urandom(32)
+    path = tmp_path / "file"
+    path.write_bytes(encrypt(b"keep me", master_key))
+    (tmp_path / "link").symlink_to(path)
+
+    for operation in (encrypt_file, decrypt_file):
+        with pytest.raises(ValueError, match="different"):
+            operation(path, tmp_path / "link", master_key)
+    assert decrypt(path.read_bytes(), master_key) == b"keep me"
+
+
+def test_cli_roundtrip_with_stats(tmp_path, capsys):
+    key_file = tmp_path / "key"
+    key_file.write_bytes(os.urandom(32))
+    src, enc, out = tmp_path / "plain", tmp_path / "enc", tmp_path / "out"
+    src.write_bytes(b"cli payload" * 100)
+
+    assert main(["encrypt", str(src), str(enc),
+                 "--key-file", str(key_file), "--stats"]) == 0
+    assert "MB/s" in capsys.readouterr().err
+    assert main(["decrypt", str(enc), str(out),
+                 "--key-hex", key_file.read_bytes().hex()]) == 0
+    assert out.read_bytes() == src.read_bytes()
+
+    assert main(["decrypt", str(enc), str(out),
+                 "--key-hex", "00" * 32]) == 1
+
+
+def test_decrypt_file_decompression_limit_leaves_dst_untouched(tmp_path):
+    master_key = os.urandom(32)
+    original = b"\0" * (1 << 20)
+    enc, out = tmp_path / "enc", tmp_path / "out"
+    enc.write_bytes(encrypt(original, master_key, version=2, compression='zlib'))
+    out.write_bytes(b"previous contents")
+
+    with pytest.raises(KhanDecryptionError, match="limit"):
+        decrypt_file(enc, out, master_key, chunk_size=1, max_decompressed_size=len(original) - 1)
+    assert out.read_bytes() == b"previous contents"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["enc", "out"]
+
+    assert main(["decrypt", str(enc), str(out), "--key-hex", master_key.hex(),
+                 "--max-decompressed-size", "512K"]) == 1
+    assert out.read_bytes() == b"previous contents"
+    assert main(["decrypt", str(enc), str(out), "--key-hex", master_key.hex(),
+                 "--max-decompressed-size", "1M"]) == 0
+    assert out.read_bytes() == original
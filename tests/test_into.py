@@ -0,0 +1,78 @@
+import mmap
+import os
+
+import pytest
+
+from khan_cipher.core import (
+    KhanDecryptionError, decrypt, decrypt_into, encrypt, encrypt_into, payload_size,
+)
+from khan_cipher.parallel import encrypt_parallel
+from khan_cipher.primes import PRIME_REGISTRY
+
+
+@pytest.mark.parametrize("prime", [None, 100003, PRIME_REGISTRY[2], 2**521 - 1])
+@pytest.mark.parametrize("version", [1, 2])
+def test_payload_size_matches_encrypt(prime, version):
+    for n in (1, 100, 5000):
+        assert payload_size(n, prime, version) == len(encrypt(b"x" * n, b"k" * 32, prime, version=version))
+
+
+@pytest.mark.parametrize("prime", [None, 100003])
+@pytest.mark.parametrize("version", [1, 2])
+def test_round_trip_through_buffers(prime, version):
+    key = os.urandom(32)
+    original = os.urandom(3000)
+    out = bytearray(payload_size(len(original), prime, version) + 10)
+
+    written = encrypt_into(memoryview(original), key, out, prime, version)
+    assert written == len(out) - 10
+    assert out[written:] == bytes(10)
+    assert decrypt(bytes(out[:written]), key, prime) == original
+
+    plain = bytearray(written - 64)
+    n = decrypt_into(memoryview(out)[:written], key, plain, prime)
+    assert plain[:n] == original
+
+
+def test_into_mmap():
+    key = os.urandom(32)
+    original = os.urandom(4096)
+    size = payload_size(len(original))
+    with mmap.mmap(-1, size) as sealed, mmap.mmap(-1, len(original)) as opened:
+        encrypt_into(original, key, sealed)
+        assert decrypt(sealed[:], key) == original
+        assert decrypt_into(sealed, key, opened) == len(original)
+        assert opened[:] == original
+
+
+def test_decrypt_into_segmented_payload():
+    key = os.urandom(32)
+    original = os.urandom(10_000)
+    payload = encrypt_parallel(original, key, workers=2, segment_size=4096)
+    out = bytearray(len(original))
+    assert decrypt_into(payload, key, out) == len(original)
+    assert out == original
+
+
+def test_output_buffer_errors():
+    key = os.urandom(32)
+    with pytest.raises(ValueError, match="needed"):
+        encrypt_into(b"hello", key, bytearray(payload_size(5) - 1))
+    with pytest.raises(TypeError):
+        encrypt_into(b"hello", key, bytes(payload_size(5)))
+    with pytest.raises(ValueError):
+        encrypt_into(b"", key, bytearray(100))
+
+    payload = encrypt(b"hello", key)
+    with pytest.raises(ValueError):
+        decrypt_into(payload, key, bytearray(4))
+
+
+def test_decrypt_into_rejects_tampering_before_writing():
+    key = os.urandom(32)
+    payload = bytearray(encrypt(b"secret message", key))
+    payload[40] ^= 1
+    out = bytearray(len(payload))
+    with pytest.raises(KhanDecryptionError):
+        decrypt_into(payload, key, out)
+    assert out == bytearray(len(payload))
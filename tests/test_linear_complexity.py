@@ -0,0 +1,72 @@
+import os
+import sys
+from functools import lru_cache
+
+import mpmath
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'benchmarks'))
+import linear_complexity  # noqa: E402
+
+
+def _berlekamp_massey(bits) -> int:
+    """Scalar Berlekamp-Massey over GF(2), as in SP 800-22 §2.10.4."""
+    n = len(bits)
+    c, b = [0] * n, [0] * n
+    c[0] = b[0] = 1
+    length, m = 0, -1
+    for i in range(n):
+        d = bits[i]
+        for j in range(1, length + 1):
+            d ^= c[j] & bits[i - j]
+        if d:
+            t = c[:]
+            for j in range(n - i + m):
+                c[i - m + j] ^= b[j]
+            if 2 * length <= i:
+                length, m, b = i + 1 - length, i, t
+    return length
+
+
+@lru_cache(maxsize=1)
+def _e_bits(n: int) -> np.ndarray:
+    """The first n bits of the binary expansion of e (NIST's data.e)."""
+    with mpmath.workprec(n + 64):
+        digits = int(mpmath.floor(mpmath.e * mpmath.mpf(2) ** (n - 2)))
+    return np.frombuffer(format(digits, 'b').encode(), dtype=np.uint8) - ord('0')
+
+
+def test_matches_scalar_berlekamp_massey():
+    rng = np.random.default_rng(1)
+    blocks = rng.integers(0, 2, size=(64, 200), dtype=np.uint8)
+    blocks[0] = 0
+    blocks[1, :] = 0
+    blocks[1, -1] = 1
+    expected = [_berlekamp_massey(list(block)) for block in blocks]
+    assert list(linear_complexity.linear_complexities(blocks)) == expected
+
+
+def test_spec_example_block():
+    # SP 800-22 §2.10.4: 1101011110001 is generated by an LFSR of length 4.
+    bits = np.array([[1, 1, 0, 1, 0, 1, 1, 1, 1, 0, 0, 0, 1]])
+    assert linear_complexity.linear_complexities(bits)[0] == 4
+
+
+def test_spec_known_answer(monkeypatch):
+    # SP 800-22 §2.10.8: the first 10^6 bits of e with M = 1000.
+    bits = _e_bits(10 ** 6)
+    lengths = linear_complexity.linear_complexities(bits.reshape(1000, 1000))
+    t = (lengths - (500 + 8 / 36)) + 2 / 9
+    nu = np.bincount(np.searchsorted([-2.5, -1.5, -0.5, 0.5, 1.5, 2.5], t), minlength=7)
+    assert list(nu) == [11, 31, 116, 501, 258, 57, 26]
+
+    p_value, passed = linear_complexity.linear_complexity_test(bits, 1000)
+    assert passed and p_value == pytest.approx(0.844721, abs=1e-6)
+    # The published 0.845406 comes from the reference code, whose table
+    # has pi_0 = 0.01047 where §3.10 gives 1/96 = 0.010417.
+    reference_pi = linear_complexity.PI.copy()
+    reference_pi[0] = 0.01047
+    monkeypatch.setattr(linear_complexity, 'PI', reference_pi)
+    p_value, _ = linear_complexity.linear_complexity_test(bits, 1000)
+    assert p_value == pytest.approx(0.845406, abs=1e-6)
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from khan_cipher import backends, parallel
+from khan_cipher.core import encrypt, decrypt, KhanDecryptionError
+from khan_cipher.segmented import is_segmented, decrypt_range
+from khan_cipher.parallel import encrypt_parallel, decrypt_parallel
+
+
+def test_workers_switch_to_segmented_above_threshold():
+    master_key = os.urandom(32)
+    small, large = os.urandom(100), os.urandom(5000)
+
+    assert not is_segmented(encrypt(small, master_key, workers=4, parallel_threshold=1024))
+    assert not is_segmented(encrypt(large, master_key, workers=4))
+
+    payload = encrypt(large, master_key, workers=4, parallel_threshold=1024)
+    assert is_segmented(payload)
+    assert decrypt(payload, master_key, workers=4, parallel_threshold=1024) == large
+    assert decrypt(payload, master_key, workers=4) == large
+    assert decrypt(payload, master_key) == large
+
+
+def test_below_threshold_runs_without_a_pool():
+    class NoPool:
+        def submit(self, *args):
+            raise AssertionError("pool used below the threshold")
+
+    master_key = os.urandom(32)
+    original = os.urandom(5000)
+    payload = encrypt_parallel(original, master_key, workers=2, segment_size=512,
+                               executor=NoPool(), parallel_threshold=5001)
+    assert is_segmented(payload)
+    assert decrypt_parallel(payload, master_key, workers=2, executor=NoPool(),
+                            parallel_threshold=len(payload) + 1) == original
+    with pytest.raises(AssertionError):
+        encrypt_parallel(original, master_key, workers=2, executor=NoPool(),
+                         parallel_threshold=5000)
+
+
+def test_process_pool_children_inherit_backend():
+    with backends.use_backend('pure'):
+        pool = parallel._make_executor(1, multiprocessing.get_context('spawn'))
+    with pool:
+        assert pool.submit(backends.current).result().name == 'pure'
+
+
+def test_parallel_roundtrip_on_process_pool():
+    master_key = os.urandom(32)
+    original = os.urandom(20_000)
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        payload = encrypt_parallel(original, master_key, workers=2,
+                                   segment_size=1000, executor=pool, parallel_threshold=0)
+        assert decrypt_parallel(payload, master_key, workers=2,
+                                executor=pool, parallel_threshold=0) == original
+    assert decrypt_range(payload, master_key, 4321, 1234) == original[4321:5555]
+
+
+def test_parallel_tamper_rejected():
+    master_key = os.urandom(32)
+    payload = bytearray(encrypt_parallel(os.urandom(8000), master_key,
+                                         workers=3, segment_size=512, parallel_threshold=0))
+    payload[-100] ^= 0x01
+
+    for threshold in (0, len(payload) + 1):
+        with pytest.raises(KhanDecryptionError):
+            decrypt_parallel(bytes(payload), master_key, workers=3, parallel_threshold=threshold)
@@ -0,0 +1,120 @@
+import os
+import pytest
+from khan_cipher.batch import decrypt_many, encrypt_many
+from khan_cipher.context import KhanContext
+from khan_cipher.core import (
+    PAYLOAD_V2_MAGIC, KhanDecryptionError, decrypt, encrypt,
+    _decode_varint, _encode_varint, _mac_template, _seal,
+)
+from khan_cipher.primes import DEFAULT_PRIME, PRIME_REGISTRY, is_full_reptend_prime, register_prime
+from khan_cipher.stream import KhanDecryptor, KhanEncryptor
+
+
+def test_registered_primes_are_full_reptend():
+    for p in PRIME_REGISTRY.values():
+        assert is_full_reptend_prime(p)
+
+
+def test_v2_default_prime_is_compact():
+    master_key = os.urandom(32)
+    original = os.urandom(100)
+
+    legacy = encrypt(original, master_key)
+    compact = encrypt(original, master_key, version=2)
+
+    assert compact.startswith(PAYLOAD_V2_MAGIC)
+    assert len(compact) == len(legacy) - 13
+    assert compact[36] == 1  # registry ID of DEFAULT_PRIME
+    assert decrypt(compact, master_key) == original
+    assert decrypt(bytearray(compact), master_key) == original
+
+
+def test_v2_unregistered_and_explicit_primes():
+    master_key = os.urandom(32)
+    prime = 2 ** 64 - 59
+    embedded = _seal(b"embedded prime", _mac_template(master_key), os.urandom(16),
+                     os.urandom(16), prime, True, version=2)
+    assert decrypt(embedded, master_key) == b"embedded prime"
+    assert decrypt(embedded, master_key, prime=prime) == b"embedded prime"
+    with pytest.raises(KhanDecryptionError, match="different prime"):
+        decrypt(embedded, master_key, prime=DEFAULT_PRIME)
+    decryptor = KhanDecryptor(master_key, prime=DEFAULT_PRIME)
+    with pytest.raises(KhanDecryptionError, match="different prime"):
+        decryptor.update(embedded)
+
+    explicit = encrypt(b"explicit prime", master_key, prime=100003, version=2)
+    assert decrypt(explicit, master_key, prime=100003) == b"explicit prime"
+    with pytest.raises(KhanDecryptionError):
+        decrypt(explicit, master_key)
+
+
+def test_v2_tampering_rejected():
+    master_key = os.urandom(32)
+    payload = bytearray(encrypt(b"secret message", master_key, version=2))
+    payload[40] ^= 1
+
+    with pytest.raises(KhanDecryptionError):
+        decrypt(bytes(payload), master_key)
+
+
+def test_legacy_payload_with_magic_salt_still_decrypts():
+    master_key = os.urandom(32)
+    salt = PAYLOAD_V2_MAGIC + os.urandom(13)
+    payload = _seal(b"legacy", _mac_template(master_key), salt, os.urandom(16),
+                    DEFAULT_PRIME, True)
+
+    assert decrypt(payload, master_key) == b"legacy"
+    decryptor = KhanDecryptor(master_key, version=1)
+    assert decryptor.update(payload) == b"legacy"
+    decryptor.finalize()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_v2_streaming_roundtrip(chunk_size):
+    master_key = os.urandom(32)
+    original = os.urandom(3000)
+
+    encryptor = KhanEncryptor(master_key, version=2)
+    payload = encryptor.update(original) + encryptor.finalize()
+    assert decrypt(payload, master_key) == original
+
+    decryptor = KhanDecryptor(master_key)
+    out = b''.join(decryptor.update(payload[i:i + chunk_size])
+                   for i in range(0, len(payload), chunk_size))
+    decryptor.finalize()
+    assert out == original
+
+
+def test_v2_batch_and_context():
+    master_key = os.urandom(32)
+    messages = [b"a", b"bb", b"ccc"]
+
+    payloads = encrypt_many(messages, master_key, version=2)
+    assert all(p.startswith(PAYLOAD_V2_MAGIC) for p in payloads)
+    assert decrypt_many(payloads, master_key) == messages
+
+    ctx = KhanContext(master_key, version=2)
+    assert ctx.decrypt(ctx.encrypt(b"ctx")) == b"ctx"
+    assert ctx.decrypt_many(ctx.encrypt_many(messages, packed=True)) == messages
+
+
+def test_unsupported_version_rejected():
+    with pytest.raises(ValueError):
+        encrypt(b"x", os.urandom(32), version=3)
+
+
+def test_register_prime_conflicts():
+    register_prime(1, DEFAULT_PRIME)  # idempotent
+    with pytest.raises(ValueError):
+        register_prime(1, 17)
+    with pytest.raises(ValueError):
+        register_prime(200, DEFAULT_PRIME)
+    with pytest.raises(ValueError):
+        register_prime(0, 17)
+
+
+@pytest.mark.parametrize("n", [0, 1, 127, 128, 300, 2 ** 63])
+def test_varint_roundtrip(n):
+    encoded = _encode_varint(n)
+    assert _decode_varint(encoded, 0) == (n, len(encoded))
+    assert _decode_varint(encoded[:-1], 0) is None
@@ -0,0 +1,121 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from khan_cipher import pool as pool_module
+from khan_cipher import stats
+from khan_cipher.core import decrypt
+from khan_cipher.pool import KeystreamPool
+
+
+def test_pooled_payloads_decrypt_with_core():
+    key = os.urandom(32)
+    with KeystreamPool(key, sizes=(64, 1024), memory_limit=8192) as pool:
+        assert pool.wait_ready(timeout=30)
+        for n in (1, 64, 65, 1024):
+            message = os.urandom(n)
+            payload = pool.encrypt(message)
+            assert decrypt(payload, key) == message
+            assert pool.decrypt(payload) == message
+        metrics = pool.metrics()
+    assert metrics['hits'] == 4 and metrics['misses'] == 0
+    assert metrics['hit_rate'] == 1.0
+    assert metrics['refill_lag_max_s'] >= metrics['refill_lag_mean_s'] > 0
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_explicit_prime_and_version(version):
+    key = os.urandom(32)
+    with KeystreamPool(key, sizes=(256,), memory_limit=1024, prime=100003, version=version) as pool:
+        pool.wait_ready(timeout=30)
+        payload = pool.encrypt(b"explicit prime")
+        assert decrypt(payload, key, 100003) == b"explicit prime"
+
+
+def test_entries_are_single_use():
+    key = os.urandom(32)
+    with KeystreamPool(key, sizes=(128,), memory_limit=128 * 4) as pool:
+        pool.wait_ready(timeout=30)
+        headers = {pool.encrypt(b"same message")[:32] for _ in range(20)}
+    assert len(headers) == 20
+
+
+def test_misses_fall_back_to_inline_encryption():
+    key = os.urandom(32)
+    with KeystreamPool(key, sizes=(16,), memory_limit=16) as pool:
+        pool.wait_ready(timeout=30)
+        big = os.urandom(100)
+        assert decrypt(pool.encrypt(big), key) == big
+        metrics = pool.metrics()
+    assert metrics['misses'] == 1
+    assert metrics['hit_rate'] == 0.0
+
+
+def test_memory_cap_respected():
+    key = os.urandom(32)
+    with KeystreamPool(key, sizes=(100, 1000), memory_limit=4000, workers=4) as pool:
+        pool.wait_ready(timeout=30)
+        metrics = pool.metrics()
+    assert metrics['classes'] == {100: {'ready': 20, 'capacity': 20},
+                                  1000: {'ready': 2, 'capacity': 2}}
+    assert metrics['pooled_bytes'] <= 4000
+
+
+def test_refills_after_use_and_records_stats():
+    key = os.urandom(32)
+    stats.reset()
+    stats.enable()
+    try:
+        with ThreadPoolExecutor(2) as executor, \
+                KeystreamPool(key, sizes=(32,), memory_limit=64, executor=executor) as pool:
+            pool.wait_ready(timeout=30)
+            for _ in range(2):
+                pool.encrypt(b"x")
+            assert pool.wait_ready(timeout=30)
+            assert pool.metrics()['generated'] == 4
+    finally:
+        stats.disable()
+    assert stats.snapshot()['stages']['pool_refill']['calls'] == 4
+
+
+def test_failed_generation_ends_wait(monkeypatch):
+    def broken(*args):
+        raise MemoryError("no room for keystream")
+
+    monkeypatch.setattr(pool_module, "_generate", broken)
+    key = os.urandom(32)
+    with ThreadPoolExecutor(1) as executor, \
+            KeystreamPool(key, sizes=(64,), memory_limit=256, executor=executor) as pool:
+        with pytest.raises(RuntimeError, match="generation failed") as info:
+            pool.wait_ready()
+        assert isinstance(info.value.__cause__, MemoryError)
+        assert pool.metrics()['errors'] == 1
+        assert decrypt(pool.encrypt(b"still works"), key) == b"still works"
+
+    executor = ThreadPoolExecutor(1)
+    executor.shutdown()
+    with KeystreamPool(key, sizes=(64,), executor=executor) as pool:
+        with pytest.raises(RuntimeError):
+            pool.wait_ready()
+
+
+def test_close_discards_keystream():
+    pool = KeystreamPool(os.urandom(32), sizes=(64,), memory_limit=256)
+    pool.wait_ready(timeout=30)
+    pool.close()
+    assert pool.metrics()['pooled_bytes'] == 0
+    time.sleep(0.01)
+    assert pool.wait_ready(timeout=0)
+
+
+def test_invalid_arguments():
+    key = os.urandom(32)
+    with pytest.raises(ValueError):
+        KeystreamPool(key, sizes=())
+    with pytest.raises(ValueError):
+        KeystreamPool(key, version=3)
+    with KeystreamPool(key, sizes=(8,), memory_limit=8) as pool:
+        with pytest.raises(ValueError):
+            pool.encrypt(b"")
@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from sympy import isprime
+from khan_cipher import primes
+from khan_cipher.primes import (
+    DEFAULT_PRIME, PrimePool, PrimePoolEmpty, PrimeValidationTimeout,
+    VerificationCache, generate_full_reptend_prime, is_full_reptend_prime,
+)
+from khan_cipher.primes import _sieve
+
+
+def test_default_prime_is_full_reptend():
+    assert is_full_reptend_prime(DEFAULT_PRIME)
+    assert is_full_reptend_prime(17)
+    assert not is_full_reptend_prime(13)
+    assert not is_full_reptend_prime(100001)
+
+
+@pytest.mark.parametrize("bits", [32, 64, 128])
+def test_generated_primes_are_full_reptend(bits):
+    p = generate_full_reptend_prime(bits)
+    assert p.bit_length() == bits
+    assert is_full_reptend_prime(p)
+
+
+def test_parallel_generation(monkeypatch):
+    shutdowns = []
+
+    class RecordingExecutor(ProcessPoolExecutor):
+        def shutdown(self, wait=True, *, cancel_futures=False):
+            shutdowns.append((wait, cancel_futures))
+            super().shutdown(wait, cancel_futures=cancel_futures)
+
+    monkeypatch.setattr(primes, 'ProcessPoolExecutor', RecordingExecutor)
+    p = generate_full_reptend_prime(64, workers=2)
+    assert is_full_reptend_prime(p)
+    # Windows still being searched are not waited for.
+    assert shutdowns[0] == (False, True)
+
+
+def test_sieve_removes_small_factors_of_q_and_p():
+    q0 = (1 << 40) + 3
+    for k, alive in enumerate(_sieve(q0, 2000)):
+        q = q0 + 20 * k
+        has_small_factor = any(n % s == 0 for n in (q, 2 * q + 1)
+                               for s in (3, 7, 11, 13, 17, 19, 23, 65521))
+        if alive:
+            assert not has_small_factor
+
+
+def test_prime_pool_roundtrip(tmp_path):
+    pool = PrimePool(tmp_path / "pool.json")
+    with pytest.raises(PrimePoolEmpty):
+        pool.pop(64)
+
+    assert pool.refill(64, target=2) == 2
+    assert pool.size(64) == 2
+    assert pool.refill(64, target=2) == 0
+
+    p = pool.pop(64)
+    assert is_full_reptend_prime(p) and p.bit_length() == 64
+    assert pool.size(64) == 1
+
+    with pytest.raises(ValueError):
+        pool.add(100001)
+
+
+def test_supplied_factors_and_safe_primes():
+    cache = VerificationCache()
+    assert is_full_reptend_prime(17, factors={2: 4}, cache=cache)
+    assert is_full_reptend_prime(23, factors=[2, 11], cache=VerificationCache())
+    assert not is_full_reptend_prime(13, factors=[2, 3], cache=VerificationCache())
+    assert 17 in cache
+
+    with pytest.raises(ValueError):
+        is_full_reptend_prime(23, factors={2: 1, 5: 1}, cache=VerificationCache())
+    with pytest.raises(ValueError):
+        is_full_reptend_prime(29, factors={4: 1, 7: 1}, cache=VerificationCache())
+
+    # Safe primes are validated from their structure, without factoring.
+    p = generate_full_reptend_prime(256)
+    assert is_full_reptend_prime(p, cache=VerificationCache())
+
+
+def test_verification_cache_persists(tmp_path):
+    path = tmp_path / "verified.json"
+    cache = VerificationCache(path)
+    assert is_full_reptend_prime(DEFAULT_PRIME, cache=cache)
+    assert not is_full_reptend_prime(100001, cache=cache)
+
+    reloaded = VerificationCache(path)
+    assert reloaded.get(DEFAULT_PRIME) is True
+    assert reloaded.get(100001) is False
+    assert len(reloaded) == 2
+
+
+def test_verification_cache_is_bounded_lru():
+    cache = VerificationCache(max_size=2)
+    cache.put(17, True)
+    cache.put(13, False)
+    assert cache.get(17)
+    cache.put(23, True)
+    assert 17 in cache and 23 in cache and 13 not in cache
+    assert len(cache) == 2
+    assert primes.DEFAULT_CACHE.max_size == primes.DEFAULT_CACHE_SIZE
+
+
+def test_bounded_factorization_reuses_worker():
+    from sympy import randprime
+    checked = []
+    while len(checked) < 2:
+        a = randprime(1 << 30, 1 << 31)
+        b = randprime(1 << 30, 1 << 31)
+        if isprime(2 * a * b + 1):
+            p = 2 * a * b + 1
+            expected = all(pow(10, (p - 1) // q, p) != 1 for q in (2, a, b))
+            assert is_full_reptend_prime(p, timeout=30, cache=VerificationCache()) == expected
+            checked.append(primes._factor_pool)
+    assert checked[0] is not None and checked[0] is checked[1]
+
+
+def test_validation_timeout():
+    from sympy import randprime
+    while True:
+        a = randprime(1 << 99, 1 << 100)
+        b = randprime(1 << 99, 1 << 100)
+        if isprime(2 * a * b + 1):
+            break
+    p = 2 * a * b + 1
+
+    with pytest.raises(PrimeValidationTimeout):
+        is_full_reptend_prime(p, timeout=0.5, cache=VerificationCache())
+    expected = all(pow(10, (p - 1) // q, p) != 1 for q in (2, a, b))
+    assert is_full_reptend_prime(p, factors=[2, a, b]) == expected
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import socket
+import threading
+
+import pytest
+from khan_cipher import aio
+from khan_cipher.core import KhanDecryptionError
+from khan_cipher.record import INITIATOR, RESPONDER, RecordOpener, RecordSealer, RecordSocket
+
+
+def _stream(key, messages, prime=None):
+    sealer = RecordSealer(key, prime)
+    return sealer.header + b''.join(sealer.seal(m) for m in messages) + sealer.close()
+
+
+@pytest.mark.parametrize("prime", [None, 100003])
+def test_records_delivered_as_they_complete(prime):
+    key = os.urandom(32)
+    messages = [os.urandom(n) for n in (1, 100, 0, 5000)]
+    wire = _stream(key, messages, prime)
+
+    opener = RecordOpener(key, prime)
+    delivered = []
+    for i in range(len(wire)):
+        delivered.extend(opener.feed(wire[i:i + 1]))
+    assert delivered == messages + [b'']
+    assert opener.closed
+
+
+def test_header_tampering_rejected():
+    key = os.urandom(32)
+    wire = bytearray(_stream(key, [b"hello"]))
+    wire[10] ^= 1
+    with pytest.raises(KhanDecryptionError):
+        RecordOpener(key).feed(bytes(wire))
+    with pytest.raises(KhanDecryptionError):
+        RecordOpener(os.urandom(32)).feed(_stream(key, [b"hello"]))
+    with pytest.raises(KhanDecryptionError):
+        RecordOpener(key).feed(b"not a record stream")
+    with pytest.raises(KhanDecryptionError, match="different prime"):
+        RecordOpener(key, prime=100003).feed(_stream(key, [b"hello"]))
+
+
+def test_unknown_flags_rejected():
+    key = os.urandom(32)
+    wire = bytearray(_stream(key, [b"hello"]))
+    wire[4] |= 0x02
+    with pytest.raises(KhanDecryptionError, match="flags"):
+        RecordOpener(key).feed(bytes(wire))
+
+
+def test_reflected_stream_rejected():
+    key = os.urandom(32)
+    wire = _stream(key, [b"hello"])
+    assert RecordOpener(key, role=RESPONDER).feed(wire) == [b"hello", b'']
+    with pytest.raises(KhanDecryptionError, match="header"):
+        RecordOpener(key, role=INITIATOR).feed(wire)
+    with pytest.raises(ValueError):
+        RecordSealer(key, role='client')
+
+
+def test_record_tampering_rejected_only_for_that_record():
+    key = os.urandom(32)
+    sealer = RecordSealer(key)
+    first, second = sealer.seal(b"first"), sealer.seal(b"second")
+    tampered = bytearray(second)
+    tampered[14] ^= 1
+
+    opener = RecordOpener(key)
+    assert opener.feed(sealer.header + first) == [b"first"]
+    with pytest.raises(KhanDecryptionError, match="record 1"):
+        opener.feed(bytes(tampered))
+
+
+def test_replay_reorder_and_trailing_data_rejected():
+    key = os.urandom(32)
+    sealer = RecordSealer(key)
+    first, second = sealer.seal(b"a"), sealer.seal(b"b")
+
+    with pytest.raises(KhanDecryptionError, match="expected 0"):
+        RecordOpener(key).feed(sealer.header + second)
+    opener = RecordOpener(key)
+    opener.feed(sealer.header + first)
+    with pytest.raises(KhanDecryptionError, match="expected 1"):
+        opener.feed(first)
+
+    opener = RecordOpener(key)
+    with pytest.raises(KhanDecryptionError, match="after the final"):
+        opener.feed(sealer.header + first + second + sealer.close() + b"x" * 20)
+    with pytest.raises(ValueError):
+        sealer.seal(b"late")
+
+
+def test_oversized_record_rejected_before_buffering():
+    key = os.urandom(32)
+    sealer = RecordSealer(key)
+    record = sealer.seal(os.urandom(1000))
+    with pytest.raises(KhanDecryptionError, match="exceeds"):
+        RecordOpener(key, max_record_size=999).feed(sealer.header + record[:12])
+
+
+def test_record_socket_pair():
+    key = os.urandom(32)
+    a, b = socket.socketpair()
+    payload = os.urandom(40_000)
+    received = []
+
+    def serve():
+        with b:
+            peer = RecordSocket(b, key, RESPONDER)
+            while True:
+                block = peer.recv()
+                if not block:
+                    break
+                received.append(block)
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    with a, RecordSocket(a, key, INITIATOR, record_size=16_384) as ours:
+        ours.send(payload[:100])
+        ours.send(payload[100:])
+    thread.join(timeout=30)
+
+    assert b''.join(received) == payload
+    assert [len(r) for r in received] == [100, 16_384, 16_384, 39_900 - 2 * 16_384]
+
+
+def test_record_socket_truncation_detected():
+    key = os.urandom(32)
+    a, b = socket.socketpair()
+    with a:
+        RecordSocket(a, key, INITIATOR).send(b"no final record")
+    with b:
+        peer = RecordSocket(b, key, RESPONDER)
+        assert peer.recv() == b"no final record"
+        with pytest.raises(KhanDecryptionError, match="final record"):
+            peer.recv()
+
+
+def test_asyncio_record_streams():
+    key = os.urandom(32)
+    original = os.urandom(100_000)
+    received = asyncio.Queue()
+
+    async def handle(reader, writer):
+        blocks = [block async for block in aio.RecordStreamReader(reader, key, prefetch=2)]
+        await received.put(blocks)
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        _, writer = await asyncio.open_connection('127.0.0.1', port)
+        async with aio.RecordStreamWriter(writer, key, record_size=8192) as out:
+            await out.write(original[:10])
+            await out.write(original[10:])
+        result = await received.get()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return result
+
+    blocks = asyncio.run(main())
+    assert b''.join(blocks) == original
+    assert len(blocks[0]) == 10
+
+
+def test_asyncio_record_reader_errors():
+    key = os.urandom(32)
+    sealer = RecordSealer(key)
+    good = sealer.header + sealer.seal(b"ok")
+    bad = bytearray(sealer.seal(b"bad"))
+    bad[-1] ^= 1
+
+    async def read_all(data):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return [block async for block in aio.RecordStreamReader(reader, key)]
+
+    with pytest.raises(KhanDecryptionError, match="ended before"):
+        asyncio.run(read_all(good))
+    with pytest.raises(KhanDecryptionError, match="MAC"):
+        asyncio.run(read_all(good + bytes(bad)))
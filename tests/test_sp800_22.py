@@ -0,0 +1,62 @@
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from test_linear_complexity import _e_bits
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'benchmarks'))
+import sp800_22  # noqa: E402
+
+
+def test_random_excursion_known_answer():
+    # SP 800-22 §2.14.8: the first 10^6 bits of e have J = 1490 cycles.
+    assert sp800_22._walk(_e_bits(10 ** 6))[1] == 1490
+    p_values, passed = sp800_22.random_excursion_test(_e_bits(10 ** 6))
+    assert not passed  # x = -1 falls below alpha in the published example
+    assert p_values == pytest.approx(
+        [0.573306, 0.197996, 0.164011, 0.007779, 0.786868, 0.440912, 0.797854, 0.778186], abs=1e-6)
+
+
+def test_random_excursion_variant_known_answer():
+    # SP 800-22 §2.15.8, states -9..-1, 1..9.
+    p_values, passed = sp800_22.random_excursion_variant_test(_e_bits(10 ** 6))
+    assert passed
+    assert p_values == pytest.approx(
+        [0.858946, 0.794755, 0.576249, 0.493417, 0.633873, 0.917283, 0.934708, 0.816012, 0.826009,
+         0.137861, 0.200642, 0.441254, 0.939291, 0.505683, 0.445935, 0.512207, 0.538635, 0.593930],
+        abs=1e-6)
+
+
+def test_random_excursions_need_500_cycles():
+    short = np.random.default_rng(0).integers(0, 2, 10_000)
+    assert sp800_22.random_excursion_test(short) is None
+    assert sp800_22.random_excursion_variant_test(short) is None
+
+
+def test_non_overlapping_template_known_answer():
+    # SP 800-22 §2.7.4: B = 001, N = 2, M = 10.
+    bits = [int(c) for c in "10100100101110010110"]
+    p_value, passed = sp800_22.non_overlapping_template_test(bits, (0, 0, 1), n_blocks=2)
+    assert passed and p_value == pytest.approx(0.344154, abs=1e-6)
+    with pytest.raises(ValueError, match="aperiodic"):
+        sp800_22.non_overlapping_template_test(bits, (1, 0, 1), n_blocks=2)
+
+
+def test_non_overlapping_template_is_not_always_one():
+    # nistrng's version scores about 1 for every input; a biased source
+    # must fail here.
+    rng = np.random.default_rng(0)
+    fair = rng.integers(0, 2, 1 << 20)
+    biased = (rng.random(1 << 20) < 0.4).astype(np.uint8)
+    assert 0.001 < sp800_22.non_overlapping_template_test(fair)[0] < 0.999
+    assert not sp800_22.non_overlapping_template_test(biased)[1]
+
+
+def test_igamc_matches_closed_forms():
+    x = 1.7
+    assert sp800_22.igamc(1, x) == pytest.approx(np.exp(-x))
+    assert sp800_22.igamc(3, x) == pytest.approx(np.exp(-x) * (1 + x + x * x / 2))
+    assert sp800_22.igamc(0.5, x) == pytest.approx(math.erfc(math.sqrt(x)))
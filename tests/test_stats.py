@@ -0,0 +1,63 @@
+import os
+import pytest
+from khan_cipher import stats
+from khan_cipher.core import decrypt, encrypt
+from khan_cipher.stream import KhanEncryptor
+
+
+@pytest.fixture
+def recording():
+    stats.reset()
+    stats.enable()
+    yield
+    stats.disable()
+    stats.reset()
+
+
+def test_disabled_by_default_records_nothing():
+    stats.reset()
+    encrypt(b"quiet", os.urandom(32))
+    assert stats.snapshot()['stages'] == {}
+
+
+def test_stage_counters(recording):
+    master_key = os.urandom(32)
+    payload = encrypt(os.urandom(1000), master_key, version=2)
+    decrypt(payload, master_key)
+    decrypt(encrypt(os.urandom(500), master_key), master_key)
+
+    stages = stats.snapshot()['stages']
+    assert stages['encrypt']['calls'] == 2
+    assert stages['encrypt']['bytes'] == 1500
+    assert stages['decrypt']['calls'] == 2
+    assert stages['keystream']['calls'] == 4
+    assert stages['xor']['bytes'] == 3000
+    for name in ('kdf', 'keystream', 'xor', 'mac'):
+        entry = stages[name]
+        assert sum(entry['histogram_ns'].values()) == entry['calls']
+        assert 0 < entry['p50_s'] <= entry['p99_s']
+
+
+def test_hooks_and_streaming(recording):
+    seen = []
+
+    def hook(stage, seconds, n_bytes):
+        seen.append(stage)
+
+    stats.add_hook(hook)
+    try:
+        enc = KhanEncryptor(os.urandom(32))
+        enc.update(b"x" * 100)
+        enc.finalize()
+    finally:
+        stats.remove_hook(hook)
+
+    assert seen == ['keystream', 'xor', 'mac']
+
+
+def test_backend_info():
+    from khan_cipher import backends
+    info = stats.backend_info()
+    assert info['backend'] == backends.current().name
+    assert info['backend'] in info['available']
+    assert (info['native_error'] is None) == ('native' in info['available'])
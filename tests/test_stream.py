@@ -0,0 +1,122 @@
+import os
+import pytest
+from khan_cipher.core import encrypt, decrypt, KhanDecryptionError
+from khan_cipher.stream import KhanEncryptor, KhanDecryptor
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_streaming_encrypt_matches_wire_format():
+    master_key = os.urandom(32)
+    original = os.urandom(5000)
+
+    enc = KhanEncryptor(master_key)
+    payload = b''.join(enc.update(c) for c in _chunks(original, 777))
+    payload += enc.finalize()
+
+    assert decrypt(payload, master_key) == original
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 33, 4096])
+def test_streaming_decrypt_of_encrypt_output(chunk_size):
+    master_key = os.urandom(32)
+    original = os.urandom(3000)
+    payload = encrypt(original, master_key)
+
+    dec = KhanDecryptor(master_key)
+    recovered = b''.join(dec.update(c) for c in _chunks(payload, chunk_size))
+    recovered += dec.finalize()
+
+    assert recovered == original
+
+
+def test_streaming_explicit_prime_roundtrip():
+    master_key = os.urandom(32)
+    original = b"legacy explicit prime stream"
+
+    enc = KhanEncryptor(master_key, prime=100003)
+    payload = enc.update(original) + enc.finalize()
+
+    dec = KhanDecryptor(master_key, prime=100003)
+    assert dec.update(payload) + dec.finalize() == original
+    assert decrypt(payload, master_key, prime=100003) == original
+
+
+def test_streaming_tamper_rejected_at_finalize():
+    master_key = os.urandom(32)
+    payload = bytearray(encrypt(b"Sensitive Corporate Data", master_key))
+    payload[60] ^= 0x01
+
+    dec = KhanDecryptor(master_key)
+    dec.update(bytes(payload))
+    with pytest.raises(KhanDecryptionError):
+        dec.finalize()
+
+
+def test_streaming_truncated_payload_rejected():
+    dec = KhanDecryptor(os.urandom(32))
+    dec.update(b'\x00' * 20)
+    with pytest.raises(KhanDecryptionError):
+        dec.finalize()
+
+
+def test_streaming_empty_plaintext_rejected():
+    enc = KhanEncryptor(os.urandom(32))
+    with pytest.raises(ValueError):
+        enc.finalize()
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_resume_interrupted_stream(version):
+    master_key = os.urandom(32)
+    first, second = os.urandom(5000), os.urandom(3000)
+
+    enc = KhanEncryptor(master_key, version=version)
+    written = enc.update(first)
+    saved = enc.checkpoint()
+
+    resumed = KhanEncryptor.resume(master_key, saved, written)
+    payload = written + resumed.update(second) + resumed.finalize()
+    assert decrypt(payload, master_key) == first + second
+
+
+def test_resume_appends_to_finalized_payload():
+    master_key = os.urandom(32)
+    enc = KhanEncryptor(master_key, prime=100003)
+    log = enc.update(b"entry 1\n") + enc.finalize()
+    saved = enc.checkpoint()
+
+    for entry in (b"entry 2\n", b"entry 3\n"):
+        enc = KhanEncryptor.resume(master_key, saved, log)
+        log = log[:-32] + enc.update(entry) + enc.finalize()
+        saved = enc.checkpoint()
+        assert decrypt(log, master_key, prime=100003).endswith(entry)
+    assert decrypt(log, master_key, prime=100003) == b"entry 1\nentry 2\nentry 3\n"
+
+
+def test_resume_before_header_sent():
+    master_key = os.urandom(32)
+    enc = KhanEncryptor(master_key)
+    resumed = KhanEncryptor.resume(master_key, enc.checkpoint(), b'')
+    payload = resumed.update(b"late start") + resumed.finalize()
+    assert decrypt(payload, master_key) == b"late start"
+
+
+def test_resume_rejects_mismatches():
+    master_key = os.urandom(32)
+    enc = KhanEncryptor(master_key)
+    written = enc.update(b"abc") + enc.finalize()
+    saved = enc.checkpoint()
+
+    with pytest.raises(KhanDecryptionError):
+        KhanEncryptor.resume(os.urandom(32), saved, written)
+    with pytest.raises(ValueError):
+        KhanEncryptor.resume(master_key, saved, written + b"more")
+    tampered = bytearray(written)
+    tampered[-33] ^= 1
+    with pytest.raises(KhanDecryptionError):
+        KhanEncryptor.resume(master_key, saved, bytes(tampered))
+    with pytest.raises(KhanDecryptionError):
+        KhanEncryptor.resume(master_key, encrypt(b"not a checkpoint", master_key), written)
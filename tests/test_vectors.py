@@ -1,4 +1,12 @@
-from khan_cipher.core import derive_key, KhanKeystream
+import copy
+import pickle
+import threading
+
+import pytest
+from khan_cipher.core import (
+    derive_key, new_keystream, FastKhanKeystream, KhanKeystream, NativeKhanKeystream,
+)
+from khan_cipher.primes import DEFAULT_PRIME
 
 
 def test_known_answer_vector():
@@ -17,3 +25,134 @@ def test_known_answer_vector():
     assert isinstance(ks_bytes, bytes)
     # Just an arbitrary assertion length check pattern
     assert len(ks_bytes.hex()) == 32
+
+
+@pytest.mark.skipif(NativeKhanKeystream is None,
+                    reason="ckhan extension not built")
+@pytest.mark.parametrize("prime", [
+    100003,
+    DEFAULT_PRIME,
+    2**64 - 59,
+    2**255 - 19,
+])
+def test_native_keystream_matches_python(prime):
+    derived = derive_key(b'\x07' * 32, b'\x11' * 16)
+    iv = b'\x22' * 16
+
+    py_ksg = KhanKeystream(derived, prime, iv)
+    c_ksg = NativeKhanKeystream(derived, prime, iv)
+
+    assert c_ksg.position == py_ksg.position
+    assert c_ksg.current_rem == py_ksg.current_rem
+    assert c_ksg.previous_hash == py_ksg.previous_hash
+
+    expected = [py_ksg.get_next_byte() for _ in range(4096)]
+    assert [c_ksg.get_next_byte() for _ in range(4096)] == expected
+    assert c_ksg.current_rem == py_ksg.current_rem
+    assert c_ksg.previous_hash == py_ksg.previous_hash
+
+
+KEYSTREAM_CLASSES = [KhanKeystream, FastKhanKeystream] + (
+    [NativeKhanKeystream] if NativeKhanKeystream is not None else [])
+
+
+@pytest.mark.parametrize("cls", KEYSTREAM_CLASSES)
+def test_bulk_generation_matches_per_byte(cls):
+    derived = derive_key(b'\x00' * 32, b'\x11' * 16)
+    iv = b'\x22' * 16
+    reference = KhanKeystream(derived, DEFAULT_PRIME, iv)
+    expected = bytes([reference.get_next_byte() for _ in range(6000)])
+
+    ksg = cls(derived, DEFAULT_PRIME, iv)
+    head = ksg.generate(1000)
+    buffer = bytearray(5000)
+    assert ksg.readinto(memoryview(buffer)[:4999]) == 4999
+    buffer[4999] = ksg.get_next_byte()
+
+    assert isinstance(head, bytes)
+    assert head + bytes(buffer) == expected
+    assert cls(derived, DEFAULT_PRIME, iv).generate(0) == b''
+
+
+@pytest.mark.parametrize("cls", KEYSTREAM_CLASSES)
+def test_from_state_resumes_stream(cls):
+    derived = derive_key(b'\x03' * 32, b'\x11' * 16)
+    iv = b'\x22' * 16
+    ksg = KhanKeystream(derived, DEFAULT_PRIME, iv)
+    ksg.generate(100)
+
+    resumed = cls.from_state(ksg.prime, ksg.position,
+                             ksg.current_rem, ksg.previous_hash)
+    assert resumed.generate(500) == ksg.generate(500)
+
+    with pytest.raises(ValueError):
+        cls.from_state(ksg.prime, 0, ksg.prime, ksg.previous_hash)
+    with pytest.raises(ValueError):
+        cls.from_state(ksg.prime, 0, 1, b'short')
+
+
+def test_new_keystream_matches_reference():
+    derived = derive_key(b'\x05' * 32, b'\x11' * 16)
+    for prime in (100003, DEFAULT_PRIME, 2**255 - 19, 2**521 - 1):
+        expected = KhanKeystream(derived, prime, b'\x44' * 16)
+        assert expected.current_rem == pow(10, expected.position, prime)
+        assert new_keystream(derived, prime, b'\x44' * 16).generate(64) == \
+            expected.generate(64)
+
+
+@pytest.mark.parametrize("cls", KEYSTREAM_CLASSES)
+def test_getstate_setstate_and_pickle(cls):
+    derived = derive_key(b'\x09' * 32, b'\x11' * 16)
+    ksg = cls(derived, DEFAULT_PRIME, b'\x22' * 16)
+    ksg.generate(777)
+    state = ksg.getstate()
+    assert state == (ksg.prime, ksg.position, ksg.current_rem, ksg.previous_hash)
+
+    clone = pickle.loads(pickle.dumps(ksg))
+    copied = copy.copy(ksg)
+    assert type(clone) is cls
+    expected = ksg.generate(300)
+    assert clone.generate(300) == expected
+    assert copied.generate(300) == expected
+
+    ksg.setstate(state)
+    assert ksg.generate(300) == expected
+    with pytest.raises(ValueError):
+        ksg.setstate((state[0], state[1], state[0], state[3]))
+    with pytest.raises(ValueError):
+        ksg.setstate((state[0], state[1], state[2], b'short'))
+
+
+def test_state_is_portable_across_classes():
+    derived = derive_key(b'\x0a' * 32, b'\x11' * 16)
+    source = KEYSTREAM_CLASSES[-1](derived, DEFAULT_PRIME, b'\x22' * 16)
+    source.generate(100)
+    state = source.getstate()
+    expected = source.generate(200)
+    for cls in KEYSTREAM_CLASSES:
+        assert cls.from_state(*state).generate(200) == expected
+
+
+@pytest.mark.skipif(NativeKhanKeystream is None,
+                    reason="ckhan extension not built")
+def test_native_reinit_while_filling_is_rejected():
+    derived = derive_key(b'\x05' * 32, b'\x11' * 16)
+    iv = b'\x22' * 16
+    ksg = NativeKhanKeystream(derived, DEFAULT_PRIME, iv)
+    started = threading.Event()
+
+    def fill():
+        started.set()
+        ksg.generate(8 << 20)
+
+    thread = threading.Thread(target=fill)
+    thread.start()
+    started.wait()
+    rejected = False
+    while thread.is_alive() and not rejected:
+        try:
+            ksg.__init__(derived, DEFAULT_PRIME, iv)
+        except RuntimeError:
+            rejected = True
+    thread.join()
+    assert rejected